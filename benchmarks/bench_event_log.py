@@ -0,0 +1,84 @@
+"""
+Benchmark: state load (snapshot + log replay) time against log length,
+and the cost of one append vs. one full JSON rewrite.
+
+    python benchmarks/bench_event_log.py
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from hilanchor.storage import EventLogBackend, JsonBackend  # noqa: E402
+
+LOG_LENGTHS = [0, 100, 1_000, 10_000, 50_000]
+HISTORY_DAYS = 365
+
+
+def make_history(days: int) -> dict:
+    state = {"notified_non_owner_user_ids": [], "context": "stuck"}
+    for i in range(days):
+        key = f"2025-{1 + (i // 28) % 12:02d}-{1 + i % 28:02d}"
+        state[key] = {
+            "mode": "work",
+            "worked": "partial",
+            "need_followup": True,
+            "fail_count": 0,
+            "events": [
+                {"ts": f"{key}T1{h}:00:00+03:00", "type": "free_note", "text": "כמה מילים על היום"}
+                for h in range(6)
+            ],
+        }
+    return state
+
+
+def bench(path: Path, log_records: int) -> None:
+    backend = EventLogBackend(path, compact_bytes=1 << 40, compact_seconds=1e12)
+    backend.compact(make_history(HISTORY_DAYS))
+    state = backend.load()
+    day = "2026-01-01"
+
+    t0 = time.perf_counter()
+    for i in range(log_records):
+        state.setdefault(day, {}).setdefault("events", []).append(
+            {"ts": f"{day}T12:00:00+02:00", "type": "free_note", "text": f"note {i}"}
+        )
+        state.touch_day(day)
+        backend.save(state)
+    append_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    loaded = backend.load()
+    load_s = time.perf_counter() - t0
+    assert len(loaded.get(day, {}).get("events", [])) == log_records
+
+    per_append = (append_s / log_records * 1e6) if log_records else 0.0
+    log_kb = backend.log_path.stat().st_size / 1024 if backend.log_path.exists() else 0.0
+    print(f"{log_records:>8} records | log {log_kb:>9.1f} KB | load {load_s * 1000:>8.1f} ms | "
+          f"append {per_append:>7.1f} µs/record")
+
+
+def bench_full_rewrite(path: Path) -> None:
+    backend = JsonBackend(path)
+    state = make_history(HISTORY_DAYS)
+    runs = 50
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        backend.save(state)
+    per_save = (time.perf_counter() - t0) / runs * 1000
+    print(f"full JSON rewrite of {HISTORY_DAYS} days: {per_save:.2f} ms/save")
+
+
+def main() -> None:
+    print(f"Snapshot: {HISTORY_DAYS} days of history")
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_full_rewrite(Path(tmp) / "full.json")
+        for n in LOG_LENGTHS:
+            bench(Path(tmp) / f"state_{n}.json", n)
+
+
+if __name__ == "__main__":
+    main()
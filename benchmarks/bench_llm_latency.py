@@ -0,0 +1,141 @@
+"""
+Benchmark: end-to-end reply latency of the callback handlers - from the
+button tap to the first text the user sees, and to the final text - with
+the cache, the circuit breaker and streaming turned on or off, against the
+fake Ollama server (fake_ollama.py) acting healthy, slow, flaky or hung.
+
+Taps on the check-in answers arrive every TAP_INTERVAL seconds and go
+through on_worked_choice() and send_humanized() as in the bot, with the
+default LLM_BUDGET_MS; Telegram itself is not called. "humanized" is the
+share of replies that ended on a generated text, "queue" the most requests
+waiting for the model at once.
+
+    python benchmarks/bench_llm_latency.py [taps] [profile ...]
+"""
+import asyncio
+import logging
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest.mock import AsyncMock, Mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fake_ollama import FakeOllama  # noqa: E402
+
+FAKE = FakeOllama(token_latency="10", hang_seconds=6, seed=1).start()
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ.update(
+    OWNER_USER_ID="1",
+    USE_LLM="true",
+    OLLAMA_HOST=FAKE.url,
+    LLM_READ_TIMEOUT="5",
+    LLM_CACHE_DISK_SIZE="0",
+    VARIANT_POOL_SIZE="0",  # the check-in answers are static; generate them live
+    STATE_PATH=os.path.join(tempfile.mkdtemp(), "state.json"),
+)
+
+from hilanchor import llm_breaker, llm_cache, replies  # noqa: E402
+from hilanchor.handlers.callbacks.worked import on_worked_choice  # noqa: E402
+from hilanchor.llm import aclose_llm  # noqa: E402
+from hilanchor.llm_breaker import CircuitBreaker  # noqa: E402
+
+TAP_INTERVAL = 0.4
+CHOICES = ("yes", "partial", "no")
+
+PROFILES = {
+    "healthy": dict(latency="lognormal:200,0.5", error_rate=0.0, hang_rate=0.0),
+    "slow": dict(latency="lognormal:1500,0.5", error_rate=0.0, hang_rate=0.0),
+    "flaky": dict(latency="lognormal:200,0.5", error_rate=0.3, hang_rate=0.05),
+    "hung": dict(latency="200", error_rate=0.0, hang_rate=1.0),
+}
+
+SETUPS = {
+    "plain": dict(cache=False, breaker=False, stream=False),
+    "cache": dict(cache=True, breaker=False, stream=False),
+    "breaker": dict(cache=False, breaker=True, stream=False),
+    "stream": dict(cache=False, breaker=False, stream=True),
+    "all": dict(cache=True, breaker=True, stream=True),
+}
+
+
+def use(cache: bool, breaker: bool, stream: bool) -> None:
+    llm_cache.LLM_CACHE_SIZE = 256 if cache else 0
+    llm_cache._cache = None  # a fresh, empty cache for every run
+    llm_breaker._breaker = (
+        CircuitBreaker() if breaker else CircuitBreaker(failures=10**9, slow_seconds=math.inf, max_queue=0)
+    )
+    replies.LLM_STREAM = stream
+
+
+async def tap(i: int) -> list:
+    """One button tap; returns (seconds since the tap, text) for everything shown."""
+    shown = []
+    start = time.perf_counter()
+
+    async def show(text=None, reply_markup=None):
+        shown.append((time.perf_counter() - start, text))
+        return message
+
+    message = Mock(chat_id=1, message_id=i)
+    message.edit_text = AsyncMock(side_effect=show)
+    query = Mock(data=f"worked:{CHOICES[i % len(CHOICES)]}")
+    query.answer = AsyncMock()
+    query.edit_message_text = AsyncMock(side_effect=show)
+    query.message.chat_id = 1
+    update = Mock(callback_query=query)
+    update.effective_user.id = 1
+    await on_worked_choice(update, Mock())
+    return shown
+
+
+async def staggered(i: int) -> list:
+    await asyncio.sleep(i * TAP_INTERVAL)
+    return await tap(i)
+
+
+def pct(values: list) -> tuple:
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000
+
+
+async def run(profile: str, setup: str, taps: int) -> None:
+    FAKE.configure(parallel=1, **PROFILES[profile])
+    use(**SETUPS[setup])
+    results = await asyncio.gather(*(staggered(i) for i in range(taps)))
+    while replies._upgrades:
+        await asyncio.sleep(0.05)
+
+    first = [shown[0][0] for shown in results]
+    final = [shown[-1][0] for shown in results]
+    humanized = sum(shown[-1][1].endswith("🙂") for shown in results) / taps
+    print(f"{profile:>8} | {setup:>7} | " + " ".join(f"{ms:>6.0f}" for ms in pct(first)) + " | "
+          + " ".join(f"{ms:>6.0f}" for ms in pct(final)) + f" | {humanized:>8.0%} | {FAKE.stats['max_waiting']:>5}")
+
+
+async def main_async(taps: int, profiles: list) -> None:
+    print(f"{taps} taps every {TAP_INTERVAL}s, LLM_BUDGET_MS={replies.LLM_BUDGET_MS}")
+    print(f"{'':>8} | {'':>7} | {'first text (ms)':^20} | {'final text (ms)':^20} |")
+    print(f"{'model':>8} | {'setup':>7} | {'p50':>6} {'p95':>6} {'p99':>6} | {'p50':>6} {'p95':>6} {'p99':>6} | "
+          f"{'humanized':>8} | {'queue':>5}")
+    try:
+        for profile in profiles:
+            for setup in SETUPS:
+                await run(profile, setup, taps)
+    finally:
+        await aclose_llm()
+
+
+def main() -> None:
+    taps = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    profiles = sys.argv[2:] or list(PROFILES)
+    logging.disable(logging.WARNING)  # the failure profiles warn on every failed request
+    asyncio.run(main_async(taps, profiles))
+    FAKE.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: memory held by the loaded state - plain nested dicts versus the
+slotted DayState/Event model - and the cost of converting, for synthetic
+histories from one year to ten years.
+
+    python benchmarks/bench_model_memory.py
+"""
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_serializers import make_history  # noqa: E402
+from hilanchor.storage import TrackedState  # noqa: E402
+from hilanchor.storage.model import to_plain  # noqa: E402
+
+HISTORIES = [("1 year", 365), ("2 years", 730), ("5 years", 1826), ("10 years", 3652)]
+
+
+def retained_kb(build) -> float:
+    """Memory still allocated by build()'s result once it has returned."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size / 1024
+
+
+def timed_ms(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def main() -> None:
+    print(f"{'history':>10} | {'dicts KB':>9} | {'model KB':>9} | {'saved':>6} | {'convert ms':>10} | {'to JSON ms':>10}")
+    for label, days in HISTORIES:
+        raw = json.dumps(make_history(days)).encode("utf-8")
+        plain = retained_kb(lambda: json.loads(raw))
+        model = retained_kb(lambda: TrackedState(json.loads(raw)))
+
+        state = TrackedState(json.loads(raw))
+        assert json.loads(json.dumps(state, default=to_plain)) == json.loads(raw)
+        convert = timed_ms(lambda: TrackedState(json.loads(raw))) - timed_ms(lambda: json.loads(raw))
+        encode = timed_ms(lambda: json.dumps(state, default=to_plain))
+        print(f"{label:>10} | {plain:>9.0f} | {model:>9.0f} | {1 - model / plain:>6.0%} | "
+              f"{convert:>10.1f} | {encode:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
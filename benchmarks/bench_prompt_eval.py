@@ -0,0 +1,81 @@
+"""
+Benchmark: tokens the model evaluates per humanization, and the latency -
+the old single prompt (instructions repeated inside every prompt) versus
+the fixed SYSTEM_PROMPT plus a short per-call prompt, whose shared prefix
+Ollama keeps cached between calls.
+
+Needs a running Ollama with LLM_MODEL pulled:
+
+    python benchmarks/bench_prompt_eval.py [rounds]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ.setdefault("OWNER_USER_ID", "1")
+
+from hilanchor import messages as msg  # noqa: E402
+from hilanchor.llm import DEFAULT_MODEL, GENERATE_OPTIONS, SYSTEM_PROMPT, build_prompt, get_client  # noqa: E402
+
+# Short answers: the benchmark is about the prompt, not the generation
+OPTIONS = {**GENERATE_OPTIONS, "num_predict": 8}
+
+CALLS = [
+    (msg.WORKED_YES, "user worked today - asking what they did"),
+    (msg.WORKED_NO, "user didn't work - asking why"),
+    (msg.CHECKIN_14, "check-in at 14:00"),
+    (msg.nudge_message(15), "nudge after 15 minutes"),
+    (msg.CLOSE_FOR_DAY, "user closing for the day - encouraging"),
+]
+
+
+def legacy_prompt(original_message: str, context: str) -> str:
+    """The prompt as it was built before the instructions moved to SYSTEM_PROMPT."""
+    intro, guidelines = SYSTEM_PROMPT.split("\n\n", 1)
+    context_line = f"הקשר: {context}" if context else ""
+    return f"""{intro}
+
+הודעה מקורית: "{original_message}"
+{context_line}
+
+{guidelines}
+
+רק התגובה המעובדת, ללא הסברים:"""
+
+
+def run(label: str, make_request, rounds: int) -> None:
+    client = get_client()
+    evals, eval_ms, totals = [], [], []
+    for _ in range(rounds):
+        for message, context in CALLS:
+            t0 = time.perf_counter()
+            response = client.generate(model=DEFAULT_MODEL, options=OPTIONS, **make_request(message, context))
+            totals.append((time.perf_counter() - t0) * 1000)
+            evals.append(response.get("prompt_eval_count") or 0)
+            eval_ms.append((response.get("prompt_eval_duration") or 0) / 1e6)
+    print(f"{label:>14} | {statistics.mean(evals):>12.0f} | {statistics.mean(eval_ms):>12.1f} | "
+          f"{statistics.median(totals):>11.0f} | {max(totals):>9.0f}")
+
+
+def main() -> None:
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    message, context = CALLS[0]
+    print(f"prompt chars: single {len(legacy_prompt(message, context))}, "
+          f"system {len(SYSTEM_PROMPT)} + per call {len(build_prompt(message, context))}")
+    # Load the model first so neither side pays for it
+    try:
+        get_client().generate(model=DEFAULT_MODEL, prompt="")
+    except Exception as e:
+        print(f"Ollama is not reachable ({e}) - only the prompt sizes are shown")
+        return
+    print(f"model {DEFAULT_MODEL}, {rounds} rounds of {len(CALLS)} calls")
+    print(f"{'prompt':>14} | {'eval tokens':>12} | {'eval ms':>12} | {'median ms':>11} | {'max ms':>9}")
+    run("single prompt", lambda m, c: {"prompt": legacy_prompt(m, c)}, rounds)
+    run("system prompt", lambda m, c: {"prompt": build_prompt(m, c), "system": SYSTEM_PROMPT}, rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: encode/decode time and size of the state file per format,
+for synthetic histories from one month to five years.
+
+    python benchmarks/bench_serializers.py
+
+msgpack is skipped when it is not installed.
+"""
+import datetime as dt
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from hilanchor.storage import decode  # noqa: E402
+from hilanchor.storage.serializers import JsonSerializer, MsgpackSerializer  # noqa: E402
+
+HISTORIES = [("1 month", 30), ("6 months", 182), ("1 year", 365), ("2 years", 730), ("5 years", 1826)]
+RUNS = 5
+
+
+def make_history(days: int) -> dict:
+    state = {"notified_non_owner_user_ids": ["111", "222"], "context": "stuck"}
+    start = dt.date(2021, 1, 1)
+    for i in range(days):
+        key = (start + dt.timedelta(days=i)).isoformat()
+        state[key] = {
+            "mode": "work",
+            "worked": ("yes", "partial", "no")[i % 3],
+            "worked_ts": f"{key}T11:02:00+03:00",
+            "plan": "לכתוב את הפרק הבא ולשלוח לעריכה",
+            "plan_ts": f"{key}T11:05:00+03:00",
+            "need_followup": i % 2 == 0,
+            "fail_count": i % 4,
+            "done": True,
+            "events": [
+                {"ts": f"{key}T1{h}:00:00+03:00", "type": "free_note", "text": "כמה מילים על היום"}
+                for h in range(5)
+            ] + [{"ts": f"{key}T21:00:00+03:00", "type": "checkin_answer", "value": "yes"}],
+        }
+    return state
+
+
+def serializers():
+    found = [JsonSerializer(indent=2), JsonSerializer()]
+    try:
+        found.append(MsgpackSerializer())
+    except RuntimeError:
+        print("(msgpack not installed - skipping)")
+    return found
+
+
+def timed(fn, *args) -> float:
+    best = float("inf")
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main() -> None:
+    formats = serializers()
+    print(f"{'history':>10} | {'format':>11} | {'size KB':>9} | {'encode ms':>9} | {'decode ms':>9}")
+    for label, days in HISTORIES:
+        state = make_history(days)
+        baseline = None
+        for serializer in formats:
+            data = serializer.dumps(state)
+            assert decode(data) == state
+            baseline = baseline or len(data)
+            print(f"{label:>10} | {serializer.name:>11} | {len(data) / 1024:>9.1f} | "
+                  f"{timed(serializer.dumps, state):>9.2f} | {timed(decode, data):>9.2f}"
+                  f"   ({len(data) / baseline:.0%} of pretty)")
+        print()
+
+
+if __name__ == "__main__":
+    main()
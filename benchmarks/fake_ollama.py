@@ -0,0 +1,269 @@
+"""
+A stand-in for the Ollama server, for benchmarks and tests without a model.
+
+Serves /api/generate (whole answers and streams), /api/ps and /api/tags.
+The answer is the original message from the prompt plus a smiley, so it
+passes llm.py's checks. How long it takes is drawn from configurable
+distributions:
+
+    "300"                 always 300 ms
+    "uniform:100-500"     between 100 and 500 ms
+    "lognormal:300,0.5"   median 300 ms, sigma 0.5 (a long right tail)
+
+`latency` is the time to the first token (prompt evaluation), then every
+token takes `token_latency`. `error_rate` of the requests fail with HTTP 500,
+and `hang_rate` of them never answer (for `hang_seconds`). Like Ollama, at
+most `parallel` generations run at once and the rest wait their turn.
+
+    python benchmarks/fake_ollama.py --port 11435 --latency lognormal:300,0.5
+    OLLAMA_HOST=http://127.0.0.1:11435 USE_LLM=true python run.py
+"""
+import argparse
+import datetime as dt
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+MODEL = "llama3.2:3b"
+
+SETTINGS = ("latency", "token_latency", "error_rate", "hang_rate", "hang_seconds", "parallel")
+
+ORIGINAL = re.compile(r'הודעה מקורית: "(.*)"', re.S)
+TOKEN = re.compile(r"\S+\s*")
+
+
+class Latency:
+    """A latency distribution parsed from a spec string; sample() returns seconds."""
+
+    def __init__(self, spec: str, rng: random.Random) -> None:
+        self.spec = spec
+        self.rng = rng
+        kind, _, args = spec.partition(":")
+        try:
+            if not args:
+                ms = float(kind)
+                self._draw = lambda: ms
+            elif kind == "uniform":
+                lo, hi = (float(x) for x in args.split("-"))
+                self._draw = lambda: rng.uniform(lo, hi)
+            elif kind == "lognormal":
+                median, sigma = (float(x) for x in args.split(","))
+                self._draw = lambda: rng.lognormvariate(math.log(median), sigma)
+            else:
+                raise ValueError(kind)
+        except ValueError:
+            raise ValueError(f"Bad latency {spec!r} (expected 300, uniform:100-500 or lognormal:300,0.5)") from None
+
+    def sample(self) -> float:
+        return max(0.0, self._draw()) / 1000
+
+
+def answer_for(prompt: str) -> str:
+    match = ORIGINAL.search(prompt)
+    return f"{match.group(1) if match else prompt} 🙂" if prompt else ""
+
+
+class FakeOllama:
+    """The fake server in a background thread; start() it, or use it as a context manager."""
+
+    def __init__(
+        self,
+        latency: str = "lognormal:300,0.5",
+        token_latency: str = "20",
+        error_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_seconds: float = 60.0,
+        parallel: int = 1,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {}
+        self.configure(
+            latency=latency, token_latency=token_latency, error_rate=error_rate,
+            hang_rate=hang_rate, hang_seconds=hang_seconds, parallel=parallel,
+        )
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    def configure(self, **settings: Any) -> None:
+        """Change the behaviour (same arguments as the constructor) and reset the counters."""
+        for name, value in settings.items():
+            if name not in SETTINGS:
+                raise TypeError(f"Unknown setting {name!r}")
+            if name in ("latency", "token_latency"):
+                value = Latency(value, self._rng)
+            elif name == "parallel":
+                self._slots = threading.BoundedSemaphore(max(1, value))
+            setattr(self, name, value)
+        self.stats = dict.fromkeys(("requests", "streams", "errors", "hangs", "waiting", "max_waiting"), 0)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += delta
+            if name == "waiting":
+                self.stats["max_waiting"] = max(self.stats["max_waiting"], self.stats["waiting"])
+
+    def _fate(self) -> str:
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.hang_rate:
+            return "hang"
+        return "ok"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like Ollama
+
+    @property
+    def fake(self) -> FakeOllama:
+        return self.server.fake
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self) -> None:
+        model = {"model": MODEL, "name": MODEL, "size": 2_000_000_000}
+        if self.path == "/api/tags":
+            self._json(200, {"models": [model]})
+        elif self.path == "/api/ps":
+            expires = dt.datetime.now(dt.timezone.utc) + dt.timedelta(minutes=5)
+            self._json(200, {"models": [{**model, "expires_at": expires.isoformat(), "size_vram": 0}]})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        if self.path != "/api/generate":
+            self._json(404, {"error": "not found"})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        fake = self.fake
+        fake._count("requests")
+        fate = fake._fate()
+        if fate == "error":
+            fake._count("errors")
+            self._json(500, {"error": "fake failure"})
+            return
+
+        fake._count("waiting")
+        try:
+            with fake._slots:
+                fake._count("waiting", -1)
+                if fate == "hang":
+                    fake._count("hangs")
+                    time.sleep(fake.hang_seconds)
+                    self.close_connection = True
+                    return
+                self._generate(request)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up
+
+    def _generate(self, request: Dict[str, Any]) -> None:
+        fake = self.fake
+        start = time.monotonic()
+        prompt_eval = fake.latency.sample()
+        time.sleep(prompt_eval)
+        tokens = TOKEN.findall(answer_for(request.get("prompt", "")))
+        base = {"model": request.get("model", MODEL), "created_at": dt.datetime.now(dt.timezone.utc).isoformat()}
+
+        def final() -> Dict[str, Any]:
+            return {
+                **base, "done": True, "done_reason": "stop",
+                "total_duration": int((time.monotonic() - start) * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": len(request.get("system", "") + request.get("prompt", "")) // 4,
+                "prompt_eval_duration": int(prompt_eval * 1e9),
+                "eval_count": len(tokens),
+            }
+
+        if not request.get("stream", True):
+            for _ in tokens:
+                time.sleep(fake.token_latency.sample())
+            self._json(200, {**final(), "response": "".join(tokens)})
+            return
+
+        fake._count("streams")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(fake.token_latency.sample())
+            self._chunk({**base, "response": token, "done": False})
+        self._chunk({**final(), "response": ""})
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", default="lognormal:300,0.5", help="time to the first token (ms)")
+    parser.add_argument("--token-latency", default="20", help="time per further token (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    parser.add_argument("--parallel", type=int, default=1)
+    args = parser.parse_args()
+
+    fake = FakeOllama(
+        latency=args.latency, token_latency=args.token_latency, error_rate=args.error_rate,
+        hang_rate=args.hang_rate, hang_seconds=args.hang_seconds, parallel=args.parallel,
+        host=args.host, port=args.port,
+    )
+    print(f"Fake Ollama on {fake.url} - set OLLAMA_HOST={fake.url}")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
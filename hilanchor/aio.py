@@ -0,0 +1,71 @@
+"""
+Blocking disk I/O off the asyncio event loop.
+
+State and journal reads/writes run on one dedicated worker thread, so a slow
+disk delays only the I/O itself, never Telegram polling or scheduled jobs.
+A single worker also keeps writes in submission order. At most IO_QUEUE_SIZE
+operations wait for the worker at a time; further callers wait their turn
+asynchronously (back-pressure instead of an unbounded backlog).
+"""
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from .config import IO_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+IO_STATS: Dict[str, int] = {"submitted": 0, "queued": 0, "peak_queued": 0}
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hilanchor-io")
+# Semaphores belong to one event loop; tests and restarts may use several
+_slots: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+
+
+def _semaphore() -> asyncio.Semaphore:
+    global _slots
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots[0] is not loop:
+        _slots = (loop, asyncio.Semaphore(IO_QUEUE_SIZE))
+    return _slots[1]
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking function on the I/O thread and await its result. It runs
+    in a copy of the caller's context, so it sees the same current user.
+    """
+    async with _semaphore():
+        IO_STATS["submitted"] += 1
+        IO_STATS["queued"] += 1
+        IO_STATS["peak_queued"] = max(IO_STATS["peak_queued"], IO_STATS["queued"])
+        ctx = contextvars.copy_context()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                _executor, partial(ctx.run, fn, *args, **kwargs)
+            )
+        finally:
+            IO_STATS["queued"] -= 1
+
+
+def get_io_stats() -> Dict[str, int]:
+    """Return a copy of the I/O queue counters."""
+    return dict(IO_STATS)
+
+
+async def shutdown_io(app: Any = None) -> None:
+    """
+    Flush pending state writes and wait for queued I/O.
+    Used as the Application post_shutdown hook in run.py.
+    """
+    from .state_store import flush_state
+
+    logger.info("💾 Flushing state to disk before shutdown...")
+    await run_io(flush_state)
+    _executor.shutdown(wait=True)
+    logger.info("💾 All state written")
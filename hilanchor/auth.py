@@ -2,7 +2,8 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from .config import OWNER_USER_ID_INT
-from .state_store import load_state, has_notified_non_owner, mark_notified_non_owner
+from .state_store import aremember_non_owner
+from .users import is_allowed, set_current_user
 from . import messages as msg
 
 
@@ -13,21 +14,25 @@ def is_owner(update: Update) -> bool:
     )
 
 
+def is_allowed_user(update: Update) -> bool:
+    """The owner or a user from ALLOWED_USER_IDS."""
+    return update.effective_user is not None and is_allowed(update.effective_user.id)
+
+
 async def reject_non_owner(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    if is_owner(update):
+    if is_allowed_user(update):
+        # The rest of this update works on this user's state
+        set_current_user(update.effective_user.id)
         return False
 
     user = update.effective_user
     if not user:
         return True
 
-    state = load_state()
-    if has_notified_non_owner(state, user.id):
+    if not await aremember_non_owner(user.id):
         # Silent ignore after the first time
         return True
 
-    mark_notified_non_owner(state, user.id)
-
     if update.message:
         await update.message.reply_text(msg.AUTH_UNAUTHORIZED_USER)
     elif update.callback_query:
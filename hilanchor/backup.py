@@ -0,0 +1,214 @@
+"""
+Backups of the bot's files: the state (with its log, archive, stranger list
+and per-user shards) and the personal journal, as incremental deduplicated
+snapshots in BACKUP_DIR - see storage/snapshots.py.
+
+A nightly job takes a snapshot and applies the retention rules. By hand:
+
+    python -m hilanchor.backup now
+    python -m hilanchor.backup list
+    python -m hilanchor.backup restore latest            # in place - stop the bot first
+    python -m hilanchor.backup restore 20250102T034500Z --to restored/
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .aio import run_io
+from .config import (
+    BACKUP_DIR, BACKUP_KEEP_DAILY, BACKUP_KEEP_WEEKLY, BACKUP_KEEP_MONTHLY, JOURNAL_PATH,
+)
+from .state_store import commit_lock
+from .storage.atomic import atomic_write_bytes
+from .storage.snapshots import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+# What is stored next to the state under its name: the SQLite WAL/journal,
+# the change log, the day archive and the stranger list. Other files that
+# share the prefix - the LLM cache, the variant pool - are not state, and the
+# commit lock does not cover their writes
+_STATE_SUFFIXES = ("", "-wal", "-journal", ".log", ".archive", ".seen")
+
+# Never part of a backup: last-good copies, temp files, locks, SQLite shared memory
+_SKIPPED_SUFFIXES = (".tmp", ".lock", "-shm")
+
+
+def get_store() -> SnapshotStore:
+    return SnapshotStore(BACKUP_DIR)
+
+
+def _skipped(path: Path) -> bool:
+    return ".bak." in path.name or path.name.endswith(_SKIPPED_SUFFIXES)
+
+
+def _users_dir(location: Path) -> Path:
+    return location.with_name(f"{location.stem}.users")
+
+
+def _state_names(location: Path, shards: bool = True) -> List[str]:
+    """Names of the state file/directory and its sidecars (and the shard directory), next to each other."""
+    names = [f"{location.name}{suffix}" for suffix in _STATE_SUFFIXES]
+    return sorted(names + [_users_dir(location).name] if shards else names)
+
+
+def _state_files(location: Path, shards: bool = True) -> Iterator[Path]:
+    """The files of the state: the state file/directory, its sidecars and the per-user shards."""
+    for name in _state_names(location, shards):
+        entry = location.with_name(name)
+        if entry.is_dir():
+            yield from (p for p in sorted(entry.rglob("*")) if p.is_file() and not _skipped(p))
+        elif entry.is_file() and not _skipped(entry):
+            yield entry
+
+
+def _shard_locations(location: Path) -> List[Path]:
+    """The state location of every user's shard (see state_store.shard_path)."""
+    users = _users_dir(location)
+    if not users.is_dir():
+        return []
+    ids = {p.name.split(".", 1)[0] for p in users.iterdir()}
+    return [users / f"{user_id}{location.suffix}" for user_id in sorted(ids) if user_id.isdigit()]
+
+
+def _is_state_name(name: str, location: Path) -> bool:
+    """Whether a snapshot file name belongs to the state or the journal (older snapshots may hold more)."""
+    label, _, relative = name.partition("/")
+    return label == "journal" or relative.split("/", 1)[0] in _state_names(location)
+
+
+def _roots(location: Path, target: Optional[Path] = None) -> Dict[str, Path]:
+    """Where each labelled group of files lives (or is restored to)."""
+    if target is not None:
+        return {"state": target / "state", "journal": target / "journal"}
+    return {"state": location.parent, "journal": Path(JOURNAL_PATH).parent}
+
+
+def _current_files(location: Path) -> Dict[str, Path]:
+    roots = _roots(location)
+    files = {f"state/{p.relative_to(roots['state']).as_posix()}": p for p in _state_files(location)}
+    journal = Path(JOURNAL_PATH)
+    if journal.is_file():
+        files[f"journal/{journal.name}"] = journal
+    return files
+
+
+def _read(paths: Iterator[Path], root: Path) -> Dict[str, bytes]:
+    return {f"state/{p.relative_to(root).as_posix()}": p.read_bytes() for p in paths}
+
+
+def read_sources() -> Dict[str, bytes]:
+    """
+    Contents of every file to back up. The owner's files are read under the
+    owner's commit lock and each user's shard under its own, so no commit
+    lands halfway through any of them.
+    """
+    with commit_lock() as location:
+        files = _read(_state_files(location, shards=False), location.parent)
+        journal = Path(JOURNAL_PATH)
+        if journal.is_file():
+            files[f"journal/{journal.name}"] = journal.read_bytes()
+    for shard in _shard_locations(location):
+        with commit_lock(shard):
+            files.update(_read(_state_files(shard, shards=False), location.parent))
+    return files
+
+
+def backup_now(store: Optional[SnapshotStore] = None) -> Dict[str, Any]:
+    """Take a snapshot and apply the retention rules. Returns the snapshot stats."""
+    store = store or get_store()
+    stats = store.create(read_sources())
+    stats["pruned"] = len(store.prune(BACKUP_KEEP_DAILY, BACKUP_KEEP_WEEKLY, BACKUP_KEEP_MONTHLY))
+    return stats
+
+
+async def abackup_now() -> Dict[str, Any]:
+    """backup_now() for the event loop: files are read on the I/O thread, chunked on another."""
+    store = get_store()
+    files = await run_io(read_sources)
+    stats = await asyncio.to_thread(store.create, files)
+    removed = await asyncio.to_thread(store.prune, BACKUP_KEEP_DAILY, BACKUP_KEEP_WEEKLY, BACKUP_KEEP_MONTHLY)
+    stats["pruned"] = len(removed)
+    return stats
+
+
+def restore(snapshot_id: str, target: Optional[Path] = None, store: Optional[SnapshotStore] = None) -> int:
+    """
+    Write the files of a snapshot back. Without target they replace the
+    live files: the current ones are snapshotted first (so the restore
+    itself can be undone) and state files that did not exist at snapshot
+    time are removed, e.g. a newer change log that would otherwise be
+    replayed on top. Returns the number of files written.
+    """
+    store = store or get_store()
+    if snapshot_id == "latest":
+        snapshots = store.snapshots()
+        if not snapshots:
+            raise KeyError("No backups yet")
+        snapshot_id = snapshots[-1]
+    names = list(store.manifest(snapshot_id)["files"])
+
+    if target is not None:
+        roots = _roots(Path("."), Path(target))
+        for name in names:
+            _write(store, snapshot_id, name, roots)
+        return len(names)
+
+    safety = store.create(read_sources())
+    logger.info(f"💾 Current files saved as backup {safety['id']} before restoring {snapshot_id}")
+    with commit_lock() as location:
+        roots = _roots(location)
+        skipped = [name for name in names if not _is_state_name(name, location)]
+        if skipped:
+            logger.info(f"⏭️ Not restoring {len(skipped)} files that are not state: {', '.join(skipped)}")
+            names = [name for name in names if name not in skipped]
+        for name, path in _current_files(location).items():
+            if name not in names:
+                path.unlink()
+        for name in names:
+            _write(store, snapshot_id, name, roots)
+    return len(names)
+
+
+def _write(store: SnapshotStore, snapshot_id: str, name: str, roots: Dict[str, Path]) -> None:
+    label, _, relative = name.partition("/")
+    path = roots[label] / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_bytes(path, store.read_file(snapshot_id, name))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Back up or restore the bot's state and journal")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("now", help="take a backup now")
+    commands.add_parser("list", help="list backups")
+    restore_cmd = commands.add_parser("restore", help="restore a backup")
+    restore_cmd.add_argument("snapshot", help="backup ID from `list`, or latest")
+    restore_cmd.add_argument("--to", type=Path, help="write the files here instead of over the live ones")
+    args = parser.parse_args(argv)
+
+    store = get_store()
+    if args.command == "now":
+        stats = backup_now(store)
+        print(f"✅ Backup {stats['id']}: {stats['files']} files, {stats['written']} new bytes stored")
+    elif args.command == "list":
+        for snapshot_id in store.snapshots():
+            files = store.manifest(snapshot_id)["files"]
+            print(f"{snapshot_id}  {len(files):>4} files  {sum(f['size'] for f in files.values()):>10} bytes")
+    else:
+        if args.to is None:
+            print("⚠️ Restoring over the live files - make sure the bot is stopped")
+        try:
+            count = restore(args.snapshot, args.to, store)
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
+            return 1
+        print(f"✅ Restored {count} files from {args.snapshot}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,12 +16,133 @@ if not OWNER_USER_ID or not OWNER_USER_ID.isdigit():
 OWNER_USER_ID_INT = int(OWNER_USER_ID)
 OWNER_CHAT_ID_INT = OWNER_USER_ID_INT  # assuming chat ID is same as user ID for private chats
 
+# Multi-user mode - more Telegram user IDs allowed besides the owner
+# (comma separated). Each gets their own state under "<STATE_PATH>.users/".
+_allowed = [x.strip() for x in os.getenv("ALLOWED_USER_IDS", "").split(",") if x.strip()]
+if not all(x.isdigit() for x in _allowed):
+    raise ValueError("ALLOWED_USER_IDS must be a comma separated list of numeric user IDs")
+ALLOWED_USER_IDS = frozenset({OWNER_USER_ID_INT, *(int(x) for x in _allowed)})
+
+# Day boundaries and scheduled messages follow each user's timezone:
+# USER_TIMEZONES=123:Europe/Berlin,456:America/New_York
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "Asia/Jerusalem")
+USER_TIMEZONES = {}
+for _item in filter(None, (x.strip() for x in os.getenv("USER_TIMEZONES", "").split(","))):
+    _uid, _, _tz = _item.partition(":")
+    if not _uid.strip().isdigit() or not _tz.strip():
+        raise ValueError(f"Invalid USER_TIMEZONES entry: {_item!r} (expected <user_id>:<timezone>)")
+    USER_TIMEZONES[int(_uid)] = _tz.strip()
+
 STATE_PATH = os.getenv("STATE_PATH", "state.json")
 JOURNAL_PATH = os.getenv("JOURNAL_PATH", "personal_journal.txt")
 
+# State change log - append updates to "<STATE_PATH>.log" instead of rewriting
+# the JSON file, and fold the log into the snapshot past a size/age threshold
+STATE_EVENT_LOG = os.getenv("STATE_EVENT_LOG", "false").lower() in ("true", "1", "yes")
+STATE_LOG_COMPACT_BYTES = int(os.getenv("STATE_LOG_COMPACT_BYTES", str(512 * 1024)))
+STATE_LOG_COMPACT_SECONDS = int(os.getenv("STATE_LOG_COMPACT_SECONDS", str(6 * 3600)))
+
+# Crash safety - number of last-good copies (state.json.bak.N) to keep, and
+# an optional group-commit window that batches concurrent writes into one
+# fsync (each save still waits until its data is on disk)
+STATE_BACKUPS = int(os.getenv("STATE_BACKUPS", "3"))
+STATE_GROUP_COMMIT_MS = int(os.getenv("STATE_GROUP_COMMIT_MS", "0"))
+
+# State file format: json (compact), json-pretty or msgpack; any of them is
+# read back regardless of this setting
+STATE_FORMAT = os.getenv("STATE_FORMAT", "json")
+
+# Days older than this move to the compressed archive "<STATE_PATH>.archive"
+# (nightly job); 0 keeps everything in the hot state
+STATE_ARCHIVE_AFTER_DAYS = int(os.getenv("STATE_ARCHIVE_AFTER_DAYS", "60"))
+
+# Non-owner IDs already answered live in "<STATE_PATH>.seen"; optional Bloom
+# filter size in bits in front of the in-memory set (0 = off)
+SEEN_USERS_BLOOM_BITS = int(os.getenv("SEEN_USERS_BLOOM_BITS", "0"))
+
+# Flood guard - per-user burst size and refill rate (updates/second), and how
+# long a non-owner's updates are dropped after their first one
+FLOOD_BURST = int(os.getenv("FLOOD_BURST", "10"))
+FLOOD_RATE = float(os.getenv("FLOOD_RATE", "1.0"))
+FLOOD_DENY_SECONDS = int(os.getenv("FLOOD_DENY_SECONDS", "3600"))
+
+# Nightly incremental backups of the state files and the journal into
+# BACKUP_DIR (default "<STATE_PATH>.backups"), deduplicated by content; how
+# many daily / weekly / monthly snapshots to keep
+BACKUP_ENABLED = os.getenv("BACKUP_ENABLED", "true").lower() in ("true", "1", "yes")
+BACKUP_DIR = os.getenv("BACKUP_DIR") or f"{STATE_PATH.rstrip('/')}.backups"
+BACKUP_KEEP_DAILY = int(os.getenv("BACKUP_KEEP_DAILY", "7"))
+BACKUP_KEEP_WEEKLY = int(os.getenv("BACKUP_KEEP_WEEKLY", "4"))
+BACKUP_KEEP_MONTHLY = int(os.getenv("BACKUP_KEEP_MONTHLY", "12"))
+
+# Per-user state shards kept open (and cached in memory) at once
+STATE_OPEN_SHARDS = int(os.getenv("STATE_OPEN_SHARDS", "256"))
+
+# Max state/journal disk operations waiting for the I/O thread at once
+IO_QUEUE_SIZE = int(os.getenv("IO_QUEUE_SIZE", "64"))
+
 # LLM Configuration - DISABLED by default (set USE_LLM=true in .env to enable)
 USE_LLM = os.getenv("USE_LLM", "false").lower() in ("true", "1", "yes")
 LLM_MODEL = os.getenv("LLM_MODEL", "llama3.2:3b")
+# Ollama server (default: OLLAMA_HOST or http://localhost:11434) and how long
+# to wait for it - connecting, and for the generated text (seconds)
+OLLAMA_HOST = os.getenv("OLLAMA_HOST") or None
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "30"))
+
+# How long a reply waits for its humanized text before the original is sent
+# (then edited once the text arrives, if within LLM_UPGRADE_DEADLINE seconds),
+# overridable per call site: LLM_BUDGETS=checkin:5000,worked:300
+LLM_BUDGET_MS = int(os.getenv("LLM_BUDGET_MS", "700"))
+LLM_BUDGETS = {}
+for _item in filter(None, (x.strip() for x in os.getenv("LLM_BUDGETS", "").split(","))):
+    _site, _, _ms = _item.partition(":")
+    if not _site.strip() or not _ms.strip().isdigit():
+        raise ValueError(f"Invalid LLM_BUDGETS entry: {_item!r} (expected <site>:<milliseconds>)")
+    LLM_BUDGETS[_site.strip()] = int(_ms)
+LLM_UPGRADE_DEADLINE = float(os.getenv("LLM_UPGRADE_DEADLINE", "20"))
+# Show replies while they are generated, editing the message at most every
+# LLM_STREAM_EDIT_INTERVAL seconds (Telegram's per-chat edit rate)
+LLM_STREAM = os.getenv("LLM_STREAM", "false").lower() in ("true", "1", "yes")
+LLM_STREAM_EDIT_INTERVAL = float(os.getenv("LLM_STREAM_EDIT_INTERVAL", "1.0"))
+# Stop calling the model for LLM_BREAKER_COOLDOWN seconds after
+# LLM_BREAKER_FAILURES failed calls in a row (an answer - or a stream's first
+# token - later than LLM_BREAKER_SLOW_SECONDS counts as failed), and while
+# LLM_MAX_QUEUE generations are already waiting (0 = no limit)
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "10"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "3"))
+
+
+def _hours(name: str, default: str) -> tuple:
+    """An hour range "<from>-<to>" (0-23, may wrap past midnight) from the environment."""
+    parts = os.getenv(name, default).split("-")
+    if len(parts) != 2 or not all(x.strip().isdigit() and int(x) < 24 for x in parts):
+        raise ValueError(f"{name} must look like {default} (hours 0-23)")
+    return int(parts[0]), int(parts[1])
+
+
+# Keep LLM_MODEL loaded in Ollama's memory during these hours (owner's time,
+# around the 11:00-22:00 messages) and let it go outside them
+LLM_ACTIVE_HOURS = _hours("LLM_ACTIVE_HOURS", "10-23")
+
+# Pre-generated variants per static message (0 = always generate live),
+# refilled between the idle hours "<from>-<to>" (owner's time) and kept in
+# VARIANT_POOL_PATH across restarts
+VARIANT_POOL_SIZE = int(os.getenv("VARIANT_POOL_SIZE", "5"))
+VARIANT_POOL_PATH = os.getenv("VARIANT_POOL_PATH") or f"{STATE_PATH.rstrip('/')}.variants"
+VARIANT_POOL_IDLE_HOURS = _hours("VARIANT_POOL_IDLE_HOURS", "0-7")
+
+# Cache of humanized texts: prompts kept in memory (0 = no cache) and on
+# disk in LLM_CACHE_PATH (0 = memory only), texts kept per prompt, their
+# lifetime, and the share of hits that still ask the model for a fresh text
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+LLM_CACHE_DISK_SIZE = int(os.getenv("LLM_CACHE_DISK_SIZE", "5000"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH") or f"{STATE_PATH.rstrip('/')}.llmcache.db"
+LLM_CACHE_VARIANTS = int(os.getenv("LLM_CACHE_VARIANTS", "5"))
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))
+LLM_CACHE_SAMPLE_RATE = float(os.getenv("LLM_CACHE_SAMPLE_RATE", "0.2"))
 
 # Proxy Configuration - Optional (for networks that block Telegram)
 # Set in .env: PROXY_URL=http://your-proxy:port or socks5://your-proxy:port
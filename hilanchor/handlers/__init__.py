@@ -3,6 +3,7 @@ from .patterns import (
     CB_BIG_ACTION_PATTERN, CB_NUDGE_PROGRESS_PATTERN, CB_TIMING_PATTERN
 )
 
+from .guard import flood_guard, get_guard_stats
 from .commands import start, checkin, summary, journal, journal_add, journal_info
 from .free_text import on_free_text
 
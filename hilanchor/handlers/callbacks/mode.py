@@ -5,10 +5,10 @@ from telegram.ext import ContextTypes
 from ...auth import reject_non_owner
 from ...keyboards import kb_worked
 from ...state_store import (
-    load_state, save_state,
+    atransaction,
     set_mode, append_event
 )
-from ...llm import humanize_message
+from ...replies import send_humanized
 from ... import messages as msg
 
 logger = logging.getLogger(__name__)
@@ -23,21 +23,33 @@ async def on_mode_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     _, today_mode = query.data.split(":", 1)
     logger.info(f"🎯 User selected mode: {today_mode}")
 
-    state = load_state()
-    set_mode(state, today_mode)
-    append_event(state, "mode_set", value=today_mode)
-    save_state(state)
+    async with atransaction(chat_id=query.message.chat_id) as state:
+        set_mode(state, today_mode)
+        append_event(state, "mode_set", value=today_mode)
     logger.info(f"💾 Saved mode '{today_mode}' to state")
 
     if today_mode == "kid":
-        text = humanize_message(msg.MODE_KID_CONFIRMED, context="confirming kid mode")
-        await query.edit_message_text(text)
+        await send_humanized(
+            query.edit_message_text,
+            msg.MODE_KID_CONFIRMED,
+            context="confirming kid mode",
+            site="mode"
+        )
         logger.info("📤 Sent kid mode confirmation")
     else:
-        text = humanize_message(msg.MODE_WORK_CONFIRMED, context="confirming work mode")
-        await query.edit_message_text(text)
+        await send_humanized(
+            query.edit_message_text,
+            msg.MODE_WORK_CONFIRMED,
+            context="confirming work mode",
+            site="mode"
+        )
         logger.info("📤 Sent work mode confirmation")
 
-    checkin_msg = humanize_message(msg.MODE_FIRST_CHECKIN, context="first check-in after mode selection")
-    await query.message.reply_text(checkin_msg, reply_markup=kb_worked())
+    await send_humanized(
+        query.message.reply_text,
+        msg.MODE_FIRST_CHECKIN,
+        context="first check-in after mode selection",
+        site="mode",
+        reply_markup=kb_worked()
+    )
     logger.info("📤 Sent first check-in prompt")
\ No newline at end of file
@@ -4,10 +4,10 @@ from telegram.ext import ContextTypes
 from ...auth import reject_non_owner
 from ...keyboards import kb_big_action
 from ...state_store import (
-    load_state, save_state,
+    atransaction,
     set_context, set_waiting, append_event
 )
-from ...llm import humanize_message
+from ...replies import send_humanized
 from ... import messages as msg
 
 async def on_no_reason(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -18,38 +18,41 @@ async def on_no_reason(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         return
 
     _, reason = query.data.split(":", 1)
-    state = load_state()
 
     if reason == "big":
-        set_context(state, "overwhelmed")
-        append_event(state, "context", value="overwhelmed")
-        save_state(state)
-        text = humanize_message(
+        async with atransaction(chat_id=query.message.chat_id) as state:
+            set_context(state, "overwhelmed")
+            append_event(state, "context", value="overwhelmed")
+        await send_humanized(
+            query.edit_message_text,
             msg.REASON_BIG,
-            context="task too big - suggesting to break it down"
+            context="task too big - suggesting to break it down",
+            site="noreason",
+            reply_markup=kb_big_action()
         )
-        await query.edit_message_text(text, reply_markup=kb_big_action())
         return
 
     if reason == "stuck":
-        set_context(state, "stuck")
-        append_event(state, "context", value="stuck")
-        set_waiting(state, "no_stuck_first_action")
-        save_state(state)
-        text = humanize_message(
+        async with atransaction(chat_id=query.message.chat_id) as state:
+            set_context(state, "stuck")
+            append_event(state, "context", value="stuck")
+            set_waiting(state, "no_stuck_first_action")
+        await send_humanized(
+            query.edit_message_text,
             msg.REASON_STUCK,
-            context="user stuck - asking for first technical step"
+            context="user stuck - asking for first technical step",
+            site="noreason"
         )
-        await query.edit_message_text(text)
         return
 
     # reason == "fear"
-    set_context(state, "fear")
-    append_event(state, "context", value="fear")
-    set_waiting(state, "no_fear_reframe")
-    save_state(state)
-    text = humanize_message(
+    async with atransaction(chat_id=query.message.chat_id) as state:
+        set_context(state, "fear")
+        append_event(state, "context", value="fear")
+        set_waiting(state, "no_fear_reframe")
+    await send_humanized(
+        query.edit_message_text,
         msg.REASON_FEAR,
-        context="user afraid of failure - reframing expectations"
+        context="user afraid of failure - reframing expectations",
+        site="noreason"
     )
-    await query.edit_message_text(text)
@@ -6,11 +6,11 @@ from ...auth import reject_non_owner
 from ...keyboards import kb_yes_next
 from ...nudges import cancel_existing_nudge
 from ...state_store import (
-    load_state, save_state,
+    atransaction,
     reset_fail, bump_fail,
     mark_done, set_need_followup, set_waiting, append_event
 )
-from ...llm import humanize_message
+from ...replies import send_humanized
 from ... import messages as msg
 
 logger = logging.getLogger(__name__)
@@ -23,34 +23,41 @@ async def on_nudge_progress(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     _, prog = query.data.split(":", 1)
-    state = load_state()
 
     if prog == "flow":
         # User is in flow - cancel nudges but don't close the day
         logger.info("🌊 User selected 'in flow' mode from nudge")
-        set_need_followup(state, False)
-        append_event(state, "in_flow", value=True)
-        save_state(state)
+        async with atransaction(chat_id=query.message.chat_id) as state:
+            set_need_followup(state, False)
+            append_event(state, "in_flow", value=True)
         cancel_existing_nudge(context, query.message.chat_id)
-        text = humanize_message(msg.IN_FLOW_CONFIRMED, context="user is in flow - no interruptions")
-        logger.info(f"🌊 Sending flow confirmation: {text[:50]}...")
-        await query.edit_message_text(text)
+        logger.info("🌊 Sending flow confirmation")
+        await send_humanized(
+            query.edit_message_text,
+            msg.IN_FLOW_CONFIRMED,
+            context="user is in flow - no interruptions",
+            site="nudge_progress"
+        )
         logger.info("🌊 Flow confirmation sent successfully")
         return
 
     if prog in ("yes", "partial"):
-        reset_fail(state)
-        save_state(state)
+        async with atransaction(chat_id=query.message.chat_id) as state:
+            reset_fail(state)
         if prog == "yes":
-            text = humanize_message(msg.NUDGE_YES_PROGRESS, context="user made progress - asking continue or close")
-            await query.edit_message_text(text, reply_markup=kb_yes_next())
+            await send_humanized(
+                query.edit_message_text,
+                msg.NUDGE_YES_PROGRESS,
+                context="user made progress - asking continue or close",
+                site="nudge_progress",
+                reply_markup=kb_yes_next()
+            )
         else:
-            text = humanize_message(
+            await send_humanized(
+                query.edit_message_text,
                 msg.NUDGE_PARTIAL_PROGRESS,
-                context="user made partial progress - offering more time or close"
-            )
-            await query.edit_message_text(
-                text,
+                context="user made partial progress - offering more time or close",
+                site="nudge_progress",
                 reply_markup=InlineKeyboardMarkup([
                     [
                         InlineKeyboardButton(msg.BTN_CONTINUE_10, callback_data="yesnext:continue"),
@@ -63,16 +70,26 @@ async def on_nudge_progress(update: Update, context: ContextTypes.DEFAULT_TYPE)
             )
         return
 
-    fail = bump_fail(state)
+    async with atransaction(chat_id=query.message.chat_id) as state:
+        fail = bump_fail(state)
+        if fail >= 2:
+            mark_done(state, True)
+            set_need_followup(state, False)
+        else:
+            set_waiting(state, "partial_plan")
+
     if fail >= 2:
-        mark_done(state, True)
-        set_need_followup(state, False)
-        save_state(state)
-        text = humanize_message(msg.NUDGE_GIVE_UP, context="user struggled twice - releasing for the day with compassion")
-        await query.edit_message_text(text)
+        await send_humanized(
+            query.edit_message_text,
+            msg.NUDGE_GIVE_UP,
+            context="user struggled twice - releasing for the day with compassion",
+            site="nudge_progress"
+        )
         return
 
-    text = humanize_message(msg.NUDGE_NO_PROGRESS, context="user didn't progress - asking for smallest possible 2min task")
-    await query.edit_message_text(text)
-    set_waiting(state, "partial_plan")
-    save_state(state)
+    await send_humanized(
+        query.edit_message_text,
+        msg.NUDGE_NO_PROGRESS,
+        context="user didn't progress - asking for smallest possible 2min task",
+        site="nudge_progress"
+    )
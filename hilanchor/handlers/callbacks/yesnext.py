@@ -5,10 +5,10 @@ from telegram.ext import ContextTypes
 from ...auth import reject_non_owner
 from ...nudges import schedule_nudge, cancel_existing_nudge
 from ...state_store import (
-    load_state, save_state,
+    atransaction,
     mark_done, set_need_followup, append_event
 )
-from ...llm import humanize_message
+from ...replies import send_humanized
 from ... import messages as msg
 
 logger = logging.getLogger(__name__)
@@ -21,35 +21,46 @@ async def on_yes_next(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         return
 
     _, choice = query.data.split(":", 1)
-    state = load_state()
 
     if choice == "close":
-        mark_done(state, True)
-        set_need_followup(state, False)
-        append_event(state, "closed", value=True)
-        save_state(state)
+        async with atransaction(chat_id=query.message.chat_id) as state:
+            mark_done(state, True)
+            set_need_followup(state, False)
+            append_event(state, "closed", value=True)
         cancel_existing_nudge(context, query.message.chat_id)
-        text = humanize_message(msg.CLOSE_FOR_DAY, context="user closing for the day - encouraging")
-        await query.edit_message_text(text)
+        await send_humanized(
+            query.edit_message_text,
+            msg.CLOSE_FOR_DAY,
+            context="user closing for the day - encouraging",
+            site="yesnext"
+        )
         return
 
     if choice == "flow":
         # User is in flow - cancel nudges but don't close the day
         logger.info("🌊 User selected 'in flow' mode")
-        set_need_followup(state, False)
-        append_event(state, "in_flow", value=True)
-        save_state(state)
+        async with atransaction(chat_id=query.message.chat_id) as state:
+            set_need_followup(state, False)
+            append_event(state, "in_flow", value=True)
         cancel_existing_nudge(context, query.message.chat_id)
-        text = humanize_message(msg.IN_FLOW_CONFIRMED, context="user is in flow - no interruptions")
-        logger.info(f"🌊 Sending flow confirmation: {text[:50]}...")
-        await query.edit_message_text(text)
+        logger.info("🌊 Sending flow confirmation")
+        await send_humanized(
+            query.edit_message_text,
+            msg.IN_FLOW_CONFIRMED,
+            context="user is in flow - no interruptions",
+            site="yesnext"
+        )
         logger.info("🌊 Flow confirmation sent successfully")
         return
 
     # choice == "continue"
-    set_need_followup(state, True)
-    append_event(state, "continue", value=True)
-    save_state(state)
-    text = humanize_message(msg.CONTINUE_30MIN, context="user wants to continue - scheduling 60min check-in")
-    await query.edit_message_text(text)
+    async with atransaction(chat_id=query.message.chat_id) as state:
+        set_need_followup(state, True)
+        append_event(state, "continue", value=True)
+    await send_humanized(
+        query.edit_message_text,
+        msg.CONTINUE_30MIN,
+        context="user wants to continue - scheduling 60min check-in",
+        site="yesnext"
+    )
     schedule_nudge(context, chat_id=query.message.chat_id, minutes=60)
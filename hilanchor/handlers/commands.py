@@ -5,11 +5,12 @@ from telegram.ext import ContextTypes
 from ..auth import reject_non_owner
 from ..keyboards import kb_worked, kb_day_mode
 from ..state_store import (
-    load_state, save_state,
+    atransaction,
     set_mode, append_event, set_waiting
 )
 from ..summary import generate_daily_summary
-from ..journal import read_journal, append_to_journal, get_journal_summary
+from ..journal import aread_journal, aget_journal_summary
+from ..aio import run_io
 from .. import messages as msg
 
 logger = logging.getLogger(__name__)
@@ -52,7 +53,7 @@ async def summary(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
 
     logger.info("📊 Generating daily summary...")
-    summary_text = generate_daily_summary()
+    summary_text = await run_io(generate_daily_summary)
     logger.info("📤 Sending daily summary")
     await update.message.reply_text(summary_text, parse_mode="Markdown")
 
@@ -67,7 +68,7 @@ async def journal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
 
     logger.info("📖 Reading journal content...")
-    journal_content = read_journal()
+    journal_content = await aread_journal()
 
     # Telegram message limit is 4096 characters
     if len(journal_content) > 4000:
@@ -91,9 +92,8 @@ async def journal_add(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         logger.warning(f"⛔ Rejected /journal_add from unauthorized user {user_id}")
         return
 
-    state = load_state()
-    set_waiting(state, "journal_add")
-    save_state(state)
+    async with atransaction(chat_id=update.effective_chat.id) as state:
+        set_waiting(state, "journal_add")
 
     logger.info("✍️ Waiting for journal entry...")
     await update.message.reply_text(
@@ -112,6 +112,6 @@ async def journal_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         return
 
     logger.info("📊 Getting journal info...")
-    info = get_journal_summary()
+    info = await aget_journal_summary()
     logger.info("�� Sending journal info")
     await update.message.reply_text(info)
\ No newline at end of file
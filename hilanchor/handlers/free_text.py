@@ -6,8 +6,8 @@ from telegram.ext import ContextTypes
 
 from ..auth import reject_non_owner
 from ..keyboards import kb_yes_next, kb_timing_choice
-from ..state_store import load_state, get_waiting, save_state, set_last_plan, append_event, clear_waiting
-from ..llm import humanize_message
+from ..state_store import atransaction, get_waiting, set_last_plan, append_event, clear_waiting
+from ..replies import send_humanized
 from .. import messages as msg
 
 logger = logging.getLogger(__name__)
@@ -18,60 +18,69 @@ def _save_text_and_ask_timing(state: dict, event_name: str, text: str) -> None:
     set_last_plan(state, text)
     append_event(state, event_name, text=text)
     clear_waiting(state)
-    save_state(state)
 
 
 async def _handle_yes_what_did(update, context, state, text: str):
     _save_text_and_ask_timing(state, event_name="did", text=text)
-    response = humanize_message(
+    await send_humanized(
+        update.message.reply_text,
         msg.TIMING_CHOICE_QUESTION,
-        context="user shared what they did - asking when to check in"
+        context="user shared what they did - asking when to check in",
+        site="free_text",
+        reply_markup=kb_timing_choice()
     )
-    await update.message.reply_text(response, reply_markup=kb_timing_choice())
 
 
 async def _handle_partial_plan(update, context, state, text: str):
     _save_text_and_ask_timing(state, event_name="plan", text=text)
-    response = humanize_message(
+    await send_humanized(
+        update.message.reply_text,
         msg.TIMING_CHOICE_QUESTION,
-        context="user shared plan - asking when to check in"
+        context="user shared plan - asking when to check in",
+        site="free_text",
+        reply_markup=kb_timing_choice()
     )
-    await update.message.reply_text(response, reply_markup=kb_timing_choice())
 
 
 async def _handle_no_stuck_first_action(update, context, state, text: str):
     _save_text_and_ask_timing(state, event_name="first_action", text=text)
-    response = humanize_message(
+    await send_humanized(
+        update.message.reply_text,
         msg.TIMING_CHOICE_QUESTION,
-        context="user identified first action - asking when to check in"
+        context="user identified first action - asking when to check in",
+        site="free_text",
+        reply_markup=kb_timing_choice()
     )
-    await update.message.reply_text(response, reply_markup=kb_timing_choice())
 
 
 async def _handle_no_fear_reframe(update, context, state, text: str):
     _save_text_and_ask_timing(state, event_name="fear_reframe", text=text)
-    response = humanize_message(
+    await send_humanized(
+        update.message.reply_text,
         msg.TIMING_CHOICE_QUESTION,
-        context="user reframed fear - asking when to check in"
+        context="user reframed fear - asking when to check in",
+        site="free_text",
+        reply_markup=kb_timing_choice()
     )
-    await update.message.reply_text(response, reply_markup=kb_timing_choice())
 
 
 async def _handle_big_3_bullets(update, context, state, text: str):
     _save_text_and_ask_timing(state, event_name="bullets", text=text)
-    response = humanize_message(
+    await send_humanized(
+        update.message.reply_text,
         msg.TIMING_CHOICE_QUESTION,
-        context="user wrote bullets - asking when to check in"
+        context="user wrote bullets - asking when to check in",
+        site="free_text",
+        reply_markup=kb_timing_choice()
     )
-    await update.message.reply_text(response, reply_markup=kb_timing_choice())
 
 
 async def _handle_journal_add(update, context, state, text: str):
     """Handle adding text to personal journal."""
-    from ..journal import append_to_journal
-    from ..state_store import set_waiting, save_state
+    from ..journal import aappend_to_journal
+    from ..state_store import set_waiting
 
-    success = append_to_journal(text, include_timestamp=True)
+    success = await aappend_to_journal(text, include_timestamp=True)
 
     if success:
         await update.message.reply_text(msg.JOURNAL_ADD_SUCCESS)
@@ -80,7 +89,6 @@ async def _handle_journal_add(update, context, state, text: str):
 
     # Clear waiting state
     set_waiting(state, None)
-    save_state(state)
 
 
 WAITING_HANDLERS = {
@@ -95,10 +103,7 @@ WAITING_HANDLERS = {
 
 async def _handle_free_note(update, context, state, text: str):
     """Handle free text notes - always available for user to add thoughts."""
-    from ..state_store import append_event, save_state
-
     append_event(state, "free_note", text=text)
-    save_state(state)
 
     await update.message.reply_text(msg.FREE_NOTE_SAVED)
 
@@ -114,18 +119,18 @@ async def on_free_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     user_id = update.effective_user.id if update.effective_user else "Unknown"
     logger.info(f"💬 Received text message from user {user_id}: '{text[:50]}...'")
 
-    state = load_state()
-    waiting = get_waiting(state)
-
-    # If we're waiting for specific input, handle it
-    if waiting:
-        logger.info(f"⏳ Processing text for waiting state: {waiting}")
-        handler = WAITING_HANDLERS.get(waiting)
-        if handler:
-            await handler(update, context, state, text)
-            logger.info(f"✅ Completed handling for state: {waiting}")
-            return
-
-    # Otherwise, treat as a free note - user adding thoughts/reflections
-    logger.info("📝 Processing as free note")
-    await _handle_free_note(update, context, state, text)
+    async with atransaction(chat_id=update.effective_chat.id) as state:
+        waiting = get_waiting(state)
+
+        # If we're waiting for specific input, handle it
+        if waiting:
+            logger.info(f"⏳ Processing text for waiting state: {waiting}")
+            handler = WAITING_HANDLERS.get(waiting)
+            if handler:
+                await handler(update, context, state, text)
+                logger.info(f"✅ Completed handling for state: {waiting}")
+                return
+
+        # Otherwise, treat as a free note - user adding thoughts/reflections
+        logger.info("📝 Processing as free note")
+        await _handle_free_note(update, context, state, text)
@@ -0,0 +1,122 @@
+"""
+Flood guard - runs in handler group -1, before every other handler.
+
+Each user gets a token bucket (FLOOD_BURST updates at once, refilled at
+FLOOD_RATE per second); updates beyond it are dropped. Allowed users (the
+owner and ALLOWED_USER_IDS) become the current user for the rest of the
+update. Anyone else gets through once, so reject_non_owner() can answer them, and is then kept in
+an in-memory deny cache for FLOOD_DENY_SECONDS: their further updates are
+dropped here without touching storage or the Telegram API.
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from ..config import FLOOD_BURST, FLOOD_RATE, FLOOD_DENY_SECONDS
+from ..users import is_allowed, set_current_user
+
+logger = logging.getLogger(__name__)
+
+# Users tracked at once; the least recently seen are forgotten first
+MAX_TRACKED_USERS = 10_000
+
+GUARD_STATS: Dict[str, int] = {"passed": 0, "dropped_rate": 0, "dropped_denied": 0, "dropped_no_user": 0}
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "stamp")
+
+    def __init__(self, tokens: float, stamp: float) -> None:
+        self.tokens = tokens
+        self.stamp = stamp
+
+
+class FloodGuard:
+    """Per-user rate limit plus a deny cache for strangers."""
+
+    def __init__(
+        self,
+        allowed: Callable[[int], bool] = is_allowed,
+        burst: int = FLOOD_BURST,
+        rate: float = FLOOD_RATE,
+        deny_seconds: float = FLOOD_DENY_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.allowed = allowed
+        self.burst = burst
+        self.rate = rate
+        self.deny_seconds = deny_seconds
+        self.clock = clock
+        self._buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._denied: "OrderedDict[int, float]" = OrderedDict()
+
+    def _take(self, user_id: int, now: float) -> bool:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.burst, now)
+            if len(self._buckets) > MAX_TRACKED_USERS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.stamp) * self.rate)
+            bucket.stamp = now
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def _is_denied(self, user_id: int, now: float) -> bool:
+        until = self._denied.get(user_id)
+        if until is None:
+            return False
+        if now < until:
+            return True
+        del self._denied[user_id]
+        return False
+
+    def _deny(self, user_id: int, now: float) -> None:
+        self._denied[user_id] = now + self.deny_seconds
+        self._denied.move_to_end(user_id)
+        if len(self._denied) > MAX_TRACKED_USERS:
+            self._denied.popitem(last=False)
+
+    def check(self, user_id: Optional[int]) -> Optional[str]:
+        """None if the update may go on, else the name of the drop counter."""
+        if user_id is None:
+            return "dropped_no_user"
+        now = self.clock()
+        if not self.allowed(user_id):
+            if self._is_denied(user_id, now):
+                return "dropped_denied"
+            # Let this one through to be answered, then keep them out
+            self._deny(user_id, now)
+        if not self._take(user_id, now):
+            return "dropped_rate"
+        return None
+
+
+_guard = FloodGuard()
+
+
+async def flood_guard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Group -1 handler: stop the update here if it is over the limits."""
+    user = update.effective_user
+    dropped = _guard.check(user.id if user else None)
+    if dropped is None:
+        GUARD_STATS["passed"] += 1
+        if _guard.allowed(user.id):
+            set_current_user(user.id)
+        return
+    GUARD_STATS[dropped] += 1
+    if dropped == "dropped_rate":
+        logger.debug(f"🚦 Rate limit hit by user {user.id} - dropping update")
+    raise ApplicationHandlerStop
+
+
+def get_guard_stats() -> Dict[str, int]:
+    """Return a copy of the flood guard counters."""
+    return dict(GUARD_STATS)
@@ -4,6 +4,7 @@ import logging
 from datetime import datetime
 from pathlib import Path
 from .config import JOURNAL_PATH
+from .aio import run_io
 from . import messages as msg
 
 logger = logging.getLogger(__name__)
@@ -80,3 +81,17 @@ def get_journal_summary() -> str:
     except Exception as e:
         logger.error(f"❌ Error getting journal summary: {e}")
         return msg.JOURNAL_ERROR_STATS.format(error=e)
+
+
+# Async facade - the same operations on the I/O thread
+
+async def aread_journal() -> str:
+    return await run_io(read_journal)
+
+
+async def aappend_to_journal(text: str, include_timestamp: bool = True) -> bool:
+    return await run_io(append_to_journal, text, include_timestamp=include_timestamp)
+
+
+async def aget_journal_summary() -> str:
+    return await run_io(get_journal_summary)
@@ -1,13 +1,142 @@
 """
 LLM integration for humanizing bot responses using Ollama.
+
+Handlers and jobs use the async API (ahumanize_message & co.): the request
+goes through one pooled, keep-alive HTTP client per event loop with
+connect/read timeouts, so a slow model only delays its own reply and never
+freezes polling or other updates. The sync functions are kept for scripts.
+
+Static messages are not generated on the spot at all: they come from the
+pool of pre-generated variants (variants.py), refilled by
+arefill_variants() at night. So the live path below - and with it the
+reply budget, upgrade edits and streaming of replies.py - only serves
+dynamic texts, or every text when VARIANT_POOL_SIZE is 0. It goes through
+the cache of generated texts (llm_cache.py) first. ahumanize_stream() yields the text
+token by token, for replies that are shown while they are generated.
+Requests to the model pass the circuit breaker (llm_breaker.py), which
+answers with the original at once while Ollama is failing or overloaded.
 """
+import asyncio
+import logging
+from typing import AsyncIterator, Optional, Tuple
+
+import httpx
 import ollama
-from typing import Optional
-from .config import USE_LLM, LLM_MODEL
+
+from .aio import run_io
+from .config import USE_LLM, LLM_ACTIVE_HOURS, LLM_MODEL, OLLAMA_HOST, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT
+from .llm_breaker import CircuitOpen, get_breaker
+from .llm_cache import cache_key, get_cache
+from .users import in_hours, owner_hour
+from .variants import get_pool, is_static
 from . import messages as msg
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_MODEL = LLM_MODEL
 
+GENERATE_OPTIONS = {
+    "temperature": 0.8,  # Higher for more variation
+    "top_p": 0.9,
+}
+
+# Connections kept open to the Ollama server between requests
+KEEPALIVE_CONNECTIONS = 4
+
+# Variants generated per refill run at most
+REFILL_BATCH = 20
+
+# How long Ollama keeps the model loaded after a request: through the active
+# hours (the keep-alive job renews it more often than this), briefly otherwise
+KEEP_ALIVE_ACTIVE = "15m"
+KEEP_ALIVE_IDLE = "5m"
+
+_sync_client: Optional[ollama.Client] = None
+# httpx clients belong to one event loop; tests and restarts may use several
+_async_client: Optional[Tuple[asyncio.AbstractEventLoop, ollama.AsyncClient]] = None
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def get_client() -> ollama.Client:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = ollama.Client(host=OLLAMA_HOST, timeout=_timeout())
+    return _sync_client
+
+
+def get_async_client() -> ollama.AsyncClient:
+    """The shared async Ollama client of the running event loop."""
+    global _async_client
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client[0] is not loop:
+        client = ollama.AsyncClient(
+            host=OLLAMA_HOST,
+            timeout=_timeout(),
+            limits=httpx.Limits(max_keepalive_connections=KEEPALIVE_CONNECTIONS),
+        )
+        _async_client = (loop, client)
+    return _async_client[1]
+
+
+async def aclose_llm(app=None) -> None:
+    """Save the variant pool and close the shared client (Application post_shutdown hook)."""
+    global _async_client
+    pool = get_pool()
+    if pool is not None and pool.dirty:
+        await run_io(pool.save)
+    if _async_client is not None:
+        client, _async_client = _async_client[1], None
+        await client.close()
+    cache = get_cache()
+    if cache is not None:
+        await run_io(cache.close)
+
+
+def keep_alive() -> str:
+    """The keep_alive to send with a request now."""
+    return KEEP_ALIVE_ACTIVE if in_hours(owner_hour(), LLM_ACTIVE_HOURS) else KEEP_ALIVE_IDLE
+
+
+# The fixed instructions go in the system prompt, ahead of the per-call part:
+# every request starts with the same tokens, so Ollama reuses their cached
+# evaluation and only processes the short message and context
+SYSTEM_PROMPT = """את עוזרת אישית תומכת ומעודדת בעברית.
+המשימה שלך: לקחת הודעת בוט ולהפוך אותה להודעה אנושית, חמה ומגוונת.
+
+הנחיות:
+- כתבי בעברית בלבד
+- שמרי על אותו תוכן ומשמעות, אבל עם וריאציה אנושית
+- הוסיפי חום ותמיכה אמיתית
+- השתמשי בסגנון דיבור טבעי ונעים
+- אל תשני את המשמעות או הכוונה
+- אל תוסיפי הסברים או מטא-טקסט
+- אם יש אימוג׳י בהודעה המקורית, אפשר להשאיר או להחליף באימוג׳י אחר מתאים
+- החזירי רק את ההודעה המעובדת, ללא הסברים"""
+
+
+def build_prompt(original_message: str, context: Optional[str] = None) -> str:
+    """The per-call part of the prompt; the instructions are in SYSTEM_PROMPT."""
+    prompt = f'הודעה מקורית: "{original_message}"'
+    return f"{prompt}\nהקשר: {context}" if context else prompt
+
+
+def _generate_args(model: str, prompt: str) -> dict:
+    return dict(model=model, prompt=prompt, system=SYSTEM_PROMPT, options=GENERATE_OPTIONS, keep_alive=keep_alive())
+
+
+def _accept(original_message: str, response) -> str:
+    """The generated text (the original if empty); raises if it is suspicious."""
+    humanized = response['response'].strip()
+
+    # Basic validation - a suspiciously long response is not used
+    if len(humanized) > len(original_message) * 3:
+        raise ValueError("LLM response too long")
+
+    return humanized if humanized else original_message
+
 
 def humanize_message(
     original_message: str,
@@ -17,6 +146,7 @@ def humanize_message(
 ) -> str:
     """
     Takes a bot message and makes it more human, warm, and varied using Ollama.
+    Blocking - inside the bot use ahumanize_message().
 
     Args:
         original_message: The original bot message to humanize
@@ -31,79 +161,244 @@ def humanize_message(
     if not USE_LLM:
         return original_message
 
+    prompt = build_prompt(original_message, context)
+    cache = get_cache()
+    key = cache_key(model, prompt, SYSTEM_PROMPT)
+    cached = cache.get(key) if cache else None
+    if cached is not None and not cache.sample():
+        return cached
+
     try:
-        prompt = f"""את עוזרת אישית תומכת ומעודדת בעברית.
-המשימה שלך: לקחת הודעת בוט ולהפוך אותה להודעה אנושית, חמה ומגוונת.
+        with get_breaker().call():
+            response = get_client().generate(**_generate_args(model, prompt))
+        humanized = _accept(original_message, response)
 
-הודעה מקורית: "{original_message}"
-{f'הקשר: {context}' if context else ''}
+    except CircuitOpen:
+        if fallback_on_error:
+            return cached or original_message
+        raise
+    except Exception as e:
+        logger.warning(f"⚠️ LLM humanization failed: {e}")
+        if fallback_on_error:
+            return cached or original_message
+        raise
 
-הנחיות:
-- כתבי בעברית בלבד
-- שמרי על אותו תוכן ומשמעות, אבל עם וריאציה אנושית
-- הוסיפי חום ותמיכה אמיתית
-- השתמשי בסגנון דיבור טבעי ונעים
-- אל תשני את המשמעות או הכוונה
-- אל תוסיפי הסברים או מטא-טקסט
-- אם יש אימוג׳י בהודעה המקורית, אפשר להשאיר או להחליף באימוג׳י אחר מתאים
+    if cache is not None and humanized != original_message:
+        cache.persist(key, cache.put(key, humanized))
+    return humanized
 
-רק התגובה המעובדת, ללא הסברים:"""
 
-        response = ollama.generate(
-            model=model,
-            prompt=prompt,
-            options={
-                "temperature": 0.8,  # Higher for more variation
-                "top_p": 0.9,
-            }
-        )
+async def ahumanize_message(
+    original_message: str,
+    context: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+    fallback_on_error: bool = True
+) -> str:
+    """
+    humanize_message() without blocking the event loop. Static messages
+    are served from the variant pool - or sent as they are when it has
+    none ready - instead of waiting for the model.
+    """
+    if not USE_LLM:
+        return original_message
+
+    pool = get_pool() if is_static(original_message) else None
+    if pool is not None:
+        variant = pool.take(original_message, context)
+        return original_message if variant is None else variant
+
+    return await _agenerate(original_message, context, model, fallback_on_error)
 
-        humanized = response['response'].strip()
 
-        # Basic validation - if the response is suspiciously long, use original
-        if len(humanized) > len(original_message) * 3:
-            if fallback_on_error:
-                return original_message
-            raise ValueError("LLM response too long")
+async def _arequest(original_message: str, prompt: str, model: str) -> str:
+    """One generation by the model; raises on errors, unusable answers and CircuitOpen."""
+    with get_breaker().call():
+        response = await get_async_client().generate(**_generate_args(model, prompt))
+    return _accept(original_message, response)
 
-        return humanized if humanized else original_message
 
+async def _alookup(key: str) -> Optional[str]:
+    cache = get_cache()
+    if cache is None:
+        return None
+    cached = cache.get(key, memory_only=True)
+    if cached is None and cache.has_disk:
+        cached = await run_io(cache.get, key)
+    return cached
+
+
+async def _astore(key: str, original_message: str, humanized: str) -> None:
+    cache = get_cache()
+    if cache is not None and humanized != original_message:
+        variants = cache.put(key, humanized)
+        if cache.has_disk:
+            await run_io(cache.persist, key, variants)
+
+
+async def _agenerate(original_message: str, context: Optional[str], model: str, fallback_on_error: bool) -> str:
+    """A cached text for the prompt, or a new one from the model (then cached)."""
+    prompt = build_prompt(original_message, context)
+    key = cache_key(model, prompt, SYSTEM_PROMPT)
+    cached = await _alookup(key)
+    if cached is not None and not get_cache().sample():
+        return cached
+
+    try:
+        humanized = await _arequest(original_message, prompt, model)
+
+    except CircuitOpen:
+        if fallback_on_error:
+            return cached or original_message
+        raise
+    except httpx.TimeoutException:
+        logger.warning(f"⏱️ LLM did not answer within {LLM_READ_TIMEOUT}s - using the original message")
+        if fallback_on_error:
+            return cached or original_message
+        raise
     except Exception as e:
-        print(f"⚠️ LLM humanization failed: {e}")
+        logger.warning(f"⚠️ LLM humanization failed: {e}")
         if fallback_on_error:
-            return original_message
+            return cached or original_message
         raise
 
+    await _astore(key, original_message, humanized)
+    return humanized
 
-def humanize_nudge(minutes: int, model: str = DEFAULT_MODEL) -> str:
+
+async def ahumanize_stream(
+    original_message: str,
+    context: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+) -> AsyncIterator[str]:
     """
-    Generate a humanized nudge message based on the time interval.
+    ahumanize_message() as it is generated: yields the text so far after
+    each token, and last the final text - validated like the full answer,
+    or the cached/original text if the model fails or runs too long. Pool
+    and cache hits (and USE_LLM off) yield their text once.
     """
-    base_msg = msg.nudge_message(minutes)
-    context = f"nudge after {minutes} minutes"
-    return humanize_message(base_msg, context=context, model=model)
+    if not USE_LLM:
+        yield original_message
+        return
 
+    pool = get_pool() if is_static(original_message) else None
+    if pool is not None:
+        variant = pool.take(original_message, context)
+        yield original_message if variant is None else variant
+        return
 
-def humanize_checkin(stage: str, model: str = DEFAULT_MODEL) -> str:
+    prompt = build_prompt(original_message, context)
+    key = cache_key(model, prompt, SYSTEM_PROMPT)
+    cached = await _alookup(key)
+    if cached is not None and not get_cache().sample():
+        yield cached
+        return
+
+    text = ""
+    try:
+        with get_breaker().call() as call:
+            stream = await get_async_client().generate(**_generate_args(model, prompt), stream=True)
+            async for part in stream:
+                call.answered()
+                text += part['response']
+                if len(text.strip()) > len(original_message) * 3:
+                    break  # rejected by _accept below, not the server's fault
+                if text.strip():
+                    yield text.strip()
+        humanized = _accept(original_message, {'response': text})
+
+    except CircuitOpen:
+        yield cached or original_message
+        return
+    except httpx.TimeoutException:
+        logger.warning(f"⏱️ LLM stream stalled for {LLM_READ_TIMEOUT}s - using the original message")
+        yield cached or original_message
+        return
+    except Exception as e:
+        logger.warning(f"⚠️ LLM humanization failed: {e}")
+        yield cached or original_message
+        return
+
+    await _astore(key, original_message, humanized)
+    yield humanized
+
+
+async def arefill_variants(limit: int = REFILL_BATCH) -> int:
     """
-    Generate a humanized check-in message based on the time of day.
+    Generate up to `limit` variants for the pool keys that are short,
+    emptiest first, and save the pool. Stops at the first failure (Ollama
+    down or busy). Returns the number of variants added. This loads the
+    model; job_refill_variants() unloads it again afterwards.
     """
+    pool = get_pool()
+    if pool is None or not USE_LLM:
+        return 0
+    added = 0
+    try:
+        for message, context, short in pool.missing():
+            for _ in range(short):
+                if added >= limit:
+                    return added
+                # Straight to the model - the pool wants new texts, not cached ones
+                variant = await _arequest(message, build_prompt(message, context or None), DEFAULT_MODEL)
+                if variant != message:
+                    pool.add(message, context, variant)
+                    added += 1
+    except Exception as e:
+        logger.warning(f"⚠️ Variant refill stopped after {added}: {e}")
+    finally:
+        if pool.dirty:
+            await run_io(pool.save)
+    return added
+
+
+def nudge_args(minutes: int) -> Tuple[str, str]:
+    """The nudge text for `minutes` and its context for the model."""
+    return msg.nudge_message(minutes), f"nudge after {minutes} minutes"
+
+
+def checkin_args(stage: str) -> Tuple[str, str]:
+    """The check-in text for `stage` and its context for the model."""
     checkin_messages = {
         "11": msg.CHECKIN_11,
         "14": msg.CHECKIN_14,
         "17": msg.CHECKIN_17
     }
+    return checkin_messages.get(stage, msg.CHECKIN_MANUAL), f"check-in at {stage}:00"
 
-    base_msg = checkin_messages.get(stage, msg.CHECKIN_MANUAL)
-    context = f"check-in at {stage}:00"
+
+def humanize_nudge(minutes: int, model: str = DEFAULT_MODEL) -> str:
+    """
+    Generate a humanized nudge message based on the time interval.
+    """
+    base_msg, context = nudge_args(minutes)
+    return humanize_message(base_msg, context=context, model=model)
+
+
+async def ahumanize_nudge(minutes: int, model: str = DEFAULT_MODEL) -> str:
+    base_msg, context = nudge_args(minutes)
+    return await ahumanize_message(base_msg, context=context, model=model)
+
+
+def humanize_checkin(stage: str, model: str = DEFAULT_MODEL) -> str:
+    """
+    Generate a humanized check-in message based on the time of day.
+    """
+    base_msg, context = checkin_args(stage)
     return humanize_message(base_msg, context=context, model=model)
 
 
+async def ahumanize_checkin(stage: str, model: str = DEFAULT_MODEL) -> str:
+    base_msg, context = checkin_args(stage)
+    return await ahumanize_message(base_msg, context=context, model=model)
+
+
 # Utility function to test if Ollama is running and the model is available
 def test_ollama_connection(model: str = DEFAULT_MODEL) -> bool:
     """Test if Ollama is running and the model is available."""
     try:
-        ollama.generate(model=model, prompt="test", options={"num_predict": 1})
+        get_client().generate(
+            model=model, prompt="test", options={"num_predict": 1}
+        )
         return True
     except Exception as e:
         print(f"⚠️ Ollama connection test failed: {e}")
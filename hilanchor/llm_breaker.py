@@ -0,0 +1,167 @@
+"""
+Circuit breaker around the calls to Ollama.
+
+Without it, every humanization waits for its own failure while Ollama is
+down or overloaded, so each click is slow, not just the first one. After
+LLM_BREAKER_FAILURES failed or slow calls in a row (slow: no answer within
+LLM_BREAKER_SLOW_SECONDS, or no first token for a stream) the circuit
+opens: calls are refused at once and the original messages go out. After
+LLM_BREAKER_COOLDOWN seconds one call is let through as a probe (half-open);
+its success closes the circuit, its failure opens it for another cooldown.
+
+Independently, when LLM_MAX_QUEUE generations are already in flight (Ollama
+runs them one after the other), further calls are refused too rather than
+queueing behind them.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .config import LLM_BREAKER_COOLDOWN, LLM_BREAKER_FAILURES, LLM_BREAKER_SLOW_SECONDS, LLM_MAX_QUEUE
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+BREAKER_STATS: Dict[str, int] = {
+    "passed": 0, "rejected_open": 0, "rejected_busy": 0, "failures": 0, "slow": 0, "opened": 0, "closed": 0,
+}
+
+
+class CircuitOpen(Exception):
+    """The breaker refused the call; the caller sends the original message."""
+
+
+class Call:
+    """One call let through; answered() marks when the first of the answer arrived."""
+    __slots__ = ("start", "answered_at", "_clock")
+
+    def __init__(self, clock: Callable[[], float]) -> None:
+        self._clock = clock
+        self.start = clock()
+        self.answered_at: Optional[float] = None
+
+    def answered(self) -> None:
+        if self.answered_at is None:
+            self.answered_at = self._clock()
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe, plus a cap on calls in flight."""
+
+    def __init__(
+        self,
+        failures: int = LLM_BREAKER_FAILURES,
+        slow_seconds: float = LLM_BREAKER_SLOW_SECONDS,
+        cooldown: float = LLM_BREAKER_COOLDOWN,
+        max_queue: int = LLM_MAX_QUEUE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failures = max(1, failures)
+        self.slow_seconds = slow_seconds
+        self.cooldown = cooldown
+        self.max_queue = max_queue
+        self.clock = clock
+        self.state = CLOSED
+        self.in_flight = 0
+        self._failed_in_row = 0
+        self._opened_at = 0.0
+        self._probing = False
+        # Sync calls run on worker threads: admission, the counters and the
+        # state changes happen under this lock
+        self._lock = threading.Lock()
+
+    def check(self) -> Optional[str]:
+        """None if a call may go to the model now, else the name of the reject counter."""
+        with self._lock:
+            return self._check()
+
+    def _check(self) -> Optional[str]:
+        if self.max_queue > 0 and self.in_flight >= self.max_queue:
+            return "rejected_busy"
+        if self.state == OPEN and self.clock() - self._opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return "rejected_open"
+            self._probing = True
+            return None
+        return "rejected_open" if self.state == OPEN else None
+
+    def _open(self) -> None:
+        # Caller holds _lock
+        if self.state != OPEN:
+            BREAKER_STATS["opened"] += 1
+            logger.warning(
+                f"🔌 LLM circuit open after {self._failed_in_row} failed calls - "
+                f"sending the original messages, retrying in {self.cooldown:.0f}s"
+            )
+        self.state = OPEN
+        self._opened_at = self.clock()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failure()
+
+    def _failure(self) -> None:
+        BREAKER_STATS["failures"] += 1
+        self._failed_in_row += 1
+        if self.state == HALF_OPEN or self._failed_in_row >= self.failures:
+            self._open()
+
+    def record_success(self, seconds: float) -> None:
+        with self._lock:
+            if seconds > self.slow_seconds:
+                BREAKER_STATS["slow"] += 1
+                self._failure()
+                return
+            if self.state != CLOSED:
+                BREAKER_STATS["closed"] += 1
+                logger.info("🔌 LLM circuit closed - the model answers again")
+            self.state = CLOSED
+            self._failed_in_row = 0
+
+    @contextmanager
+    def call(self) -> Iterator[Call]:
+        """
+        Guard one request to the model: raises CircuitOpen when refused,
+        otherwise records how the request inside went. A cancelled request
+        counts as neither success nor failure.
+        """
+        with self._lock:
+            rejected = self._check()
+            if rejected is not None:
+                BREAKER_STATS[rejected] += 1
+                raise CircuitOpen(rejected)
+            BREAKER_STATS["passed"] += 1
+            probe = self.state == HALF_OPEN
+            self.in_flight += 1
+        call = Call(self.clock)
+        try:
+            yield call
+        except Exception:
+            self.record_failure()
+            raise
+        else:
+            self.record_success((call.answered_at or self.clock()) - call.start)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                if probe:
+                    self._probing = False
+
+
+_breaker = CircuitBreaker()
+
+
+def get_breaker() -> CircuitBreaker:
+    return _breaker
+
+
+def get_breaker_stats() -> Dict[str, Any]:
+    """Return a copy of the breaker counters plus its state and the calls in flight."""
+    stats: Dict[str, Any] = dict(BREAKER_STATS)
+    stats.update(state=_breaker.state, in_flight=_breaker.in_flight)
+    return stats
@@ -0,0 +1,217 @@
+"""
+Cache of humanized texts, so repeated prompts skip the model.
+
+Two tiers: an in-memory LRU of LLM_CACHE_SIZE prompts in front of a SQLite
+file of LLM_CACHE_DISK_SIZE prompts (least recently used evicted first),
+which keeps the texts across restarts. The key is the model plus the system
+prompt and prompt, so editing them or switching models never serves old texts.
+
+Each prompt keeps up to LLM_CACHE_VARIANTS texts, each dropped
+LLM_CACHE_TTL_HOURS after it was generated. A hit returns one of them at
+random; LLM_CACHE_SAMPLE_RATE of the hits go to the model anyway and add a
+fresh text (replacing the oldest), so answers keep varying.
+"""
+import hashlib
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .config import (
+    LLM_CACHE_DISK_SIZE, LLM_CACHE_PATH, LLM_CACHE_SAMPLE_RATE, LLM_CACHE_SIZE,
+    LLM_CACHE_TTL_HOURS, LLM_CACHE_VARIANTS,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS humanized (
+    key      TEXT PRIMARY KEY,
+    variants TEXT NOT NULL,
+    used     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_humanized_used ON humanized (used);
+"""
+
+# (text, generated at) pairs, oldest first
+Variants = List[Tuple[str, float]]
+
+CACHE_STATS: Dict[str, int] = {
+    "memory_hits": 0, "disk_hits": 0, "misses": 0, "sampled": 0, "expired": 0, "evicted": 0,
+}
+
+
+def cache_key(model: str, prompt: str, system: str = "") -> str:
+    return hashlib.sha256(f"{model}\0{system}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class HumanizeCache:
+    """Memory LRU over an optional SQLite tier (disk_size 0 = memory only)."""
+
+    def __init__(
+        self,
+        path,
+        size: int,
+        disk_size: int,
+        ttl: float,
+        variants: int,
+        sample_rate: float,
+    ) -> None:
+        self.size = size
+        self.disk_size = disk_size
+        self.ttl = ttl
+        self.variants = max(1, variants)
+        self.sample_rate = sample_rate
+        self._memory: "OrderedDict[str, Variants]" = OrderedDict()
+        # Used from the event loop and the I/O thread. Separate from the
+        # SQLite lock, so the loop never waits behind a disk query.
+        self._memory_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if disk_size > 0:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    @property
+    def has_disk(self) -> bool:
+        return self._conn is not None
+
+    def _fresh(self, variants: Variants, now: float) -> Variants:
+        alive = [v for v in variants if now - v[1] < self.ttl]
+        CACHE_STATS["expired"] += len(variants) - len(alive)
+        return alive
+
+    def _remember(self, key: str, variants: Variants) -> None:
+        # Caller holds _memory_lock
+        self._memory[key] = variants
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+            CACHE_STATS["evicted"] += 1
+
+    def get(self, key: str, memory_only: bool = False) -> Optional[str]:
+        """
+        One cached text for `key`, or None. With memory_only, a memory miss
+        returns None without counting it, so the caller can retry on the
+        disk tier from the I/O thread.
+        """
+        now = time.time()
+        with self._memory_lock:
+            variants = self._memory.get(key)
+            if variants is not None:
+                variants = self._fresh(variants, now)
+                if variants:
+                    self._remember(key, variants)
+                else:
+                    del self._memory[key]
+        if variants:
+            CACHE_STATS["memory_hits"] += 1
+            return random.choice(variants)[0]
+        if memory_only and self.has_disk:
+            return None
+
+        variants = self._fresh(self._load(key, now), now)
+        if variants:
+            with self._memory_lock:
+                self._remember(key, variants)
+            CACHE_STATS["disk_hits"] += 1
+            return random.choice(variants)[0]
+        CACHE_STATS["misses"] += 1
+        return None
+
+    def sample(self) -> bool:
+        """Whether this hit should ask the model for a fresh text anyway."""
+        if random.random() < self.sample_rate:
+            CACHE_STATS["sampled"] += 1
+            return True
+        return False
+
+    def put(self, key: str, text: str) -> Variants:
+        """Add a generated text in memory; returns the key's texts for persist()."""
+        with self._memory_lock:
+            variants = self._fresh(self._memory.get(key, []), time.time())
+            variants = (variants + [(text, time.time())])[-self.variants:]
+            self._remember(key, variants)
+        return variants
+
+    def _load(self, key: str, now: float) -> Variants:
+        if self._conn is None:
+            return []
+        with self._lock:
+            row = self._conn.execute("SELECT variants FROM humanized WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return []
+            self._conn.execute("UPDATE humanized SET used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return [(text, ts) for text, ts in json.loads(row[0])]
+
+    def persist(self, key: str, variants: Variants) -> None:
+        """Write the key's texts to the disk tier, evicting the least recently used beyond disk_size."""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO humanized (key, variants, used) VALUES (?, ?, ?)",
+                (key, json.dumps(variants, ensure_ascii=False), time.time()),
+            )
+            evicted = self._conn.execute(
+                "DELETE FROM humanized WHERE key IN "
+                "(SELECT key FROM humanized ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.disk_size,),
+            ).rowcount
+            self._conn.commit()
+        CACHE_STATS["evicted"] += evicted
+
+    def disk_entries(self) -> int:
+        if self._conn is None:
+            return 0
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM humanized").fetchone()[0]
+
+    def close(self) -> None:
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+    def __len__(self) -> int:
+        with self._memory_lock:
+            return len(self._memory)
+
+
+_cache: Optional[HumanizeCache] = None
+
+
+def get_cache() -> Optional[HumanizeCache]:
+    """The shared cache, opened on first use; None when LLM_CACHE_SIZE is 0."""
+    global _cache
+    if LLM_CACHE_SIZE <= 0:
+        return None
+    if _cache is None:
+        _cache = HumanizeCache(
+            LLM_CACHE_PATH,
+            size=LLM_CACHE_SIZE,
+            disk_size=LLM_CACHE_DISK_SIZE,
+            ttl=LLM_CACHE_TTL_HOURS * 3600,
+            variants=LLM_CACHE_VARIANTS,
+            sample_rate=LLM_CACHE_SAMPLE_RATE,
+        )
+    return _cache
+
+
+def get_cache_stats() -> Dict[str, float]:
+    """Return a copy of the cache counters plus the share of lookups served without the model."""
+    stats: Dict[str, float] = dict(CACHE_STATS)
+    lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+    served = stats["memory_hits"] + stats["disk_hits"] - stats["sampled"]
+    stats["hit_rate"] = served / lookups if lookups else 0.0
+    cache = _cache
+    stats["memory_entries"] = len(cache) if cache else 0
+    return stats
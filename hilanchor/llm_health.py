@@ -0,0 +1,120 @@
+"""
+Keeping LLM_MODEL loaded in Ollama, and reporting how it is doing.
+
+Loading a model takes seconds (much longer on CPU-only hosts), and Ollama
+drops it a few minutes after the last request, so the first message after
+startup or a quiet spell used to pay for the load. At startup
+astartup_check() checks that Ollama is up and the model installed, and
+loads it. During LLM_ACTIVE_HOURS the keep-alive job renews the load more
+often than it expires; after them the model is released once to free RAM.
+aprobe_model() reports whether the model is installed and loaded, and how
+long the last load took.
+"""
+import datetime as dt
+import logging
+import time
+from typing import Any, Dict
+
+from .config import LLM_ACTIVE_HOURS
+from .llm import DEFAULT_MODEL, get_async_client, keep_alive
+from .users import in_hours, owner_hour
+
+logger = logging.getLogger(__name__)
+
+MODEL_STATE: Dict[str, Any] = {
+    "installed": None,
+    "loaded": None,
+    "expires_at": None,
+    "size_vram": None,
+    "load_seconds": None,
+    "warmed_at": None,
+    "error": None,
+}
+
+
+def _is_model(name: str, model: str) -> bool:
+    # Ollama adds ":latest" to untagged names
+    return name == model or name == f"{model}:latest"
+
+
+async def aprobe_model(model: str = DEFAULT_MODEL) -> Dict[str, Any]:
+    """Ask Ollama whether `model` is installed and loaded; returns a copy of MODEL_STATE."""
+    client = get_async_client()
+    try:
+        installed = await client.list()
+        running = await client.ps()
+    except Exception as e:
+        MODEL_STATE.update(installed=None, loaded=None, expires_at=None, error=str(e))
+        return dict(MODEL_STATE)
+
+    loaded = next((m for m in running.models if _is_model(m.model or m.name, model)), None)
+    MODEL_STATE.update(
+        installed=any(_is_model(m.model, model) for m in installed.models),
+        loaded=loaded is not None,
+        expires_at=loaded.expires_at.isoformat() if loaded and loaded.expires_at else None,
+        size_vram=loaded.size_vram if loaded else None,
+        error=None,
+    )
+    return dict(MODEL_STATE)
+
+
+async def awarm_model(model: str = DEFAULT_MODEL) -> bool:
+    """Load `model` - an empty prompt loads it without generating - and renew its keep-alive."""
+    start = time.monotonic()
+    try:
+        response = await get_async_client().generate(model=model, prompt="", keep_alive=keep_alive())
+    except Exception as e:
+        MODEL_STATE["error"] = str(e)
+        logger.warning(f"⚠️ Could not load model '{model}': {e}")
+        return False
+
+    load_ns = response.get("load_duration")
+    MODEL_STATE.update(
+        loaded=True,
+        load_seconds=load_ns / 1e9 if load_ns else time.monotonic() - start,
+        warmed_at=dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        error=None,
+    )
+    return True
+
+
+async def arelease_model(model: str = DEFAULT_MODEL) -> bool:
+    """Unload `model` from Ollama's memory now."""
+    try:
+        await get_async_client().generate(model=model, prompt="", keep_alive=0)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not release model '{model}': {e}")
+        return False
+    MODEL_STATE.update(loaded=False, expires_at=None, size_vram=None)
+    return True
+
+
+async def astartup_check(model: str = DEFAULT_MODEL) -> bool:
+    """Check that Ollama runs and has `model`, then load it."""
+    state = await aprobe_model(model)
+    if state["error"]:
+        logger.warning(f"⚠️ Ollama is not reachable: {state['error']}")
+        logger.warning("💡 Make sure Ollama is running - until then the original messages are sent")
+        return False
+    if not state["installed"]:
+        logger.warning(f"⚠️ Model '{model}' is not installed. Run: ollama pull {model}")
+        return False
+    if not await awarm_model(model):
+        return False
+    logger.info(f"🔥 Model '{model}' loaded in {MODEL_STATE['load_seconds']:.1f}s")
+    return True
+
+
+async def akeep_model_warm(model: str = DEFAULT_MODEL) -> None:
+    """Renew the model's keep-alive during the active hours; release it once after them."""
+    if in_hours(owner_hour(), LLM_ACTIVE_HOURS):
+        if await awarm_model(model):
+            await aprobe_model(model)
+    elif MODEL_STATE["loaded"]:
+        if await arelease_model(model):
+            logger.info(f"🌙 Released model '{model}' for the night")
+
+
+def get_model_health() -> Dict[str, Any]:
+    """Return a copy of the last known model state."""
+    return dict(MODEL_STATE)
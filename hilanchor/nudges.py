@@ -1,9 +1,12 @@
 import logging
+from functools import partial
 from telegram.ext import ContextTypes
 
 from .state_store import today_key
 from .keyboards import kb_nudge_progress
-from .llm import humanize_nudge
+from .llm import nudge_args
+from .replies import send_humanized
+from .users import as_user
 
 logger = logging.getLogger(__name__)
 
@@ -43,15 +46,16 @@ async def nudge_job(context: ContextTypes.DEFAULT_TYPE) -> None:
         logger.warning("⚠️ Nudge job triggered but no chat_id found")
         return
 
-    logger.info(f"⏰ Sending {minutes}-minute nudge to chat {chat_id}")
-    message_text = humanize_nudge(minutes)
-
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text=message_text,
-        reply_markup=kb_nudge_progress()
-    )
-    logger.info("📤 Nudge message sent")
+    # Private chats: the chat id is the user id - use that user's timezone and state
+    with as_user(chat_id):
+        logger.info(f"⏰ Sending {minutes}-minute nudge to chat {chat_id}")
+        await send_humanized(
+            partial(context.bot.send_message, chat_id=chat_id),
+            *nudge_args(minutes),
+            site="nudge",
+            reply_markup=kb_nudge_progress()
+        )
+        logger.info("📤 Nudge message sent")
 
 
 def schedule_nudge(context: ContextTypes.DEFAULT_TYPE, chat_id: int, minutes: int) -> None:
@@ -0,0 +1,196 @@
+"""
+Humanized replies within a latency budget.
+
+send_humanized() gives the model LLM_BUDGET_MS (or the call site's entry in
+LLM_BUDGETS) to humanize a message. If the text is not ready by then, the
+original text from messages.py goes out at once and the message is edited
+to the humanized version when it arrives - unless that takes longer than
+LLM_UPGRADE_DEADLINE seconds or the user taps a button on the message
+first (drop_stale_upgrades, a group -2 handler). Static messages come from
+the variant pool at once (see llm.py), so in practice this applies to
+dynamic texts, or to all of them with VARIANT_POOL_SIZE=0.
+
+With LLM_STREAM the reply is shown while it is generated: the first tokens
+are sent as soon as they arrive (within the same budget), then the message
+is edited at most every LLM_STREAM_EDIT_INTERVAL seconds - Telegram allows
+about one edit per second in a chat - and a last time with the final text.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter, defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes
+
+from .config import LLM_BUDGET_MS, LLM_BUDGETS, LLM_STREAM, LLM_STREAM_EDIT_INTERVAL, LLM_UPGRADE_DEADLINE
+from .llm import ahumanize_message, ahumanize_stream
+
+logger = logging.getLogger(__name__)
+
+# Per call site: "on_time", "fallback" (original sent first), "upgraded", "dropped"
+REPLY_STATS: Dict[str, Counter] = defaultdict(Counter)
+
+# (chat_id, message_id) -> (edit task, site) waiting for the humanized text
+_upgrades: Dict[Tuple[Any, Any], Tuple[asyncio.Task, str]] = {}
+# Upgrades of inline messages, which have no (chat_id, message_id) to key them by
+_inline_upgrades: Set[asyncio.Task] = set()
+
+
+def budget_for(site: str) -> float:
+    """Seconds the call site waits for the humanized text."""
+    return LLM_BUDGETS.get(site, LLM_BUDGET_MS) / 1000
+
+
+async def send_humanized(
+    send: Callable[..., Awaitable[Any]],
+    original_message: str,
+    context: Optional[str] = None,
+    *,
+    site: str,
+    reply_markup=None,
+) -> Any:
+    """
+    Send original_message humanized through `send` (query.edit_message_text,
+    message.reply_text, or bot.send_message with chat_id bound), or the
+    original now and the humanized text as an edit later. Returns what
+    `send` returned.
+    """
+    if LLM_STREAM:
+        stream = ahumanize_stream(original_message, context=context)
+        generation = asyncio.ensure_future(stream.__anext__())
+    else:
+        stream = None
+        generation = asyncio.ensure_future(ahumanize_message(original_message, context=context))
+
+    try:
+        text = await asyncio.wait_for(asyncio.shield(generation), budget_for(site))
+    except asyncio.TimeoutError:
+        REPLY_STATS[site]["fallback"] += 1
+        logger.info(f"⏳ {site}: humanized text not ready within {budget_for(site):.1f}s - sending the original")
+        text, pending = original_message, generation
+    except BaseException:
+        generation.cancel()
+        raise
+    else:
+        REPLY_STATS[site]["on_time"] += 1
+        if stream is None:
+            return await send(text=text, reply_markup=reply_markup)
+        pending = None
+
+    try:
+        sent = await send(text=text, reply_markup=reply_markup)
+    except BaseException:
+        generation.cancel()
+        raise
+
+    # Inline messages return True instead of the Message - edit them through `send` again
+    edit = getattr(sent, "edit_text", send)
+    if stream is None:
+        follow_up = _upgrade(site, generation, edit, original_message, reply_markup)
+    else:
+        follow_up = _follow_stream(site, stream, pending, edit, text, original_message, reply_markup)
+
+    key = (getattr(sent, "chat_id", None), getattr(sent, "message_id", None))
+    tracked = None not in key
+    if tracked:
+        cancel_upgrades(*key)  # an older upgrade of the same message must not land after this one
+    task = asyncio.create_task(follow_up)
+    if tracked:
+        _upgrades[key] = (task, site)
+    else:
+        _inline_upgrades.add(task)
+
+    def done(_) -> None:
+        generation.cancel()  # also when the task was cancelled before it started
+        _inline_upgrades.discard(task)
+        if key in _upgrades and _upgrades[key][0] is task:
+            del _upgrades[key]
+    task.add_done_callback(done)
+    return sent
+
+
+async def _upgrade(site: str, generation: asyncio.Future, edit, original_message: str, reply_markup) -> None:
+    try:
+        text = await asyncio.wait_for(generation, LLM_UPGRADE_DEADLINE)
+        if text != original_message:
+            await edit(text=text, reply_markup=reply_markup)
+            REPLY_STATS[site]["upgraded"] += 1
+    except asyncio.TimeoutError:
+        REPLY_STATS[site]["dropped"] += 1
+        logger.info(f"⌛ {site}: humanized text took over {LLM_UPGRADE_DEADLINE}s - keeping the original")
+    except TelegramError as e:
+        REPLY_STATS[site]["dropped"] += 1
+        logger.warning(f"⚠️ {site}: could not upgrade the message: {e}")
+
+
+async def _follow_stream(
+    site: str,
+    stream: AsyncIterator[str],
+    pending: Optional[asyncio.Future],
+    edit,
+    shown: str,
+    original_message: str,
+    reply_markup,
+) -> None:
+    """Edit the sent message as the stream grows, throttled, ending on the final text."""
+    last_edit = time.monotonic()
+
+    async def show(text: str) -> None:
+        nonlocal shown, last_edit
+        await edit(text=text, reply_markup=reply_markup)
+        shown, last_edit = text, time.monotonic()
+
+    async def consume() -> None:
+        latest = shown
+        if pending is not None:
+            latest = await pending
+        async for latest in stream:
+            if latest != shown and time.monotonic() - last_edit >= LLM_STREAM_EDIT_INTERVAL:
+                await show(latest)
+        if latest != shown:
+            await asyncio.sleep(max(0.0, LLM_STREAM_EDIT_INTERVAL - (time.monotonic() - last_edit)))
+            await show(latest)
+            REPLY_STATS[site]["upgraded"] += 1
+
+    try:
+        await asyncio.wait_for(consume(), LLM_UPGRADE_DEADLINE)
+    except asyncio.TimeoutError:
+        REPLY_STATS[site]["dropped"] += 1
+        logger.info(f"⌛ {site}: stream took over {LLM_UPGRADE_DEADLINE}s - back to the original")
+        if shown != original_message:
+            await show(original_message)  # never leave half a sentence behind
+    except TelegramError as e:
+        REPLY_STATS[site]["dropped"] += 1
+        logger.warning(f"⚠️ {site}: could not update the streamed message: {e}")
+    finally:
+        if pending is None or pending.done():  # a generator still inside __anext__ can't be closed
+            await stream.aclose()
+
+
+def cancel_upgrades(chat_id=None, message_id=None) -> None:
+    """Drop pending upgrades - of one message, or all of them (shutdown)."""
+    if chat_id is None:
+        for task in list(_inline_upgrades):
+            task.cancel()
+    keys = list(_upgrades) if chat_id is None else [(chat_id, message_id)]
+    for key in keys:
+        if key not in _upgrades:
+            continue
+        task, site = _upgrades.pop(key)
+        task.cancel()
+        REPLY_STATS[site]["dropped"] += 1
+
+
+async def drop_stale_upgrades(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Group -2 handler: a tap on a message means its pending upgrade must not overwrite what comes next."""
+    query = update.callback_query
+    if query is not None and query.message is not None:
+        cancel_upgrades(query.message.chat_id, query.message.message_id)
+
+
+def get_reply_stats() -> Dict[str, Dict[str, int]]:
+    """Return a copy of the per-site reply counters."""
+    return {site: dict(counts) for site, counts in REPLY_STATS.items()}
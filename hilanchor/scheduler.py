@@ -1,34 +1,86 @@
+import asyncio
 import logging
 import datetime as dt
 import zoneinfo
+from functools import partial
+from typing import Awaitable, Callable, List
+
 from telegram.ext import ContextTypes
 
-from .config import OWNER_USER_ID_INT, OWNER_CHAT_ID_INT
-from .state_store import load_state, is_done, get_mode, need_followup
+from .backup import abackup_now
+from .config import (
+    BACKUP_ENABLED, LLM_ACTIVE_HOURS, OWNER_USER_ID_INT, STATE_ARCHIVE_AFTER_DAYS, USE_LLM,
+    VARIANT_POOL_IDLE_HOURS, VARIANT_POOL_SIZE,
+)
+from .state_store import aarchive_old_days, aload_state, is_done, get_mode, need_followup
+from .aio import run_io
 from .keyboards import kb_worked, kb_day_mode
-from .llm import humanize_checkin
+from .llm import arefill_variants, checkin_args
+from .llm_health import akeep_model_warm, arelease_model, astartup_check
+from .replies import send_humanized
 from .summary import generate_daily_summary
+from .users import as_user, in_hours, owner_hour, user_tz, users_by_timezone
+from .variants import get_pool
 from . import messages as msg
 
 logger = logging.getLogger(__name__)
 
-ISRAEL_TZ = zoneinfo.ZoneInfo("Asia/Jerusalem")
 
 DAILY_STAGE_11 = "11"
 DAILY_STAGE_14 = "14"
 DAILY_STAGE_17 = "17"
 
+# Users a daily job works on at the same time
+JOB_CONCURRENCY = 16
+
+# How often the model's keep-alive is renewed during the active hours
+KEEP_MODEL_WARM_SECONDS = 600
+
+
+def _job_users(context: ContextTypes.DEFAULT_TYPE) -> List[int]:
+    # Daily jobs are scheduled once per timezone, with its name as job data
+    job = getattr(context, "job", None)
+    tz_name = getattr(job, "data", None)
+    if not isinstance(tz_name, str):
+        return [OWNER_USER_ID_INT]
+    return users_by_timezone().get(tz_name, [])
+
+
+async def for_each_user(
+    context: ContextTypes.DEFAULT_TYPE,
+    fn: Callable[[int], Awaitable[None]],
+) -> None:
+    """
+    Run fn(user_id) as that user for every user of the job, a few at a time.
+    One user's failure is logged and does not stop the others.
+    """
+    slots = asyncio.Semaphore(JOB_CONCURRENCY)
+
+    async def run(user_id: int) -> None:
+        async with slots:
+            with as_user(user_id):
+                try:
+                    await fn(user_id)
+                except Exception as e:
+                    logger.error(f"❌ Scheduled job failed for user {user_id}: {e}")
+
+    await asyncio.gather(*(run(user_id) for user_id in _job_users(context)))
+
+
+def _is_weekend() -> bool:
+    # Friday (4) and Saturday (5) in the current user's timezone
+    return dt.datetime.now(user_tz()).weekday() in (4, 5)
+
 
 async def send_checkin(chat_id: int, context: ContextTypes.DEFAULT_TYPE, stage: str) -> None:
     logger.info(f"⏰ Scheduled check-in triggered for stage {stage}")
 
     # Skip on Friday (4) and Saturday (5)
-    now = dt.datetime.now(ISRAEL_TZ)
-    if now.weekday() in (4, 5):
-        logger.info(f"🕊️ Shabbat/Weekend (day {now.weekday()}) - skipping stage {stage} check-in")
+    if _is_weekend():
+        logger.info(f"🕊️ Shabbat/Weekend - skipping stage {stage} check-in")
         return
 
-    state = load_state()
+    state = await aload_state()
 
     if is_done(state):
         logger.info(f"✅ User already marked as done - skipping stage {stage} check-in")
@@ -44,67 +96,156 @@ async def send_checkin(chat_id: int, context: ContextTypes.DEFAULT_TYPE, stage:
         return
 
     logger.info(f"📤 Sending stage {stage} check-in to chat {chat_id}")
-    text = humanize_checkin(stage)
-    await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=kb_worked())
+    await send_humanized(
+        partial(context.bot.send_message, chat_id=chat_id),
+        *checkin_args(stage),
+        site="checkin",
+        reply_markup=kb_worked(),
+    )
 
 
-async def job_11(context):
-    logger.info("⏰ Running 11:00 morning job - sending mode selection")
-
-    # Skip on Friday (4) and Saturday (5)
-    now = dt.datetime.now(ISRAEL_TZ)
-    if now.weekday() in (4, 5):
-        logger.info(f"🕊️ Shabbat/Weekend (day {now.weekday()}) - skipping morning message")
+async def _send_morning(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if _is_weekend():
+        logger.info(f"🕊️ Shabbat/Weekend - skipping morning message for user {user_id}")
         return
 
+    # Private chats: the chat ID is the user ID
     await context.bot.send_message(
-        chat_id=OWNER_CHAT_ID_INT,
+        chat_id=user_id,
         text=msg.MORNING_11,
         reply_markup=kb_day_mode()
     )
-    logger.info("📤 Sent morning mode selection message")
+    logger.info(f"📤 Sent morning mode selection message to user {user_id}")
+
+
+async def job_11(context):
+    logger.info("⏰ Running 11:00 morning job - sending mode selection")
+    await for_each_user(context, lambda user_id: _send_morning(user_id, context))
 
 
 async def job_14(context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.info("⏰ Running 14:00 check-in job")
-    await send_checkin(chat_id=OWNER_USER_ID_INT, context=context, stage=DAILY_STAGE_14)
+    await for_each_user(context, lambda user_id: send_checkin(user_id, context, DAILY_STAGE_14))
 
 
 async def job_17(context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.info("⏰ Running 17:00 check-in job")
-    await send_checkin(chat_id=OWNER_USER_ID_INT, context=context, stage=DAILY_STAGE_17)
-
+    await for_each_user(context, lambda user_id: send_checkin(user_id, context, DAILY_STAGE_17))
 
-async def job_22_summary(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send daily summary at 22:00."""
-    logger.info("⏰ Running 22:00 summary job")
 
-    # Skip on Friday (4) and Saturday (5)
-    now = dt.datetime.now(ISRAEL_TZ)
-    if now.weekday() in (4, 5):
-        logger.info(f"🕊️ Shabbat/Weekend (day {now.weekday()}) - skipping summary")
+async def _send_summary(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if _is_weekend():
+        logger.info(f"🕊️ Shabbat/Weekend - skipping summary for user {user_id}")
         return
 
-    summary = generate_daily_summary()
-    logger.info("📊 Generated daily summary - sending to user")
+    summary = await run_io(generate_daily_summary)
+    logger.info(f"📊 Generated daily summary - sending to user {user_id}")
     await context.bot.send_message(
-        chat_id=OWNER_CHAT_ID_INT,
+        chat_id=user_id,
         text=summary,
         parse_mode="Markdown"
     )
     logger.info("📤 Sent daily summary")
 
 
+async def job_22_summary(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send daily summary at 22:00."""
+    logger.info("⏰ Running 22:00 summary job")
+    await for_each_user(context, lambda user_id: _send_summary(user_id, context))
+
+
+async def _archive_user(user_id: int) -> None:
+    moved = await aarchive_old_days()
+    if moved:
+        logger.info(f"🗄️ Moved {moved} days older than {STATE_ARCHIVE_AFTER_DAYS} days to the archive (user {user_id})")
+
+
+async def job_archive_old_days(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Move old days into the compressed archive at night."""
+    await for_each_user(context, _archive_user)
+
+
+async def job_backup(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Nightly incremental backup of the state and journal (runs once, not per user)."""
+    try:
+        stats = await abackup_now()
+    except Exception as e:
+        logger.error(f"❌ Backup failed: {e}")
+        return
+    logger.info(f"💾 Backup {stats['id']} done - {stats['written']} new bytes, {stats['pruned']} old backups pruned")
+
+
+def _is_idle_hour(hour: int) -> bool:
+    return in_hours(hour, VARIANT_POOL_IDLE_HOURS)
+
+
+async def job_refill_variants(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Top up the pre-generated message variants while the owner is asleep,
+    then unload the model again; otherwise just save the pool.
+    """
+    pool = get_pool()
+    if _is_idle_hour(owner_hour()):
+        if pool is None or not pool.missing():
+            return  # nothing to generate - do not wake the model
+        added = await arefill_variants()
+        if added:
+            logger.info(f"🎲 Variant pool refilled with {added} variants")
+        if not in_hours(owner_hour(), LLM_ACTIVE_HOURS):
+            # Same policy as akeep_model_warm(): no model in memory outside the active hours
+            await arelease_model()
+        return
+    if pool is not None and pool.dirty:
+        await run_io(pool.save)
+
+
+async def job_check_model(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Right after startup: check Ollama and load the model before the first message needs it."""
+    await astartup_check()
+
+
+async def job_keep_model_warm(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await akeep_model_warm()
+
+
 def register_jobs(app) -> None:
-    logger.info("📅 Registering daily scheduled jobs:")
-    logger.info("   - 11:00 (Israel time): Morning mode selection")
-    logger.info("   - 14:00 (Israel time): Afternoon check-in")
-    logger.info("   - 17:00 (Israel time): Evening check-in")
-    logger.info("   - 22:00 (Israel time): Daily summary")
-
-    app.job_queue.run_daily(job_11, time=dt.time(hour=11, minute=0, tzinfo=ISRAEL_TZ))
-    app.job_queue.run_daily(job_14, time=dt.time(hour=14, minute=0, tzinfo=ISRAEL_TZ))
-    app.job_queue.run_daily(job_17, time=dt.time(hour=17, minute=0, tzinfo=ISRAEL_TZ))
-    app.job_queue.run_daily(job_22_summary, time=dt.time(hour=22, minute=0, tzinfo=ISRAEL_TZ))
+    groups = users_by_timezone()
+    logger.info(f"📅 Registering daily scheduled jobs for {sum(map(len, groups.values()))} users:")
+    logger.info("   - 11:00 (local time): Morning mode selection")
+    logger.info("   - 14:00 (local time): Afternoon check-in")
+    logger.info("   - 17:00 (local time): Evening check-in")
+    logger.info("   - 22:00 (local time): Daily summary")
+    if STATE_ARCHIVE_AFTER_DAYS > 0:
+        logger.info(f"   - 03:30 (local time): Archive days older than {STATE_ARCHIVE_AFTER_DAYS} days")
+    if BACKUP_ENABLED:
+        logger.info("   - 03:45 (owner's time): Incremental backup of state and journal")
+    if USE_LLM:
+        start, end = LLM_ACTIVE_HOURS
+        logger.info(f"   - {start:02d}:00-{end:02d}:00 (owner's time): Keep the LLM model loaded")
+    refill_variants = USE_LLM and VARIANT_POOL_SIZE > 0
+    if refill_variants:
+        start, end = VARIANT_POOL_IDLE_HOURS
+        logger.info(f"   - {start:02d}:00-{end:02d}:00 (owner's time): Refill the message variant pool")
+
+    # One set of jobs per timezone, each working through that timezone's users
+    for tz_name, users in groups.items():
+        tz = zoneinfo.ZoneInfo(tz_name)
+        logger.info(f"   🌍 {tz_name}: {len(users)} users")
+        app.job_queue.run_daily(job_11, time=dt.time(hour=11, minute=0, tzinfo=tz), data=tz_name)
+        app.job_queue.run_daily(job_14, time=dt.time(hour=14, minute=0, tzinfo=tz), data=tz_name)
+        app.job_queue.run_daily(job_17, time=dt.time(hour=17, minute=0, tzinfo=tz), data=tz_name)
+        app.job_queue.run_daily(job_22_summary, time=dt.time(hour=22, minute=0, tzinfo=tz), data=tz_name)
+        if STATE_ARCHIVE_AFTER_DAYS > 0:
+            app.job_queue.run_daily(job_archive_old_days, time=dt.time(hour=3, minute=30, tzinfo=tz), data=tz_name)
+    if BACKUP_ENABLED:
+        # After the owner's archive job, so the backup sees the moved days
+        app.job_queue.run_daily(job_backup, time=dt.time(hour=3, minute=45, tzinfo=user_tz(OWNER_USER_ID_INT)))
+    if USE_LLM:
+        app.job_queue.run_once(job_check_model, when=1)
+        # More often than KEEP_ALIVE_ACTIVE expires; the job itself checks the active hours
+        app.job_queue.run_repeating(job_keep_model_warm, interval=KEEP_MODEL_WARM_SECONDS, first=KEEP_MODEL_WARM_SECONDS)
+    if refill_variants:
+        # Every 10 minutes; the job itself checks the idle hours
+        app.job_queue.run_repeating(job_refill_variants, interval=600, first=60)
 
     logger.info("✅ All scheduled jobs registered successfully")
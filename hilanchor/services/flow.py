@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from ..state_store import (
-    save_state,
+    transaction,
     clear_waiting,
     set_last_plan,
     append_event,
@@ -15,12 +15,12 @@ from ..nudges import choose_nudge_minutes, schedule_nudge, cancel_existing_nudge
 
 def record_text_and_close_waiting(state: dict, event_name: str, text: str) -> None:
     """
-    Save free text, append event, clear waiting, save state.
+    Save free text, append event, clear waiting - written once.
     """
-    set_last_plan(state, text)
-    append_event(state, event_name, text=text)
-    clear_waiting(state)
-    save_state(state)
+    with transaction(state):
+        set_last_plan(state, text)
+        append_event(state, event_name, text=text)
+        clear_waiting(state)
 
 
 def record_text_schedule_nudge(
@@ -33,18 +33,16 @@ def record_text_schedule_nudge(
     default_minutes: int,
 ) -> int:
     """
-    Save text, append event(s), schedule nudge, clear waiting, save state.
+    Save text, append event(s), clear waiting (written once), schedule nudge.
     Returns chosen minutes.
     """
-    set_last_plan(state, text)
-
     mins = choose_nudge_minutes(text, default_minutes=default_minutes)
 
-    append_event(state, event_name, text=text)
-    append_event(state, "nudge_scheduled", value=mins)
-
-    clear_waiting(state)
-    save_state(state)
+    with transaction(state):
+        set_last_plan(state, text)
+        append_event(state, event_name, text=text)
+        append_event(state, "nudge_scheduled", value=mins)
+        clear_waiting(state)
 
     schedule_nudge(context, chat_id=chat_id, minutes=mins)
     return mins
@@ -57,12 +55,12 @@ def finish_day(
     chat_id: int,
 ) -> None:
     """
-    Mark day as done, cancel existing nudge, save.
+    Mark day as done (written once), cancel existing nudge.
     """
-    mark_done(state, True)
-    set_need_followup(state, False)
-    append_event(state, "closed", value=True)
-    save_state(state)
+    with transaction(state):
+        mark_done(state, True)
+        set_need_followup(state, False)
+        append_event(state, "closed", value=True)
 
     cancel_existing_nudge(context, chat_id)
 
@@ -75,10 +73,10 @@ def continue_and_nudge(
     minutes: int,
 ) -> None:
     """
-    Continue flow: mark need_followup and schedule a nudge.
+    Continue flow: mark need_followup (written once) and schedule a nudge.
     """
-    set_need_followup(state, True)
-    append_event(state, "continue", value=True)
-    save_state(state)
+    with transaction(state):
+        set_need_followup(state, True)
+        append_event(state, "continue", value=True)
 
     schedule_nudge(context, chat_id=chat_id, minutes=minutes)
@@ -1,50 +1,568 @@
-import json
+import asyncio
+import contextvars
 import datetime as dt
+import weakref
 import zoneinfo
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict, Optional, Set
-
-from .config import STATE_PATH
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .config import (
+    STATE_PATH, STATE_EVENT_LOG, STATE_LOG_COMPACT_BYTES, STATE_LOG_COMPACT_SECONDS,
+    STATE_BACKUPS, STATE_GROUP_COMMIT_MS, STATE_FORMAT, STATE_ARCHIVE_AFTER_DAYS,
+    SEEN_USERS_BLOOM_BITS, STATE_OPEN_SHARDS, OWNER_USER_ID_INT,
+)
+from .storage import (
+    NOTIFIED_KEY, DayArchive, DayState, Event, ProcessLock, SeenUserSet, StateBackend, StateConflictError, TrackedState,
+    get_serializer, open_backend,
+)
+from .storage.model import as_day
+from .storage.schema import new_day
+from .aio import run_io
+from .users import as_user, current_user, user_tz
 
 ISRAEL_TZ = zoneinfo.ZoneInfo("Asia/Jerusalem")
 
-_STATE_PATH = Path(STATE_PATH)
+# The owner's state lives at STATE_PATH; every other allowed user has a shard
+# of their own under "<STATE_PATH>.users/", opened on demand and closed when
+# it falls out of the STATE_OPEN_SHARDS most recently used ones.
+_backend: Optional[StateBackend] = None
+_shards: "OrderedDict[int, StateBackend]" = OrderedDict()
+_process_locks: Dict[str, ProcessLock] = {}
+_archive: Optional[DayArchive] = None
+_seen_users: Optional[SeenUserSet] = None
+# (backend, state object, fingerprint) of the last write made by this process
+_last_commit: Tuple[Any, Any, Any] = (None, None, None)
+
+# Authoritative in-memory state per backend, shared by all handlers and jobs.
+# It is only re-read when the backend fingerprint (file mtime/size, db
+# version) changes, e.g. after a hand edit.
+CACHE_STATS: Dict[str, int] = {"hits": 0, "misses": 0}
+
+
+class _StateCache:
+    __slots__ = ("backend", "state", "fingerprint")
+
+    def __init__(self, backend: StateBackend) -> None:
+        self.backend = backend
+        self.state: Optional[TrackedState] = None
+        self.fingerprint: Any = None
+
+
+_caches: "OrderedDict[int, _StateCache]" = OrderedDict()
+
+# Write accounting: "writes" counts real file rewrites, "saved" counts
+# save_state() calls that a transaction absorbed instead of hitting the disk,
+# "rebased" counts commits that were replayed onto newer data.
+WRITE_STATS: Dict[str, int] = {"writes": 0, "saved": 0, "rebased": 0}
+
+# A commit whose storage keeps changing underneath it gives up after this
+MAX_COMMIT_ATTEMPTS = 5
+
+# A mutation as recorded by a transaction, e.g. ("set", day, "mode", "kid")
+Op = Tuple[Any, ...]
+
+
+class _Transaction:
+    """Unit of work for one update: collects saves and flushes once."""
+
+    __slots__ = ("state", "pending", "ops")
+
+    def __init__(self, state: Dict[str, Any]) -> None:
+        self.state = state
+        self.pending = 0
+        # Mutations made through the setters, replayed onto newer state if
+        # someone else committed first
+        self.ops: List[Op] = []
+
+
+_active_tx: contextvars.ContextVar[Optional[_Transaction]] = contextvars.ContextVar(
+    "hilanchor_state_tx", default=None
+)
 
 
 def today_key() -> str:
-    return dt.datetime.now(ISRAEL_TZ).date().isoformat()
+    """Today's date key in the current user's timezone."""
+    return dt.datetime.now(user_tz()).date().isoformat()
+
+
+def _open(path) -> StateBackend:
+    return open_backend(
+        path,
+        event_log=STATE_EVENT_LOG,
+        keep_backups=STATE_BACKUPS,
+        group_commit_ms=STATE_GROUP_COMMIT_MS,
+        serializer=get_serializer(STATE_FORMAT),
+        compact_bytes=STATE_LOG_COMPACT_BYTES,
+        compact_seconds=STATE_LOG_COMPACT_SECONDS,
+    )
+
+
+def _owner_backend() -> StateBackend:
+    global _backend
+    if _backend is None:
+        _backend = _open(STATE_PATH)
+    return _backend
+
+
+def shard_path(user_id: int) -> Path:
+    """Where a non-owner user's state lives, next to the owner's."""
+    location = Path(_owner_backend().location)
+    return location.with_name(f"{location.stem}.users") / f"{user_id}{location.suffix}"
+
+
+def get_backend() -> StateBackend:
+    """The storage backend of the current user (created on first use)."""
+    user_id = current_user()
+    if user_id == OWNER_USER_ID_INT:
+        return _owner_backend()
+    backend = _shards.get(user_id)
+    if backend is not None:
+        _shards.move_to_end(user_id)
+        return backend
+    path = shard_path(user_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    backend = _shards[user_id] = _open(path)
+    while len(_shards) > STATE_OPEN_SHARDS:
+        _, evicted = _shards.popitem(last=False)
+        _caches.pop(id(evicted), None)
+        evicted.close()
+    return backend
+
+
+def use_backend(backend: StateBackend) -> Optional[StateBackend]:
+    """Swap the storage backend. Returns the previous one."""
+    global _backend
+    previous, _backend = _backend, backend
+    invalidate_cache()
+    return previous
+
+
+def _lock_at(location: str) -> ProcessLock:
+    path = f"{location}.lock"
+    lock = _process_locks.get(path)
+    if lock is None:
+        lock = _process_locks[path] = ProcessLock(path)
+    return lock
+
+
+def _lock_for(backend: StateBackend) -> ProcessLock:
+    return _lock_at(backend.location)
+
+
+@contextmanager
+def commit_lock(location=None) -> Iterator[Path]:
+    """
+    Hold the cross-process commit lock of the owner's state - or of the
+    state at `location`, e.g. a user's shard - and flush its pending
+    writes, so its files can be read or replaced as a consistent set.
+    Yields the state location.
+    """
+    if location is None:
+        backend = _owner_backend()
+    else:
+        # A shard this process has open may still have writes in flight
+        backend = next((b for b in _shards.values() if b.location == str(location)), None)
+    location = backend.location if backend is not None else str(location)
+    with _lock_at(location):
+        if backend is not None:
+            backend.flush()
+        yield Path(location)
+
+
+def _cache_for(backend: StateBackend) -> _StateCache:
+    cache = _caches.get(id(backend))
+    if cache is None or cache.backend is not backend:
+        cache = _caches[id(backend)] = _StateCache(backend)
+        # Owner + open shards; anything older belongs to a closed backend
+        while len(_caches) > STATE_OPEN_SHARDS + 1:
+            _caches.popitem(last=False)
+    else:
+        _caches.move_to_end(id(backend))
+    return cache
+
+
+def _cached_state(backend: StateBackend) -> Optional[TrackedState]:
+    cache = _caches.get(id(backend))
+    return cache.state if cache is not None and cache.backend is backend else None
 
 
 def load_state() -> Dict[str, Any]:
-    if not _STATE_PATH.exists():
-        return {}
+    backend = get_backend()
+    cache = _cache_for(backend)
+    fingerprint = backend.fingerprint()
+    if cache.state is not None and fingerprint is not None and fingerprint == cache.fingerprint:
+        CACHE_STATS["hits"] += 1
+        return cache.state
+
+    CACHE_STATS["misses"] += 1
+    state = backend.load()
+    cache.state, cache.fingerprint = state, backend.fingerprint()
+    return state
+
+
+def _load_with_today() -> Dict[str, Any]:
+    state = load_state()
+    state.get(today_key())  # pull today's partition in while off the loop
+    return state
+
+
+async def aload_state() -> Dict[str, Any]:
+    """load_state() on the I/O thread."""
+    return await run_io(_load_with_today)
+
+
+def flush_state() -> None:
+    """Wait until every save so far is on disk (group commit / shutdown)."""
+    if _backend is not None:
+        _backend.flush()
+    for backend in list(_shards.values()):
+        backend.flush()
+
+
+def invalidate_cache() -> None:
+    """Drop the in-memory states so the next load_state() reads the backend."""
+    _caches.clear()
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Return a copy of the state cache hit/miss counters."""
+    return dict(CACHE_STATS)
+
+
+# ---------------------------------------------------------------------------
+# Writing: optimistic compare-and-swap against the storage version
+# ---------------------------------------------------------------------------
+
+def _is_authoritative(state: Dict[str, Any]) -> bool:
+    return state is _cached_state(get_backend())
+
+
+def _prepare_write(state: Dict[str, Any]) -> Tuple[StateBackend, Callable[[], Tuple[bool, Any, Any]]]:
+    """
+    Serialize now, on the calling thread, and return the I/O part. The I/O
+    part takes the cross-process lock and writes only if storage is still
+    at the version this state was based on; it returns (written, new
+    version, durable). With group commit, durable is the Future of the
+    batch: wait for it with _wait_durable()/_await_durable(), outside the
+    lock, so that concurrent commits can join the same batch. Until it is
+    done other processes stay locked out.
+    """
+    backend = get_backend()
+    expected = _cache_for(backend).fingerprint if _is_authoritative(state) else None
+    write = backend.prepare_save(state)
+    lock = _lock_for(backend)
+
+    def run() -> Tuple[bool, Any, Any]:
+        global _last_commit
+        with lock:
+            current = backend.fingerprint()
+            # A newer commit of this very object (another update in this
+            # process) is not a conflict - it already carries our changes
+            ours = _last_commit[0] is backend and _last_commit[1] is state
+            if expected is not None and current != expected and not (ours and current == _last_commit[2]):
+                return False, None, None
+            try:
+                durable = write()
+            except BaseException:
+                # The cached state is ahead of the disk now - reload it next time
+                _caches.pop(id(backend), None)
+                raise
+            if durable is not None:
+                lock.hold_until(durable)
+            fingerprint = backend.fingerprint()
+            _last_commit = (backend, state, fingerprint)
+            return True, fingerprint, durable
+
+    return backend, run
+
+
+def _wait_durable(backend: StateBackend, durable: Any) -> None:
+    if durable is None:
+        return
     try:
-        return json.loads(_STATE_PATH.read_text(encoding="utf-8"))
+        durable.result()
     except Exception:
-        return {}
+        _caches.pop(id(backend), None)
+        raise
+
+
+async def _await_durable(backend: StateBackend, durable: Any) -> None:
+    if durable is None:
+        return
+    try:
+        # Shielded: a cancelled update does not cancel the batch it joined
+        await asyncio.shield(asyncio.wrap_future(durable))
+    except Exception:
+        _caches.pop(id(backend), None)
+        raise
+
+
+def _finish_write(backend: StateBackend, state: Dict[str, Any], fingerprint: Any) -> None:
+    WRITE_STATS["writes"] += 1
+    if isinstance(state, TrackedState):
+        # Our own write: the saved object stays authoritative
+        state.version += 1
+        cache = _cache_for(backend)
+        cache.state, cache.fingerprint = state, fingerprint
+    else:
+        _caches.pop(id(backend), None)
+    print("DEBUG saving to:", backend.location)
+
+
+def _check_not_stale(state: Dict[str, Any]) -> None:
+    current = _cached_state(get_backend())
+    if isinstance(state, TrackedState) and current is not None and state is not current:
+        raise StateConflictError(
+            f"state v{state.version} is a stale copy - newer data was loaded since; "
+            "mutate inside transaction()/atransaction() so changes can be replayed"
+        )
+
+
+def _write_state(state: Dict[str, Any]) -> None:
+    _check_not_stale(state)
+    backend, run = _prepare_write(state)
+    written, fingerprint, durable = run()
+    if not written:
+        _caches.pop(id(backend), None)
+        raise StateConflictError(f"{backend.location} changed on disk since it was loaded")
+    _wait_durable(backend, durable)
+    _finish_write(backend, state, fingerprint)
+
+
+def _rebase(tx: _Transaction, fresh: Dict[str, Any]) -> Dict[str, Any]:
+    """The state a transaction should commit: its own, or fresh + its ops."""
+    if fresh is tx.state or not tx.ops:
+        return tx.state
+    for op in tx.ops:
+        _apply_op(fresh, op)
+    WRITE_STATS["rebased"] += 1
+    return fresh
+
+
+def _lost_race(tx: _Transaction) -> None:
+    # Someone else wrote first: drop our copy and replay onto theirs
+    _caches.pop(id(get_backend()), None)
+    if not tx.ops:
+        raise StateConflictError(
+            f"{get_backend().location} changed on disk and the transaction made no "
+            "replayable changes (state mutated without the store setters)"
+        )
+
+
+def _commit(tx: _Transaction) -> None:
+    state = tx.state
+    if isinstance(state, TrackedState) and not _is_authoritative(state):
+        state = _rebase(tx, load_state())
+    for _ in range(MAX_COMMIT_ATTEMPTS):
+        backend, run = _prepare_write(state)
+        written, fingerprint, durable = run()
+        if written:
+            _wait_durable(backend, durable)
+            _finish_write(backend, state, fingerprint)
+            return
+        _lost_race(tx)
+        state = _rebase(tx, load_state())
+    raise StateConflictError(f"Could not commit to {get_backend().location}: storage kept changing")
+
+
+async def _acommit(tx: _Transaction) -> None:
+    state = tx.state
+    if isinstance(state, TrackedState) and not _is_authoritative(state):
+        state = _rebase(tx, await aload_state())
+    for _ in range(MAX_COMMIT_ATTEMPTS):
+        backend, run = _prepare_write(state)
+        written, fingerprint, durable = await run_io(run)
+        if written:
+            await _await_durable(backend, durable)
+            _finish_write(backend, state, fingerprint)
+            return
+        _lost_race(tx)
+        state = _rebase(tx, await aload_state())
+    raise StateConflictError(f"Could not commit to {get_backend().location}: storage kept changing")
 
 
 def save_state(state: Dict[str, Any]) -> None:
-    _STATE_PATH.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
-    print("DEBUG saving to:", _STATE_PATH.resolve())
+    tx = _active_tx.get()
+    if tx is not None and tx.state is state:
+        # Deferred until the surrounding transaction exits
+        tx.pending += 1
+        return
+    _write_state(state)
+
+
+async def asave_state(state: Dict[str, Any]) -> None:
+    """save_state() with the disk write on the I/O thread."""
+    tx = _active_tx.get()
+    if tx is not None and tx.state is state:
+        tx.pending += 1
+        return
+    _check_not_stale(state)
+    backend, run = _prepare_write(state)
+    written, fingerprint, durable = await run_io(run)
+    if not written:
+        _caches.pop(id(backend), None)
+        raise StateConflictError(f"{backend.location} changed on disk since it was loaded")
+    await _await_durable(backend, durable)
+    _finish_write(backend, state, fingerprint)
+
+
+@contextmanager
+def transaction(state: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Group all mutations of one update into a single write.
+
+    Loads the state (unless one is given), yields it, and writes it once on
+    exit if anything called save_state() in between - including the implicit
+    saves inside the setters. The write also happens when the block raises,
+    so mutations made before an error are kept just like before.
+    Nested transactions on the same state join the outer one.
+
+    If another writer (a job, another process) committed in the meantime,
+    the setter calls made in the block are replayed onto the newer state
+    instead of overwriting it.
+
+        with transaction() as state:
+            set_worked(state, "yes")
+            append_event(state, "checkin_answer", value="yes")
+    """
+    outer = _active_tx.get()
+    if outer is not None and (state is None or state is outer.state):
+        yield outer.state
+        return
+
+    tx = _Transaction(load_state() if state is None else state)
+    token = _active_tx.set(tx)
+    try:
+        yield tx.state
+    finally:
+        _active_tx.reset(token)
+        if tx.pending:
+            _commit(tx)
+            WRITE_STATS["saved"] += tx.pending - 1
+
+
+# Per-chat ordering: updates of one chat run their transactions one at a time
+_chat_locks: "weakref.WeakValueDictionary[Any, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def chat_lock(chat_id: Any) -> asyncio.Lock:
+    """The lock that serializes state transactions for one chat."""
+    lock = _chat_locks.get(chat_id)
+    if lock is None:
+        lock = _chat_locks[chat_id] = asyncio.Lock()
+    return lock
+
+
+@asynccontextmanager
+async def atransaction(
+    state: Optional[Dict[str, Any]] = None,
+    chat_id: Any = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    transaction() for async handlers: the load and the final write run on
+    the I/O thread, the mutations in between stay in memory. With chat_id,
+    transactions of the same chat run one after another, in arrival order.
+
+        async with atransaction(chat_id=update.effective_chat.id) as state:
+            set_mode(state, "kid")
+    """
+    outer = _active_tx.get()
+    if outer is not None and (state is None or state is outer.state):
+        yield outer.state
+        return
+
+    lock = chat_lock(chat_id) if chat_id is not None else None
+    if lock is not None:
+        await lock.acquire()
+    try:
+        tx = _Transaction(await aload_state() if state is None else state)
+        token = _active_tx.set(tx)
+        try:
+            yield tx.state
+        finally:
+            _active_tx.reset(token)
+            if tx.pending:
+                await _acommit(tx)
+                WRITE_STATS["saved"] += tx.pending - 1
+    finally:
+        if lock is not None:
+            lock.release()
+
+
+def get_write_stats() -> Dict[str, int]:
+    """Return a copy of the write counters (real writes vs. writes saved)."""
+    return dict(WRITE_STATS)
+
+
+# ---------------------------------------------------------------------------
+# Mutations - every setter goes through _mutate() so transactions can replay
+# ---------------------------------------------------------------------------
+
+def _day(state: Dict[str, Any], key: str) -> Dict[str, Any]:
+    if key not in state:
+        state[key] = new_day()
+    if isinstance(state, TrackedState):
+        state.touch_day(key)
+    return state[key]
 
 
 def day_state(state: Dict[str, Any]) -> Dict[str, Any]:
-    k = today_key()
-    state.setdefault(k, {})
-    return state[k]
+    return _day(state, today_key())
+
+
+def _touch_meta(state: Dict[str, Any]) -> None:
+    if isinstance(state, TrackedState):
+        state.touch_meta()
+
+
+def _apply_op(state: Dict[str, Any], op: Op) -> None:
+    kind = op[0]
+    if kind == "set":
+        _day(state, op[1])[op[2]] = op[3]
+    elif kind == "del":
+        _day(state, op[1]).pop(op[2], None)
+    elif kind == "incr":
+        d = _day(state, op[1])
+        d[op[2]] = int(d.get(op[2], 0)) + op[3]
+    elif kind == "drop":
+        state.pop(op[1], None)
+        if isinstance(state, TrackedState):
+            state.touch_day(op[1])
+    elif kind == "event":
+        _day(state, op[1]).setdefault("events", []).append(op[2])
+    elif kind == "notify":
+        s = _notified_set(state)
+        s.add(op[1])
+        state["notified_non_owner_user_ids"] = sorted(s)
+        _touch_meta(state)
+    elif kind == "meta_default":
+        state.setdefault(op[1], op[2])
+        _touch_meta(state)
+    else:
+        raise ValueError(f"Unknown state op: {kind}")
+
+
+def _mutate(state: Dict[str, Any], *ops: Op) -> None:
+    tx = _active_tx.get()
+    for op in ops:
+        _apply_op(state, op)
+        if tx is not None and tx.state is state:
+            tx.ops.append(op)
+
+
+def _now_iso() -> str:
+    return dt.datetime.now(user_tz()).isoformat(timespec="seconds")
 
 
 def set_waiting(state: Dict[str, Any], waiting_for: str) -> None:
-    d = day_state(state)
-    d["waiting_for"] = waiting_for
+    _mutate(state, ("set", today_key(), "waiting_for", waiting_for))
     save_state(state)
 
 
 def clear_waiting(state: Dict[str, Any]) -> None:
-    d = day_state(state)
-    if "waiting_for" in d:
-        del d["waiting_for"]
+    _mutate(state, ("del", today_key(), "waiting_for"))
     save_state(state)
 
 
@@ -53,8 +571,7 @@ def get_waiting(state: Dict[str, Any]) -> Optional[str]:
 
 
 def set_mode(state: Dict[str, Any], mode: str) -> None:
-    d = day_state(state)
-    d["mode"] = mode
+    _mutate(state, ("set", today_key(), "mode", mode))
     save_state(state)
 
 
@@ -63,8 +580,7 @@ def get_mode(state: Dict[str, Any]) -> str:
 
 
 def mark_done(state: Dict[str, Any], done: bool = True) -> None:
-    d = day_state(state)
-    d["done"] = bool(done)
+    _mutate(state, ("set", today_key(), "done", bool(done)))
     save_state(state)
 
 
@@ -73,8 +589,7 @@ def is_done(state: Dict[str, Any]) -> bool:
 
 
 def set_need_followup(state: Dict[str, Any], need: bool) -> None:
-    d = day_state(state)
-    d["need_followup"] = bool(need)
+    _mutate(state, ("set", today_key(), "need_followup", bool(need)))
     save_state(state)
 
 
@@ -83,59 +598,122 @@ def need_followup(state: Dict[str, Any]) -> bool:
 
 
 def bump_fail(state: Dict[str, Any]) -> int:
-    d = day_state(state)
-    d["fail_count"] = int(d.get("fail_count", 0)) + 1
+    k = today_key()
+    _mutate(state, ("incr", k, "fail_count", 1))
     save_state(state)
-    return d["fail_count"]
+    return state[k]["fail_count"]
 
 
 def reset_fail(state: Dict[str, Any]) -> None:
-    d = day_state(state)
-    d["fail_count"] = 0
+    _mutate(state, ("set", today_key(), "fail_count", 0))
     save_state(state)
 
 
 def set_last_plan(state: Dict[str, Any], text: str) -> None:
-    d = day_state(state)
-    d["plan"] = text
-    d["plan_ts"] = dt.datetime.now(ISRAEL_TZ).isoformat(timespec="seconds")
+    k = today_key()
+    _mutate(state, ("set", k, "plan", text), ("set", k, "plan_ts", _now_iso()))
     save_state(state)
 
 
 def set_worked(state: Dict[str, Any], worked: str) -> None:
-    d = day_state(state)
-    d["worked"] = worked
-    d["worked_ts"] = dt.datetime.now(ISRAEL_TZ).isoformat(timespec="seconds")
+    k = today_key()
+    _mutate(state, ("set", k, "worked", worked), ("set", k, "worked_ts", _now_iso()))
     save_state(state)
 
 def _notified_set(state: Dict[str, Any]) -> Set[str]:
     state.setdefault("notified_non_owner_user_ids", [])
     return set(str(x) for x in state["notified_non_owner_user_ids"])
 
+# The two helpers below use the legacy list inside the state; the bot itself
+# tracks strangers with aremember_non_owner(), outside the state
+
 def has_notified_non_owner(state: Dict[str, Any], user_id: int) -> bool:
     return str(user_id) in _notified_set(state)
 
 def mark_notified_non_owner(state: Dict[str, Any], user_id: int) -> None:
-    s = _notified_set(state)
-    s.add(str(user_id))
-    state["notified_non_owner_user_ids"] = sorted(s)
+    _mutate(state, ("notify", str(user_id)))
     save_state(state)
 
 def set_context(state, context: str):
-    state.setdefault("context", context)
+    _mutate(state, ("meta_default", "context", context))
     save_state(state)
 
 def append_event(state: Dict[str, Any], event_type: str, value: Any = None, text: Optional[str] = None) -> None:
-    d = day_state(state)
-
-    ev: Dict[str, Any] = {
-        "ts": dt.datetime.now(ISRAEL_TZ).isoformat(timespec="seconds"),
-        "type": event_type,
-    }
-    if value is not None:
-        ev["value"] = value
-    if text is not None:
-        ev["text"] = text
-
-    d.setdefault("events", []).append(ev)
-    save_state(state)
\ No newline at end of file
+    ev = Event.now(event_type, user_tz(), value=value, text=text)
+    _mutate(state, ("event", today_key(), ev))
+    save_state(state)
+
+
+# ---------------------------------------------------------------------------
+# Cold tier - old days live in a compressed archive next to the state
+# ---------------------------------------------------------------------------
+
+def get_archive() -> DayArchive:
+    """The archive that belongs to the current backend."""
+    global _archive
+    location = Path(get_backend().location)
+    directory = location.with_name(f"{location.name}.archive")
+    if _archive is None or _archive.directory != directory:
+        _archive = DayArchive(directory)
+    return _archive
+
+
+def get_day(day: str) -> DayState:
+    """A day's data from the working state or, once archived, the archive."""
+    data = load_state().get(day)
+    if data is None:
+        data = get_archive().get_day(day)
+    return as_day(data or {})
+
+
+async def aarchive_old_days(keep_days: int = STATE_ARCHIVE_AFTER_DAYS) -> int:
+    """
+    Move days older than keep_days out of the working state into the
+    archive. Days are written to the archive first and only then dropped
+    from the state, so a crash in between leaves a day in both places
+    (the working copy wins) rather than in neither. Returns the number of
+    days moved.
+    """
+    if keep_days <= 0:
+        return 0
+    cutoff = (dt.datetime.now(user_tz()).date() - dt.timedelta(days=keep_days)).isoformat()
+    async with atransaction() as state:
+        old = [k for k in await run_io(state.day_keys) if k < cutoff]
+        if not old:
+            return 0
+        # Pulls lazily stored days in off the loop; nobody edits past days
+        days = await run_io(lambda: {k: state[k] for k in old})
+        await run_io(get_archive().add_days, days)
+        _mutate(state, *(("drop", k) for k in old))
+        save_state(state)
+    return len(old)
+
+
+# ---------------------------------------------------------------------------
+# Strangers - non-owner IDs already answered, persisted outside the state
+# ---------------------------------------------------------------------------
+
+def get_seen_users() -> SeenUserSet:
+    """The seen-users set, kept next to the owner's state."""
+    global _seen_users
+    location = Path(_owner_backend().location)
+    path = location.with_name(f"{location.name}.seen")
+    if _seen_users is None or _seen_users.path != path:
+        _seen_users = SeenUserSet(path, bloom_bits=SEEN_USERS_BLOOM_BITS)
+    return _seen_users
+
+
+async def aremember_non_owner(user_id: int) -> bool:
+    """
+    Record a non-owner who reached the bot. True only the first time, so
+    the caller answers each stranger once. After the first call this is a
+    memory lookup, plus a one-line append for a new ID.
+    """
+    seen = get_seen_users()
+    if not seen.loaded:
+        with as_user(OWNER_USER_ID_INT):
+            legacy = (await aload_state()).get(NOTIFIED_KEY) or []
+        await run_io(seen.load, list(legacy))
+    if user_id in seen:
+        return False
+    return await run_io(seen.add, user_id)
@@ -0,0 +1,64 @@
+"""
+Pluggable persistence for the bot state.
+
+STATE_PATH picks the backend: a path ending in .db/.sqlite/.sqlite3 uses
+SQLite, a path without a suffix (e.g. "state/") a directory with one JSON
+file per day, anything else the single JSON file (optionally with an
+append-only change log next to it). File contents are compact JSON or,
+with STATE_FORMAT=msgpack, binary - see serializers.py. Old days can be
+moved to a compressed cold tier next to it - see archive.py. Each day
+carries a schema version and is upgraded lazily on read - see schema.py.
+"""
+from pathlib import Path
+from typing import Optional
+
+from .archive import DayArchive
+from .atomic import GroupCommitter, atomic_write_bytes
+from .base import StateBackend, StateConflictError, TrackedState, LazyState, is_day_key, NOTIFIED_KEY
+from .json_backend import JsonBackend
+from .event_log import EventLogBackend
+from .partitioned import PartitionedBackend
+from .locking import ProcessLock
+from .model import DayState, Event, EventType
+from .seen_users import SeenUserSet
+from .serializers import Serializer, decode, get_serializer
+from .sqlite_backend import SqliteBackend, SQLITE_SUFFIXES
+
+
+def open_backend(
+    path,
+    event_log: bool = False,
+    keep_backups: int = 0,
+    group_commit_ms: int = 0,
+    serializer: Optional[Serializer] = None,
+    **log_options,
+) -> StateBackend:
+    """
+    Create the backend that matches the given STATE_PATH.
+
+    event_log=True keeps JSON state as snapshot + append-only log;
+    log_options (compact_bytes, compact_seconds) tune its compaction.
+    JSON files keep `keep_backups` last-good copies, and group_commit_ms > 0
+    coalesces writes within that window into one fsync. SQLite handles
+    both itself (WAL journal). serializer picks the file format of the
+    file-based backends (compact JSON by default).
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in SQLITE_SUFFIXES:
+        return SqliteBackend(path)
+    committer = GroupCommitter(group_commit_ms / 1000) if group_commit_ms > 0 else None
+    if not suffix:
+        return PartitionedBackend(path, keep_backups=keep_backups, committer=committer, serializer=serializer)
+    if event_log:
+        return EventLogBackend(
+            path, keep_backups=keep_backups, committer=committer, serializer=serializer, **log_options
+        )
+    return JsonBackend(path, keep_backups=keep_backups, committer=committer, serializer=serializer)
+
+
+__all__ = [
+    "DayArchive", "DayState", "Event", "EventType", "GroupCommitter", "atomic_write_bytes",
+    "ProcessLock", "SeenUserSet", "Serializer", "decode", "get_serializer", "StateBackend", "StateConflictError", "TrackedState", "LazyState",
+    "is_day_key", "NOTIFIED_KEY",
+    "JsonBackend", "EventLogBackend", "PartitionedBackend", "SqliteBackend", "open_backend",
+]
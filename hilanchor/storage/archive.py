@@ -0,0 +1,95 @@
+"""
+Cold tier for old days.
+
+    state.json.archive/
+        index.json     {"2025-01-03": ["2025-01.arc", offset, length], ...}
+        2025-01.arc    zlib-compressed days of January 2025, back to back
+
+Every day is compressed on its own, so reading one archived day is a seek
+and a single small read, whatever the size of the month. Archives are
+append-only: a day archived again is appended and the index points at the
+newest copy. The index is replaced atomically after the data is on disk,
+so a crash can leave unused bytes at the end of a month file but never an
+index entry without its data.
+"""
+import json
+import logging
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .atomic import append_bytes, atomic_write_bytes
+from .base import file_fingerprint
+from .serializers import decode, get_serializer
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+
+
+class DayArchive:
+    """Compressed per-month archive of days with a day -> offset index."""
+
+    def __init__(self, directory) -> None:
+        self.directory = Path(directory)
+        self.index_path = self.directory / INDEX_FILE
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, List[Any]]] = None
+        self._index_fp: Any = None
+
+    def _load_index(self) -> Dict[str, List[Any]]:
+        fingerprint = file_fingerprint(self.index_path)
+        if self._index is None or fingerprint != self._index_fp:
+            try:
+                self._index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                self._index = {}
+            self._index_fp = fingerprint
+        return self._index
+
+    def days(self) -> List[str]:
+        return sorted(self._load_index())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._load_index()
+
+    def get_day(self, key: str) -> Optional[Dict[str, Any]]:
+        """One archived day, or None if it was never archived."""
+        entry = self._load_index().get(key)
+        if entry is None:
+            return None
+        name, offset, length = entry
+        with open(self.directory / name, "rb") as f:
+            f.seek(offset)
+            blob = f.read(length)
+        return decode(zlib.decompress(blob))
+
+    def add_days(self, days: Dict[str, Dict[str, Any]]) -> None:
+        """Append days to their month files, then publish them in the index."""
+        if not days:
+            return
+        serializer = get_serializer()
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            index = dict(self._load_index())
+            by_month: Dict[str, List[str]] = {}
+            for key in sorted(days):
+                by_month.setdefault(key[:7], []).append(key)
+
+            for month, keys in by_month.items():
+                name = f"{month}.arc"
+                path = self.directory / name
+                offset = path.stat().st_size if path.exists() else 0
+                chunks = []
+                for key in keys:
+                    blob = zlib.compress(serializer.dumps(days[key]), 6)
+                    index[key] = [name, offset, len(blob)]
+                    offset += len(blob)
+                    chunks.append(blob)
+                append_bytes(path, b"".join(chunks))
+
+            data = json.dumps(index, separators=(",", ":"), sort_keys=True).encode("utf-8")
+            atomic_write_bytes(self.index_path, data)
+            self._index, self._index_fp = index, file_fingerprint(self.index_path)
+        logger.info(f"🗄️ Archived {len(days)} days into {self.directory}")
@@ -0,0 +1,222 @@
+"""
+Crash-safe file writes for the state files.
+
+atomic_write_bytes() never leaves a half-written file behind: data goes to a
+temp file that is fsynced and then renamed over the target. The previous
+version is kept as "<name>.bak.1" (older ones shift to .bak.2, ...), so a
+good copy always exists to recover from.
+
+GroupCommitter batches writes that arrive within a short window: the latest
+snapshot of a file (or all appended chunks of a log) is written with a
+single fsync instead of one per save.
+"""
+import atexit
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def backup_path(path: Path, n: int) -> Path:
+    return path.with_name(f"{path.name}.bak.{n}")
+
+
+def _fsync_dir(directory: Path) -> None:
+    # Make the rename itself durable (not supported on Windows - best effort)
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def rotate_backups(path: Path, keep: int) -> None:
+    """Shift .bak.N files and make the current file .bak.1 (hard link when possible)."""
+    if keep <= 0 or not path.exists():
+        return
+    for n in range(keep - 1, 0, -1):
+        older = backup_path(path, n)
+        if older.exists():
+            os.replace(older, backup_path(path, n + 1))
+    newest = backup_path(path, 1)
+    tmp = newest.with_name(newest.name + ".tmp")
+    try:
+        if tmp.exists():
+            tmp.unlink()
+        os.link(path, tmp)
+    except OSError:
+        shutil.copy2(path, tmp)
+    os.replace(tmp, newest)
+
+
+def atomic_write_bytes(path, data: bytes, keep_backups: int = 0) -> None:
+    """Write data to path via temp file + fsync + rename."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    rotate_backups(path, keep_backups)
+    os.replace(tmp, path)
+    _fsync_dir(path.parent)
+
+
+def append_bytes(path, data: bytes) -> None:
+    """Append data to path and fsync it."""
+    with open(path, "ab") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class _Pending:
+    __slots__ = ("append", "keep_backups", "chunks", "callbacks", "future")
+
+    def __init__(self, append: bool, keep_backups: int) -> None:
+        self.append = append
+        self.keep_backups = keep_backups
+        self.chunks: List[bytes] = []
+        self.callbacks: List[Callable[[], None]] = []
+        self.future: Future = Future()
+        self.future.set_running_or_notify_cancel()  # waiters may give up, the write still happens
+
+
+def gather(futures: List[Future]) -> Future:
+    """A future that completes once all of `futures` have; it fails with the first error among them."""
+    combined: Future = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def settle(_: Future) -> None:
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            combined.set_exception(errors[0])
+        else:
+            combined.set_result(None)
+
+    if not futures:
+        combined.set_result(None)
+    for future in futures:
+        future.add_done_callback(settle)
+    return combined
+
+
+class GroupCommitter:
+    """
+    Background writer that coalesces writes arriving within `window` seconds.
+
+    Replace-writes of the same file keep only the newest payload; appends to
+    the same file are concatenated. Each file is then written and fsynced
+    once per window. submit() returns a Future that completes once the data
+    is on disk and carries the error if the write failed; callers wait on it
+    outside their locks so that concurrent saves can join the same batch.
+    on_done callbacks run after a successful write, before the future
+    completes. flush() waits for everything submitted so far.
+    """
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self.stats: Dict[str, int] = {"submitted": 0, "writes": 0, "failed": 0}
+        self._cond = threading.Condition()
+        self._pending: Dict[Path, _Pending] = {}
+        self._inflight = 0
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+        atexit.register(self.close)
+
+    def submit(
+        self,
+        path,
+        data: bytes,
+        append: bool = False,
+        keep_backups: int = 0,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> Future:
+        path = Path(path)
+        with self._cond:
+            pending = self._pending.get(path)
+            if pending is None:
+                pending = self._pending[path] = _Pending(append, keep_backups)
+            if append:
+                pending.chunks.append(data)
+            else:
+                pending.chunks = [data]
+            if on_done is not None:
+                pending.callbacks.append(on_done)
+            self.stats["submitted"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="hilanchor-group-commit", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            return pending.future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything pending now and wait for it. Returns False on timeout."""
+        with self._cond:
+            if not self._pending and not self._inflight:
+                return True
+            self._wake.set()
+            return self._cond.wait_for(lambda: not self._pending and not self._inflight, timeout)
+
+    def close(self) -> None:
+        self.flush()
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closing)
+                if self._closing and not self._pending:
+                    return
+            # Let other writes join this group (flush() cuts the wait short)
+            self._wake.wait(self.window)
+            with self._cond:
+                self._wake.clear()
+                batch, self._pending = self._pending, {}
+                self._inflight += 1
+            try:
+                for path, pending in batch.items():
+                    self._write(path, pending)
+            finally:
+                with self._cond:
+                    self._inflight -= 1
+                    self._cond.notify_all()
+
+    def _write(self, path: Path, pending: _Pending) -> None:
+        try:
+            data = b"".join(pending.chunks)
+            if pending.append:
+                append_bytes(path, data)
+            else:
+                atomic_write_bytes(path, data, keep_backups=pending.keep_backups)
+            self.stats["writes"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"❌ Group commit to {path} failed: {e}")
+            pending.future.set_exception(e)
+            return
+        for callback in pending.callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"❌ Group commit callback for {path} failed: {e}")
+        pending.future.set_result(None)
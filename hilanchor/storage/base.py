@@ -0,0 +1,212 @@
+"""
+Storage backend interface and change tracking for the bot state.
+"""
+import os
+import re
+from collections.abc import Mapping
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from .model import as_day
+
+DAY_KEY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+NOTIFIED_KEY = "notified_non_owner_user_ids"
+
+
+def is_day_key(key: str) -> bool:
+    return bool(DAY_KEY_RE.match(str(key)))
+
+
+def file_fingerprint(path) -> Optional[tuple]:
+    """(mtime, size, inode) of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class TrackedState(dict):
+    """
+    The state dict ({day: day_state, meta_key: value}) plus a record of what
+    changed since it was last persisted, so backends can write deltas.
+
+    state_store marks days/meta as touched; everything else treats it as a
+    plain dict. Day dicts put into it are stored as DayState (model.py).
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        for key, value in dict.items(self):
+            if type(value) is dict and is_day_key(key):
+                dict.__setitem__(self, key, as_day(value))
+        self.dirty_days: Set[str] = set()
+        self.meta_dirty = False
+        # Bumped on every successful commit of this object
+        self.version = 0
+        # Number of events per day already stored by the backend
+        self.persisted_events: Dict[str, int] = {}
+        self._count_events(k for k in self if is_day_key(k))
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        if type(value) is dict and isinstance(key, str) and is_day_key(key):
+            value = as_day(value)
+        super().__setitem__(key, value)
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def touch_day(self, key: str) -> None:
+        self.dirty_days.add(key)
+
+    def touch_meta(self) -> None:
+        self.meta_dirty = True
+
+    def meta_items(self) -> Iterable:
+        return ((k, v) for k, v in self.items() if not is_day_key(k))
+
+    def mark_clean(self) -> None:
+        self._count_events(self.dirty_days)
+        self.dirty_days.clear()
+        self.meta_dirty = False
+
+    def _count_events(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            day = self.get(key)
+            if isinstance(day, Mapping):
+                self.persisted_events[key] = len(day.get("events") or [])
+            else:
+                self.persisted_events.pop(key, None)
+
+    def day_keys(self) -> List[str]:
+        """Every stored day, sorted."""
+        return sorted(k for k in self if is_day_key(k))
+
+
+class LazyState(TrackedState):
+    """
+    TrackedState that starts with only the meta keys and pulls in a day the
+    first time it is looked up (get / in / [] / setdefault), through
+    load_day(key) -> day dict or None.
+
+    Iteration, len() and items() only see the days loaded so far; call
+    materialize() to pull in everything (== does this itself).
+    """
+
+    def __init__(self, data: Dict[str, Any], load_day, list_days) -> None:
+        super().__init__(data)
+        self._load_day = load_day
+        self._list_days = list_days
+        self._absent: Set[str] = set()
+
+    def _fault(self, key: Any) -> bool:
+        if dict.__contains__(self, key):
+            return True
+        if not isinstance(key, str) or not is_day_key(key) or key in self._absent:
+            return False
+        day = self._load_day(key)
+        if day is None:
+            self._absent.add(key)
+            return False
+        dict.__setitem__(self, key, as_day(day))
+        self._count_events([key])
+        return True
+
+    def __missing__(self, key: Any) -> Any:
+        if self._fault(key):
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key: Any) -> bool:
+        return self._fault(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return dict.__getitem__(self, key) if self._fault(key) else default
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if not self._fault(key):
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        found = self._fault(key)
+        if found and isinstance(key, str) and is_day_key(key):
+            # Still on disk until the next save - don't fault it back in
+            self._absent.add(key)
+        return super().pop(key, *default)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._absent.discard(key)
+        super().__setitem__(key, value)
+
+    def day_keys(self) -> List[str]:
+        loaded = set(self.loaded_days())
+        return sorted(loaded | {k for k in self._list_days() if k not in self._absent})
+
+    def loaded_days(self) -> Iterable[str]:
+        return [k for k in dict.keys(self) if is_day_key(k)]
+
+    def materialize(self) -> "LazyState":
+        """Load every stored day."""
+        for key in self._list_days():
+            self._fault(key)
+        return self
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, LazyState):
+            other.materialize()
+        return dict.__eq__(self.materialize(), other)
+
+    def __ne__(self, other: Any) -> bool:
+        return not self == other
+
+    __hash__ = None  # type: ignore[assignment]
+
+
+class StateConflictError(RuntimeError):
+    """A stale copy of the state was about to overwrite newer data."""
+
+
+class StateBackend:
+    """
+    Where the state lives. Backends must keep load()/save() lossless for the
+    JSON shape the rest of the bot uses.
+    """
+
+    #: Human readable location, used in log lines
+    location: str = ""
+
+    def load(self) -> TrackedState:
+        raise NotImplementedError
+
+    def save(self, state: Dict[str, Any]) -> None:
+        """Persist state. A TrackedState may be written incrementally."""
+        durable = self.prepare_save(state)()
+        if durable is not None:
+            durable.result()
+
+    def prepare_save(self, state: Dict[str, Any]) -> Callable[[], Optional[Future]]:
+        """
+        Capture what has to be written - in memory, on the caller's thread -
+        and return the function that does the disk I/O. The returned
+        callable may run on another thread while state keeps changing. It
+        returns None once the data is on disk, or - with group commit - a
+        Future that completes when it is.
+        """
+        raise NotImplementedError
+
+    def fingerprint(self) -> Optional[Hashable]:
+        """
+        Cheap token that changes whenever the stored data changes, used to
+        validate the in-memory cache. None disables caching.
+        """
+        return None
+
+    def flush(self) -> None:
+        """Block until every accepted save is on disk."""
+
+    def close(self) -> None:
+        self.flush()
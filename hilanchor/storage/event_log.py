@@ -0,0 +1,200 @@
+"""
+JSON snapshot + append-only change log.
+
+Instead of rewriting state.json on every save, the changes of a TrackedState
+(fields of the touched days and the events appended since the last save)
+are written as one JSON line to "<STATE_PATH>.log". Loading reads the
+snapshot and replays the log tail. When the log grows past a size or age
+threshold it is folded into a fresh snapshot and truncated.
+
+Records carry the index their events start at, so replaying a log on top of
+a snapshot that already contains it (a crash between writing the snapshot
+and removing the log) converges to the same state instead of duplicating.
+"""
+import json
+import logging
+import os
+import time
+from collections.abc import Mapping
+from concurrent.futures import Future
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .atomic import GroupCommitter, append_bytes
+from .base import TrackedState, file_fingerprint, is_day_key
+from .json_backend import JsonBackend
+from .model import to_plain
+from .serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPACT_BYTES = 512 * 1024
+DEFAULT_COMPACT_SECONDS = 6 * 3600
+
+
+class EventLogBackend(JsonBackend):
+    """JsonBackend whose saves append deltas to a JSON-lines log."""
+
+    def __init__(
+        self,
+        path,
+        compact_bytes: int = DEFAULT_COMPACT_BYTES,
+        compact_seconds: float = DEFAULT_COMPACT_SECONDS,
+        keep_backups: int = 0,
+        committer: Optional[GroupCommitter] = None,
+        serializer: Optional[Serializer] = None,
+    ) -> None:
+        super().__init__(path, keep_backups=keep_backups, committer=committer, serializer=serializer)
+        self.log_path = Path(f"{self.path}.log")
+        self.compact_bytes = compact_bytes
+        self.compact_seconds = compact_seconds
+        self.compactions = 0
+        self._sync_sizes()
+
+    # ------------------------------------------------------------------ load
+
+    def load(self) -> TrackedState:
+        state = dict(super().load())
+        replayed = replay_log(state, self.log_path)
+        if replayed:
+            logger.debug(f"📜 Replayed {replayed} log records from {self.log_path}")
+        self._sync_sizes()
+        return TrackedState(state)
+
+    def _sync_sizes(self) -> None:
+        # Compaction is decided from these in-memory figures, so prepare_save
+        # never has to touch the disk
+        try:
+            self._log_bytes = self.log_path.stat().st_size
+        except FileNotFoundError:
+            self._log_bytes = 0
+        try:
+            self._snapshot_time = self.path.stat().st_mtime
+        except FileNotFoundError:
+            self._snapshot_time = time.time()
+
+    def _disk_fingerprint(self):
+        return (file_fingerprint(self.path), file_fingerprint(self.log_path))
+
+    # ------------------------------------------------------------------ save
+
+    def prepare_save(self, state: Dict[str, Any]) -> Callable[[], Optional[Future]]:
+        if not isinstance(state, TrackedState):
+            return partial(self._compact, self._encode(state))
+
+        record = _delta_record(state)
+        if not record:
+            return _nothing
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=to_plain) + "\n").encode("utf-8")
+        if self._should_compact(len(line)):
+            # The new snapshot already contains this update
+            data = self._encode(state)
+            state.mark_clean()
+            return partial(self._compact, data)
+        state.mark_clean()
+        self._log_bytes += len(line)
+        return partial(self._append, line)
+
+    def _should_compact(self, extra: int) -> bool:
+        log_size = self._log_bytes + extra
+        if log_size >= self.compact_bytes:
+            return True
+        return log_size > 0 and time.time() - self._snapshot_time >= self.compact_seconds
+
+    def _append(self, data: bytes) -> Optional[Future]:
+        if self.committer is None:
+            append_bytes(self.log_path, data)
+            self._remember_written()
+            return None
+        return self._submit(self.log_path, data, append=True)
+
+    def compact(self, state: Dict[str, Any]) -> None:
+        """Write state as the new snapshot and drop the log."""
+        data = self._encode(state)
+        if isinstance(state, TrackedState):
+            state.mark_clean()
+        self._compact(data)
+
+    def _compact(self, data: bytes) -> None:
+        # Pending appends must land before the log they belong to is removed
+        self.flush()
+        self._write_snapshot(data, sync=True)
+        try:
+            os.remove(self.log_path)
+        except FileNotFoundError:
+            pass
+        self._remember_written()
+        self._log_bytes = 0
+        self._snapshot_time = time.time()
+        self.compactions += 1
+
+
+def _nothing() -> None:
+    pass
+
+
+def _delta_record(state: TrackedState) -> Dict[str, Any]:
+    days: Dict[str, Any] = {}
+    for key in state.dirty_days:
+        data = state.get(key)
+        if not isinstance(data, Mapping):
+            days[key] = None
+            continue
+        events: List[Dict[str, Any]] = data.get("events") or []
+        persisted = state.persisted_events.get(key, 0)
+        entry: Dict[str, Any] = {"fields": {k: (None if k == "events" else v) for k, v in data.items()}}
+        if len(events) < persisted:
+            # History was rewritten rather than appended to - log all of it
+            persisted = 0
+        entry["from"] = persisted
+        if len(events) > persisted:
+            entry["events"] = events[persisted:]
+        days[key] = entry
+
+    record: Dict[str, Any] = {}
+    if days:
+        record["days"] = days
+    if state.meta_dirty:
+        record["meta"] = dict(state.meta_items())
+    return record
+
+
+def replay_log(state: Dict[str, Any], log_path: Path) -> int:
+    """Apply every complete record of the log to state. Returns records applied."""
+    if not log_path.exists():
+        return 0
+    applied = 0
+    with log_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from a crash mid-append - everything before it is valid
+                logger.warning(f"⚠️ Skipping unreadable record in {log_path}")
+                continue
+            _apply_record(state, record)
+            applied += 1
+    return applied
+
+
+def _apply_record(state: Dict[str, Any], record: Dict[str, Any]) -> None:
+    if "meta" in record:
+        for key in [k for k in state if not is_day_key(k)]:
+            del state[key]
+        state.update(record["meta"])
+
+    for day, entry in record.get("days", {}).items():
+        if entry is None:
+            state.pop(day, None)
+            continue
+        old = state.get(day) or {}
+        events = old.get("events")
+        if not isinstance(events, list):
+            events = []
+        del events[entry.get("from", len(events)):]
+        events.extend(entry.get("events", []))
+        new = dict(entry["fields"])
+        if "events" in new or events:
+            new["events"] = events
+        state[day] = new
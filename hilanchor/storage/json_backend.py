@@ -0,0 +1,133 @@
+"""
+Single-file JSON backend - the original state.json layout.
+"""
+import datetime as dt
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from .atomic import GroupCommitter, atomic_write_bytes, backup_path
+from .base import StateBackend, TrackedState, file_fingerprint
+from .serializers import Serializer, decode, get_serializer
+
+logger = logging.getLogger(__name__)
+
+# Returned by fingerprint() while the files on disk are exactly what we wrote
+_OWN_WRITE = "own-write"
+
+
+class JsonBackend(StateBackend):
+    """
+    Whole state in one file, rewritten atomically on every save. The bytes
+    are written by `serializer` (compact JSON by default); any supported
+    format is read back.
+
+    keep_backups previous versions are kept as .bak.N files and used to
+    recover when the file cannot be parsed. With a committer, writes are
+    handed to a GroupCommitter, which batches concurrent ones into one
+    fsync; the write returns a Future that completes once its data is on
+    disk.
+    """
+
+    def __init__(
+        self,
+        path,
+        keep_backups: int = 0,
+        committer: Optional[GroupCommitter] = None,
+        serializer: Optional[Serializer] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.location = str(self.path)
+        self.keep_backups = keep_backups
+        self.committer = committer
+        self.serializer = serializer or get_serializer()
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        self._written_fp: Any = None
+
+    # ------------------------------------------------------------------ load
+
+    def load(self) -> TrackedState:
+        if not self.path.exists():
+            return TrackedState()
+        try:
+            return TrackedState(decode(self.path.read_bytes()))
+        except Exception as e:
+            logger.error(f"❌ Could not parse {self.path}: {e}")
+        return TrackedState(self._recover())
+
+    def _recover(self) -> Dict[str, Any]:
+        """Return the newest backup that parses, and move the broken file aside."""
+        recovered: Dict[str, Any] = {}
+        for n in range(1, self.keep_backups + 1):
+            candidate = backup_path(self.path, n)
+            if not candidate.exists():
+                continue
+            try:
+                recovered = decode(candidate.read_bytes())
+            except Exception:
+                continue
+            logger.warning(f"♻️ Recovered state from {candidate}")
+            break
+        else:
+            logger.error(f"❌ No usable backup for {self.path} - starting empty")
+
+        # Never let the next save silently overwrite the broken file
+        stamp = dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+        corrupt = self.path.with_name(f"{self.path.name}.corrupt-{stamp}")
+        os.replace(self.path, corrupt)
+        logger.warning(f"📦 Kept unreadable state as {corrupt}")
+        return recovered
+
+    # ------------------------------------------------------------------ save
+
+    def prepare_save(self, state: Dict[str, Any]) -> Callable[[], Optional[Future]]:
+        data = self._encode(state)
+        if isinstance(state, TrackedState):
+            state.mark_clean()
+        return partial(self._write_snapshot, data)
+
+    def _encode(self, state: Dict[str, Any]) -> bytes:
+        return self.serializer.dumps(state)
+
+    def _write_snapshot(self, data: bytes, sync: bool = False) -> Optional[Future]:
+        if self.committer is None or sync:
+            atomic_write_bytes(self.path, data, keep_backups=self.keep_backups)
+            self._remember_written()
+            return None
+        return self._submit(self.path, data, keep_backups=self.keep_backups)
+
+    def _submit(self, path: Path, data: bytes, **options: Any) -> Future:
+        """Hand a write to the committer; the returned future completes once it is on disk."""
+        with self._lock:
+            self._pending_writes += 1
+        durable = self.committer.submit(path, data, on_done=self._remember_written, **options)
+        durable.add_done_callback(self._write_settled)
+        return durable
+
+    def _write_settled(self, _durable: Future) -> None:
+        with self._lock:
+            self._pending_writes -= 1
+
+    def flush(self) -> None:
+        if self.committer is not None:
+            self.committer.flush()
+
+    # ----------------------------------------------------------- fingerprint
+
+    def _disk_fingerprint(self):
+        return file_fingerprint(self.path)
+
+    def _remember_written(self) -> None:
+        self._written_fp = self._disk_fingerprint()
+
+    def fingerprint(self):
+        # Our own writes (pending or done) must not look like external edits
+        if self._pending_writes:
+            return _OWN_WRITE
+        current = self._disk_fingerprint()
+        return _OWN_WRITE if current == self._written_fp else current
@@ -0,0 +1,85 @@
+"""
+Cross-process lock around state commits.
+
+Several bot processes (or a bot and a maintenance script) may share one
+STATE_PATH. A commit takes this lock, checks that storage is still at the
+version its state was loaded from, and only then writes - see
+state_store.atransaction().
+"""
+import os
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+
+class ProcessLock:
+    """
+    Exclusive advisory file lock, re-entrant within one thread.
+
+    hold_until() keeps the file lock - not the thread lock - past release()
+    until a pending write is on disk: other threads of this process may
+    commit meanwhile, other processes wait.
+    """
+
+    def __init__(self, path) -> None:
+        self.path = Path(path)
+        self._thread_lock = threading.RLock()
+        # Guards _depth/_fd; never held while waiting for a write
+        self._state = threading.Lock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self) -> None:
+        self._thread_lock.acquire()
+        with self._state:
+            if self._depth == 0:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX)
+                elif msvcrt is not None:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+            self._depth += 1
+
+    def release(self) -> None:
+        try:
+            self._drop()
+        finally:
+            self._thread_lock.release()
+
+    def hold_until(self, future: Future) -> None:
+        """Keep the file locked until `future` is done. Call while holding the lock."""
+        with self._state:
+            self._depth += 1
+        future.add_done_callback(lambda _: self._drop())
+
+    def _drop(self) -> None:
+        with self._state:
+            self._depth -= 1
+            if self._depth:
+                return
+            try:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                elif msvcrt is not None:
+                    os.lseek(self._fd, 0, os.SEEK_SET)
+                    msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self) -> "ProcessLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
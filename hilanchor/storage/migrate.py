@@ -0,0 +1,49 @@
+"""
+One-shot importer: copy an existing state.json into another backend.
+
+    python -m hilanchor.storage.migrate state.json state.db
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from . import decode, is_day_key, open_backend
+
+logger = logging.getLogger(__name__)
+
+
+def import_json_state(json_path, target_path) -> int:
+    """
+    Load a state.json file and write it into the backend for target_path.
+    Returns the number of days imported.
+    """
+    state = decode(Path(json_path).read_bytes())
+    backend = open_backend(target_path)
+    try:
+        backend.save(state)
+    finally:
+        backend.close()
+    days = sum(1 for k in state if is_day_key(k))
+    logger.info(f"📦 Imported {days} days from {json_path} into {target_path}")
+    return days
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import state.json into another state backend")
+    parser.add_argument("source", help="existing state.json")
+    parser.add_argument("target", help="new STATE_PATH, e.g. state.db")
+    args = parser.parse_args(argv)
+
+    if Path(args.target).exists():
+        print(f"❌ {args.target} already exists - refusing to overwrite")
+        return 1
+
+    days = import_json_state(args.source, args.target)
+    print(f"✅ Imported {days} days into {args.target}")
+    print(f"💡 Set STATE_PATH={args.target} in .env to use it")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
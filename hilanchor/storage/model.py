@@ -0,0 +1,332 @@
+"""
+Typed, slotted model of one day of state.
+
+A day used to be a plain dict with an "events" list of dicts holding ISO
+timestamp strings. DayState and Event keep the same data in __slots__
+objects instead: known fields as attributes, event types as an enum and
+timestamps as epoch seconds plus UTC offset. Both still behave as mappings
+(day["mode"], day.get("events", []), ev["ts"]), so the storage backends and
+older code keep working, and to_dict()/from_dict() convert losslessly to
+and from the JSON layout. Anything the model does not know (extra keys,
+unknown event types, odd timestamps) is kept as-is.
+"""
+import datetime as dt
+from collections.abc import Mapping, MutableMapping
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from . import schema
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "<missing>"
+
+
+# An unset field - different from a field set to None
+MISSING: Any = _Missing()
+
+
+class EventType(str, Enum):
+    CHECKIN_ANSWER = "checkin_answer"
+    DID = "did"
+    PLAN = "plan"
+    FIRST_ACTION = "first_action"
+    FEAR_REFRAME = "fear_reframe"
+    BULLETS = "bullets"
+    CONTEXT = "context"
+    BIG_ACTION = "big_action"
+    NUDGE_SCHEDULED = "nudge_scheduled"
+    CLOSED = "closed"
+    CONTINUE = "continue"
+    IN_FLOW = "in_flow"
+    MODE_SET = "mode_set"
+    TIMING_CHOICE = "timing_choice"
+    FREE_NOTE = "free_note"
+
+
+_EVENT_TYPES = {t.value: t for t in EventType}
+_ZONES: Dict[int, dt.timezone] = {}
+
+
+def _zone(offset_minutes: int) -> dt.timezone:
+    zone = _ZONES.get(offset_minutes)
+    if zone is None:
+        zone = _ZONES[offset_minutes] = dt.timezone(dt.timedelta(minutes=offset_minutes))
+    return zone
+
+
+def _format_ts(epoch: int, offset: int) -> str:
+    return dt.datetime.fromtimestamp(epoch, _zone(offset)).isoformat()
+
+
+def _parse_ts(value: Any) -> Optional[Tuple[int, int]]:
+    """(epoch, offset minutes) if value round-trips exactly, else None."""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = dt.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None or parsed.microsecond:
+        return None
+    epoch = int(parsed.timestamp())
+    offset = parsed.utcoffset() // dt.timedelta(minutes=1)
+    return (epoch, offset) if _format_ts(epoch, offset) == value else None
+
+
+class Event(MutableMapping):
+    """One event of a day. ev.type is an EventType (or the raw string)."""
+
+    __slots__ = ("type", "epoch", "offset", "raw_ts", "value", "text", "extra")
+
+    def __init__(
+        self,
+        type: Union[EventType, str],
+        ts: Any = MISSING,
+        value: Any = MISSING,
+        text: Any = MISSING,
+    ) -> None:
+        self.type = _EVENT_TYPES.get(type, type) if isinstance(type, str) else type
+        self.epoch = self.offset = 0
+        self.raw_ts: Any = MISSING
+        self.ts = ts
+        self.value = value
+        self.text = text
+        self.extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def now(cls, type: Union[EventType, str], tz: dt.tzinfo, value: Any = None, text: Optional[str] = None) -> "Event":
+        moment = dt.datetime.now(tz).replace(microsecond=0)
+        ev = cls(type)
+        ev.epoch = int(moment.timestamp())
+        ev.offset = moment.utcoffset() // dt.timedelta(minutes=1)
+        ev.raw_ts = None
+        if value is not None:
+            ev.value = value
+        if text is not None:
+            ev.text = text
+        return ev
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "Event":
+        if isinstance(data, Event):
+            return data
+        ev = cls(data.get("type", MISSING), data.get("ts", MISSING), data.get("value", MISSING),
+                 data.get("text", MISSING))
+        extra = {k: v for k, v in data.items() if k not in _EVENT_KEYS}
+        if extra:
+            ev.extra = extra
+        return ev
+
+    # -- typed access
+
+    @property
+    def ts(self) -> Any:
+        """The timestamp exactly as stored in JSON."""
+        if self.raw_ts is None:
+            return _format_ts(self.epoch, self.offset)
+        return self.raw_ts
+
+    @ts.setter
+    def ts(self, value: Any) -> None:
+        parsed = _parse_ts(value)
+        if parsed is None:
+            self.raw_ts = value
+        else:
+            (self.epoch, self.offset), self.raw_ts = parsed, None
+
+    @property
+    def time(self) -> Optional[dt.datetime]:
+        """The timestamp as an aware datetime, when it has one."""
+        if self.raw_ts is None:
+            return dt.datetime.fromtimestamp(self.epoch, _zone(self.offset))
+        try:
+            return dt.datetime.fromisoformat(self.raw_ts)
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def type_name(self) -> Any:
+        return self.type.value if isinstance(self.type, EventType) else self.type
+
+    # -- mapping view, same keys as the JSON layout
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "ts":
+            value = self.ts
+        elif key == "type":
+            value = self.type_name
+        elif key in ("value", "text"):
+            value = getattr(self, key)
+        else:
+            value = self.extra.get(key, MISSING) if self.extra else MISSING
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "type":
+            self.type = _EVENT_TYPES.get(value, value)
+        elif key in ("ts", "value", "text"):
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        self[key]  # KeyError if absent
+        if key == "ts":
+            self.raw_ts = MISSING
+        elif key in ("type", "value", "text"):
+            setattr(self, key, MISSING)
+        else:
+            del self.extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        if self.raw_ts is not MISSING:
+            yield "ts"
+        for key in ("type", "value", "text"):
+            if getattr(self, key) is not MISSING:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self}
+
+    def __repr__(self) -> str:
+        return f"Event({self.to_dict()!r})"
+
+
+_EVENT_KEYS = frozenset(("ts", "type", "value", "text"))
+
+
+class EventList(list):
+    """List of Event that converts event dicts as they are added."""
+
+    __slots__ = ()
+
+    def __init__(self, events: Iterable = ()) -> None:
+        super().__init__(Event.from_dict(ev) if isinstance(ev, Mapping) else ev for ev in events)
+
+    def append(self, ev: Any) -> None:
+        super().append(Event.from_dict(ev) if isinstance(ev, Mapping) else ev)
+
+    def extend(self, events: Iterable) -> None:
+        super().extend(Event.from_dict(ev) if isinstance(ev, Mapping) else ev for ev in events)
+
+    def insert(self, index: int, ev: Any) -> None:
+        super().insert(index, Event.from_dict(ev) if isinstance(ev, Mapping) else ev)
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            value = [Event.from_dict(ev) if isinstance(ev, Mapping) else ev for ev in value]
+        elif isinstance(value, Mapping):
+            value = Event.from_dict(value)
+        super().__setitem__(index, value)
+
+    def __iadd__(self, events: Iterable) -> "EventList":
+        self.extend(events)
+        return self
+
+
+_DAY_FIELDS = (
+    "mode", "waiting_for", "done", "need_followup", "fail_count",
+    "worked", "worked_ts", "plan", "plan_ts", "events", "schema",
+)
+_DAY_FIELD_SET = frozenset(_DAY_FIELDS)
+
+
+class DayState(MutableMapping):
+    """One day of state: known fields as slots, anything else in .extra."""
+
+    __slots__ = _DAY_FIELDS + ("extra",)
+
+    def __init__(self, data: Optional[Mapping] = None) -> None:
+        for name in _DAY_FIELDS:
+            object.__setattr__(self, name, MISSING)
+        self.extra: Optional[Dict[str, Any]] = None
+        if data:
+            for key, value in data.items():
+                self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "DayState":
+        return data if isinstance(data, DayState) else cls(data)
+
+    def event_list(self) -> EventList:
+        """The day's events ([] when there are none)."""
+        return self.events if isinstance(self.events, list) else EventList()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _DAY_FIELD_SET:
+            value = getattr(self, key)
+        else:
+            value = self.extra.get(key, MISSING) if self.extra else MISSING
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "events" and isinstance(value, list) and not isinstance(value, EventList):
+            value = EventList(value)
+        if key in _DAY_FIELD_SET:
+            setattr(self, key, value)
+            return
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        # Return what was stored - an "events" list is converted on the way in
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def __delitem__(self, key: str) -> None:
+        self[key]  # KeyError if absent
+        if key in _DAY_FIELD_SET:
+            setattr(self, key, MISSING)
+        else:
+            del self.extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        for name in _DAY_FIELDS:
+            if getattr(self, name) is not MISSING:
+                yield name
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        for key in self:
+            value = self[key]
+            if isinstance(value, EventList):
+                value = [ev.to_dict() if isinstance(ev, Event) else ev for ev in value]
+            data[key] = value
+        return data
+
+    def __repr__(self) -> str:
+        return f"DayState({self.to_dict()!r})"
+
+
+def as_day(value: Any) -> Any:
+    """A plain day dict, upgraded to the current schema, as DayState; anything else unchanged."""
+    return DayState(schema.upgrade_day(value)) if type(value) is dict else value
+
+
+def to_plain(obj: Any) -> Any:
+    """default= hook for encoders: model objects as their JSON dicts."""
+    if isinstance(obj, (DayState, Event)):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,179 @@
+"""
+Day-partitioned JSON backend.
+
+    state/
+        meta.json          notified users, context, other non-day keys
+        2026-10-18.json    one file per day
+
+load() reads meta.json only; a day file is opened the first time that day is
+looked up, so the usual "today" update costs O(today) whatever the length of
+the history. Saves rewrite only the touched day files.
+"""
+import datetime as dt
+import logging
+import os
+import threading
+from collections.abc import Mapping
+from concurrent.futures import Future
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .atomic import GroupCommitter, atomic_write_bytes, gather
+from .base import LazyState, StateBackend, TrackedState, file_fingerprint, is_day_key
+from .serializers import Serializer, decode, get_serializer
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+
+# Returned by fingerprint() while the files on disk are exactly what we wrote
+_OWN_WRITE = "own-write"
+
+
+class PartitionedBackend(StateBackend):
+    """
+    State split into one file per day plus meta.json. Files keep the .json
+    name whatever the serializer, so switching formats needs no renames.
+    """
+
+    def __init__(
+        self,
+        directory,
+        keep_backups: int = 0,
+        committer: Optional[GroupCommitter] = None,
+        serializer: Optional[Serializer] = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.location = str(self.directory)
+        self.keep_backups = keep_backups
+        self.committer = committer
+        self.serializer = serializer or get_serializer()
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        self._written_fp: Any = None
+        # Day files this process has read or written - the ones a cached
+        # state depends on
+        self._watched: Set[str] = set()
+
+    def day_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    @property
+    def meta_path(self) -> Path:
+        return self.directory / META_FILE
+
+    # ------------------------------------------------------------------ load
+
+    def load(self) -> LazyState:
+        meta = self._read(self.meta_path) or {}
+        return LazyState(meta, load_day=self.load_day, list_days=self.list_days)
+
+    def load_day(self, key: str) -> Optional[Dict[str, Any]]:
+        self._watched.add(key)
+        return self._read(self.day_path(key))
+
+    def list_days(self) -> List[str]:
+        if not self.directory.exists():
+            return []
+        return sorted(p.stem for p in self.directory.glob("*.json") if is_day_key(p.stem))
+
+    def _read(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return decode(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"❌ Could not parse {path}: {e}")
+            for n in range(1, self.keep_backups + 1):
+                candidate = path.with_name(f"{path.name}.bak.{n}")
+                try:
+                    data = decode(candidate.read_bytes())
+                except Exception:
+                    continue
+                logger.warning(f"♻️ Recovered {path.name} from {candidate.name}")
+                return data
+            stamp = dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+            corrupt = path.with_name(f"{path.name}.corrupt-{stamp}")
+            os.replace(path, corrupt)
+            logger.error(f"❌ No usable backup for {path.name} - kept it as {corrupt.name}")
+            return None
+
+    # ------------------------------------------------------------------ save
+
+    def prepare_save(self, state: Dict[str, Any]) -> Callable[[], Optional[Future]]:
+        # (path, payload) pairs; a None payload removes the file
+        writes: List[Tuple[Path, Optional[bytes]]] = []
+        if isinstance(state, TrackedState):
+            for key in state.dirty_days:
+                writes.append(self._day_write(key, dict.get(state, key)))
+            if state.meta_dirty:
+                writes.append(self._meta_write(state))
+            state.mark_clean()
+        else:
+            # Plain dict: replace everything
+            keep = {k for k in state if is_day_key(k)}
+            writes.extend(self._day_write(key, None) for key in self.list_days() if key not in keep)
+            writes.extend(self._day_write(key, state[key]) for key in keep)
+            writes.append(self._meta_write(state))
+        return partial(self._apply, writes)
+
+    def _day_write(self, key: str, day: Any) -> Tuple[Path, Optional[bytes]]:
+        self._watched.add(key)
+        return self.day_path(key), (self.serializer.dumps(day) if isinstance(day, Mapping) else None)
+
+    def _meta_write(self, state: Dict[str, Any]) -> Tuple[Path, Optional[bytes]]:
+        return self.meta_path, self.serializer.dumps({k: v for k, v in dict.items(state) if not is_day_key(k)})
+
+    def _apply(self, writes: List[Tuple[Path, Optional[bytes]]]) -> Optional[Future]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        submitted = []
+        for path, payload in writes:
+            if payload is None:
+                self._remove(path)
+            elif self.committer is None:
+                atomic_write_bytes(path, payload, keep_backups=self.keep_backups)
+            else:
+                with self._lock:
+                    self._pending_writes += 1
+                durable = self.committer.submit(
+                    path, payload, keep_backups=self.keep_backups, on_done=self._remember_written
+                )
+                durable.add_done_callback(self._write_settled)
+                submitted.append(durable)
+        if self.committer is None:
+            self._remember_written()
+            return None
+        # All files of this save go out in one batch; done once they are all on disk
+        return gather(submitted)
+
+    def _write_settled(self, _durable: Future) -> None:
+        with self._lock:
+            self._pending_writes -= 1
+
+    def _remove(self, path: Path) -> None:
+        if self.committer is not None:
+            self.committer.flush()
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def flush(self) -> None:
+        if self.committer is not None:
+            self.committer.flush()
+
+    # ----------------------------------------------------------- fingerprint
+
+    def _disk_fingerprint(self):
+        watched = tuple(file_fingerprint(self.day_path(k)) for k in sorted(self._watched))
+        return (file_fingerprint(self.directory), file_fingerprint(self.meta_path), watched)
+
+    def _remember_written(self) -> None:
+        self._written_fp = self._disk_fingerprint()
+
+    def fingerprint(self):
+        if self._pending_writes:
+            return _OWN_WRITE
+        current = self._disk_fingerprint()
+        return _OWN_WRITE if current == self._written_fp else current
@@ -0,0 +1,70 @@
+"""
+Schema version of a day, and the migrations between versions.
+
+Every day carries its own version under "schema" (missing = 1, the layout
+from before versioning). When a day is read - loaded from a backend,
+faulted in by a lazy backend or fetched from the archive - it is upgraded
+in memory by running the registered migrations one version at a time. It
+is written back in the new layout only when something touches that day
+again, so a format change never needs a rewrite of the whole history and
+costs nothing for days nobody reads.
+
+To change the day layout, bump CURRENT_SCHEMA and register a step from the
+previous version:
+
+    @migration(1)
+    def _split_plan(day):
+        ...  # day is a plain dict (events are dicts too)
+        return day
+"""
+import logging
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_KEY = "schema"
+BASE_SCHEMA = 1
+CURRENT_SCHEMA = 1
+
+Migration = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+# from_version -> function turning a day of that version into from_version + 1
+MIGRATIONS: Dict[int, Migration] = {}
+
+
+def migration(from_version: int) -> Callable[[Migration], Migration]:
+    """Register fn as the upgrade step from from_version to the next one."""
+    def register(fn: Migration) -> Migration:
+        if from_version in MIGRATIONS:
+            raise ValueError(f"Day schema {from_version} already has a migration")
+        MIGRATIONS[from_version] = fn
+        return fn
+    return register
+
+
+def day_version(day: Dict[str, Any]) -> int:
+    return int(day.get(SCHEMA_KEY, BASE_SCHEMA))
+
+
+def new_day() -> Dict[str, Any]:
+    """An empty day in the current layout."""
+    # The base version is implied by a missing key, keeping old files as they were
+    return {SCHEMA_KEY: CURRENT_SCHEMA} if CURRENT_SCHEMA != BASE_SCHEMA else {}
+
+
+def upgrade_day(day: Dict[str, Any]) -> Dict[str, Any]:
+    """Bring a plain day dict up to CURRENT_SCHEMA (returns it unchanged if it already is)."""
+    version = day_version(day)
+    if version >= CURRENT_SCHEMA:
+        # Newer than this code knows about (e.g. after a downgrade) - keep it untouched
+        return day
+    start = version
+    while version < CURRENT_SCHEMA:
+        step = MIGRATIONS.get(version)
+        if step is None:
+            raise ValueError(f"No migration registered from day schema {version}")
+        day = step(day)
+        version += 1
+    day[SCHEMA_KEY] = version
+    logger.debug(f"🔧 Upgraded a day from schema {start} to {version}")
+    return day
@@ -0,0 +1,102 @@
+"""
+Non-owner user IDs the bot has already answered, kept apart from the state.
+
+    state.json.seen     one user ID per line, append-only
+
+Membership is an in-memory set (optionally fronted by a Bloom filter, so
+a definite "never seen" skips the set); recording a new ID appends one
+line. Nothing here touches the day state, so strangers poking the bot no
+longer rewrite the history.
+"""
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Iterable, Optional, Set
+
+from .atomic import append_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings: no false negatives."""
+
+    def __init__(self, bits: int, hashes: int = 4) -> None:
+        self.bits = max(8, bits)
+        self.hashes = hashes
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class SeenUserSet:
+    """
+    Append-only set of user IDs. load() reads the file once (call it off
+    the event loop); afterwards `in` is a pure memory lookup and add() only
+    does I/O for IDs that are actually new.
+    """
+
+    def __init__(self, path, bloom_bits: int = 0) -> None:
+        self.path = Path(path)
+        self._ids: Set[str] = set()
+        self._bloom: Optional[BloomFilter] = BloomFilter(bloom_bits) if bloom_bits > 0 else None
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, legacy_ids: Iterable = ()) -> None:
+        """Read the file; IDs from the old state list are imported once."""
+        with self._lock:
+            if self.loaded:
+                return
+            try:
+                lines = self.path.read_text(encoding="utf-8").split()
+            except FileNotFoundError:
+                lines = []
+            for user_id in lines:
+                self._remember(user_id)
+            missing = sorted({str(x) for x in legacy_ids} - self._ids)
+            if missing:
+                self._append(missing)
+                logger.info(f"📥 Imported {len(missing)} notified users into {self.path}")
+            self.loaded = True
+
+    def _remember(self, user_id: str) -> None:
+        self._ids.add(user_id)
+        if self._bloom is not None:
+            self._bloom.add(user_id)
+
+    def _append(self, user_ids) -> None:
+        for user_id in user_ids:
+            self._remember(user_id)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        append_bytes(self.path, "".join(f"{u}\n" for u in user_ids).encode("utf-8"))
+
+    def __contains__(self, user_id) -> bool:
+        key = str(user_id)
+        if self._bloom is not None and key not in self._bloom:
+            return False
+        return key in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, user_id) -> bool:
+        """Record user_id. Returns False if it was already there."""
+        key = str(user_id)
+        with self._lock:
+            if key in self._ids:
+                return False
+            self._append([key])
+        return True
@@ -0,0 +1,106 @@
+"""
+Byte formats for state files.
+
+    json         compact JSON (default) - no indentation or spaces
+    json-pretty  indented JSON, the original human-friendly layout
+    msgpack      binary MessagePack, needs `pip install msgpack`
+
+Writers use the configured format (STATE_FORMAT); readers detect the format
+from the bytes themselves, so switching formats never strands an old file.
+Binary files start with a magic prefix that can never begin JSON text.
+"""
+import json
+import logging
+from typing import Any, Dict
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+from .model import to_plain
+
+logger = logging.getLogger(__name__)
+
+# 0xC1 is unused by MessagePack and invalid as a first UTF-8 byte
+MSGPACK_MAGIC = b"\xc1HLA1"
+
+
+class Serializer:
+    """Turns the state dict into bytes and back."""
+
+    name = ""
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JsonSerializer(Serializer):
+    def __init__(self, indent: int = 0) -> None:
+        self.indent = indent or None
+        self.name = "json-pretty" if indent else "json"
+        self._separators = None if indent else (",", ":")
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, indent=self.indent, separators=self._separators,
+                          default=to_plain).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data.decode("utf-8"))
+
+
+class MsgpackSerializer(Serializer):
+    name = "msgpack"
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed - pip install msgpack")
+
+    def dumps(self, obj: Any) -> bytes:
+        return MSGPACK_MAGIC + msgpack.packb(obj, use_bin_type=True, default=to_plain)
+
+    def loads(self, data: bytes) -> Any:
+        if not data.startswith(MSGPACK_MAGIC):
+            raise ValueError("not a msgpack state file")
+        return msgpack.unpackb(data[len(MSGPACK_MAGIC):], raw=False, strict_map_key=False)
+
+
+_FACTORIES = {
+    "json": JsonSerializer,
+    "json-pretty": lambda: JsonSerializer(indent=2),
+    "msgpack": MsgpackSerializer,
+}
+
+_instances: Dict[str, Serializer] = {}
+
+
+def get_serializer(name: str = "json") -> Serializer:
+    """
+    The serializer for a STATE_FORMAT value. An unavailable binary format
+    falls back to compact JSON with a warning so the bot still starts.
+    """
+    key = (name or "json").strip().lower()
+    if key not in _FACTORIES:
+        raise ValueError(f"Unknown state format {name!r} (expected one of: {', '.join(_FACTORIES)})")
+    if key not in _instances:
+        try:
+            _instances[key] = _FACTORIES[key]()
+        except RuntimeError as e:
+            logger.warning(f"⚠️ {e}; writing state as compact JSON instead")
+            return get_serializer("json")
+    return _instances[key]
+
+
+def decode(data: bytes) -> Any:
+    """Parse state bytes written in any supported format."""
+    if data.startswith(MSGPACK_MAGIC):
+        return MsgpackSerializer().loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def detect_format(data: bytes) -> str:
+    """Name of the format the bytes were written in."""
+    return "msgpack" if data.startswith(MSGPACK_MAGIC) else "json"
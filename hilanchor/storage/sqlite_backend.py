@@ -0,0 +1,198 @@
+"""
+SQLite backend - days as rows, events in their own indexed table.
+
+Loading reads the meta tables only and fetches a day when it is first looked
+up. Saves of a TrackedState only touch the days that changed and only insert
+the events appended since the last save, so an update costs O(today)
+instead of O(history).
+"""
+import json
+import sqlite3
+import threading
+from collections.abc import Mapping
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .base import NOTIFIED_KEY, LazyState, StateBackend, TrackedState, is_day_key
+from .model import to_plain
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS days (
+    day  TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    day   TEXT    NOT NULL,
+    seq   INTEGER NOT NULL,
+    ts    TEXT,
+    type  TEXT    NOT NULL,
+    value TEXT,
+    text  TEXT,
+    PRIMARY KEY (day, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_events_day_ts ON events (day, ts);
+CREATE TABLE IF NOT EXISTS notified_users (
+    user_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+# Marks where the "events" key sits in a day so load() restores the same shape
+_EVENTS_MARKER = None
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=to_plain)
+
+
+class SqliteBackend(StateBackend):
+    """State in a SQLite database (WAL mode)."""
+
+    def __init__(self, path) -> None:
+        self.path = Path(path)
+        self.location = str(self.path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    # ------------------------------------------------------------------ load
+
+    def load(self) -> LazyState:
+        """Meta keys now, each day on first access (see LazyState)."""
+        with self._lock:
+            state: Dict[str, Any] = {}
+            for key, value in self._conn.execute("SELECT key, value FROM meta ORDER BY rowid"):
+                state[key] = json.loads(value)
+            notified = [row[0] for row in self._conn.execute("SELECT user_id FROM notified_users ORDER BY user_id")]
+        if notified:
+            state[NOTIFIED_KEY] = notified
+        return LazyState(state, load_day=self.load_day, list_days=self.list_days)
+
+    def load_day(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM days WHERE day = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            day: Dict[str, Any] = json.loads(row[0])
+            events = self._conn.execute(
+                "SELECT ts, type, value, text FROM events WHERE day = ? ORDER BY seq", (key,)
+            ).fetchall()
+
+        if day.get("events") is None and (events or "events" in day):
+            day["events"] = []
+        for ts, ev_type, value, text in events:
+            ev: Dict[str, Any] = {"ts": ts, "type": ev_type} if ts is not None else {"type": ev_type}
+            if value is not None:
+                ev["value"] = json.loads(value)
+            if text is not None:
+                ev["text"] = text
+            day["events"].append(ev)
+        return day
+
+    def list_days(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT day FROM days ORDER BY day")]
+
+    def fingerprint(self):
+        # data_version only moves when another connection commits, which is
+        # exactly when our in-memory copy goes stale
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # ------------------------------------------------------------------ save
+
+    def prepare_save(self, state: Dict[str, Any]) -> Callable[[], None]:
+        if isinstance(state, TrackedState):
+            days = [
+                _day_rows(day, dict.get(state, day), state.persisted_events.get(day, 0))
+                for day in state.dirty_days
+            ]
+            meta = _meta_rows(state) if state.meta_dirty else None
+            state.mark_clean()
+            return partial(self._apply, days, meta, False)
+
+        days = [_day_rows(key, value, 0) for key, value in state.items() if is_day_key(key)]
+        return partial(self._apply, days, _meta_rows(state), True)
+
+    def _apply(self, days: List["_DayRows"], meta: Optional["_MetaRows"], replace_all: bool) -> None:
+        with self._lock, self._conn as conn:
+            if replace_all:
+                conn.execute("DELETE FROM days")
+                conn.execute("DELETE FROM events")
+            for day, data, events, rewrite in days:
+                if data is None:
+                    conn.execute("DELETE FROM days WHERE day = ?", (day,))
+                    conn.execute("DELETE FROM events WHERE day = ?", (day,))
+                    continue
+                conn.execute(
+                    "INSERT INTO days (day, data) VALUES (?, ?) "
+                    "ON CONFLICT(day) DO UPDATE SET data = excluded.data",
+                    (day, data),
+                )
+                if rewrite:
+                    conn.execute("DELETE FROM events WHERE day = ?", (day,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO events (day, seq, ts, type, value, text) VALUES (?, ?, ?, ?, ?, ?)",
+                    events,
+                )
+            if meta is not None:
+                meta_rows, notified = meta
+                conn.execute("DELETE FROM meta")
+                conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", meta_rows)
+                conn.execute("DELETE FROM notified_users")
+                conn.executemany("INSERT OR IGNORE INTO notified_users (user_id) VALUES (?)", notified)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# (day, data JSON or None to delete, event rows, rewrite all events?)
+_DayRows = Tuple[str, Optional[str], List[Tuple], bool]
+# (meta rows, notified user rows)
+_MetaRows = Tuple[List[Tuple[str, str]], List[Tuple[str]]]
+
+
+def _day_rows(day: str, data: Any, persisted: int) -> _DayRows:
+    if not isinstance(data, Mapping):
+        return day, None, [], True
+
+    fields = {k: (_EVENTS_MARKER if k == "events" else v) for k, v in data.items()}
+    events = data.get("events") or []
+    rewrite = len(events) < persisted
+    if rewrite:
+        # History was rewritten rather than appended to - store it again
+        persisted = 0
+    rows = [
+        (
+            day,
+            seq,
+            ev.get("ts"),
+            ev.get("type"),
+            _dumps(ev["value"]) if "value" in ev else None,
+            ev.get("text"),
+        )
+        for seq, ev in enumerate(events[persisted:], start=persisted)
+    ]
+    return day, _dumps(fields), rows, rewrite
+
+
+def _meta_rows(state: Dict[str, Any]) -> _MetaRows:
+    rows: List[Tuple[str, str]] = []
+    notified: List[Tuple[str]] = []
+    for key, value in dict.items(state):
+        if is_day_key(key):
+            continue
+        if key == NOTIFIED_KEY:
+            notified = [(str(x),) for x in value or []]
+        else:
+            rows.append((key, _dumps(value)))
+    return rows, notified
@@ -1,9 +1,9 @@
 """
 Daily summary generation from state
 """
-import datetime as dt
 from typing import Dict, Any, List
-from .state_store import load_state, today_key
+from .state_store import get_day, load_state, today_key
+from .storage import DayState
 from . import messages as msg
 
 
@@ -15,7 +15,7 @@ def generate_daily_summary() -> str:
     if today not in state:
         return msg.SUMMARY_NO_DATA
 
-    day_data = state[today]
+    day_data = DayState.from_dict(state[today])
 
     # Build summary
     lines = [msg.SUMMARY_HEADER, ""]
@@ -40,23 +40,16 @@ def generate_daily_summary() -> str:
             lines.append(msg.SUMMARY_WORKED_NO)
 
     # Events
-    events = day_data.get("events", [])
+    events = day_data.event_list()
     if events:
         lines.append("")
         lines.append(msg.SUMMARY_EVENTS_HEADER)
         for event in events:
-            event_type = event.get("type")
+            event_type = event.type
             value = event.get("value")
             text = event.get("text")
-            timestamp = event.get("ts", "")
-
-            time_str = ""
-            if timestamp:
-                try:
-                    ts = dt.datetime.fromisoformat(timestamp)
-                    time_str = ts.strftime("%H:%M")
-                except:
-                    pass
+            moment = event.time
+            time_str = moment.strftime("%H:%M") if moment else ""
 
             if event_type == "checkin_answer":
                 if value == "yes":
@@ -131,7 +124,9 @@ def generate_daily_summary() -> str:
 
 
 def get_raw_state_for_day(date_str: str = None) -> Dict[str, Any]:
-    """Get the raw state data for a specific day (for advanced users)."""
-    state = load_state()
-    day_key = date_str or today_key()
-    return state.get(day_key, {})
+    """
+    Get the raw state data for a specific day (for advanced users).
+    Partitioned and SQLite storage only read that one day; archived days
+    are read from the archive.
+    """
+    return get_day(date_str or today_key()).to_dict()
@@ -0,0 +1,81 @@
+"""
+Who may use the bot, and whose update or job is running right now.
+
+The current user lives in a context variable: the flood guard sets it for
+every update, scheduled jobs set it per user with as_user(). state_store
+uses it to pick that user's state shard and timezone, so handlers keep
+calling load_state()/today_key() without passing a user around.
+"""
+import contextvars
+import datetime as dt
+import zoneinfo
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from .config import ALLOWED_USER_IDS, DEFAULT_TIMEZONE, OWNER_USER_ID_INT, USER_TIMEZONES
+
+_current_user: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "hilanchor_user", default=OWNER_USER_ID_INT
+)
+
+_zones: Dict[str, zoneinfo.ZoneInfo] = {}
+
+
+def current_user() -> int:
+    return _current_user.get()
+
+
+def set_current_user(user_id: int) -> contextvars.Token:
+    return _current_user.set(user_id)
+
+
+@contextmanager
+def as_user(user_id: int) -> Iterator[int]:
+    """Run a block (e.g. one iteration of a scheduled job) as user_id."""
+    token = _current_user.set(user_id)
+    try:
+        yield user_id
+    finally:
+        _current_user.reset(token)
+
+
+def is_allowed(user_id: int) -> bool:
+    return user_id in ALLOWED_USER_IDS
+
+
+def allowed_users() -> List[int]:
+    return sorted(ALLOWED_USER_IDS)
+
+
+def timezone_name(user_id: int) -> str:
+    return USER_TIMEZONES.get(user_id, DEFAULT_TIMEZONE)
+
+
+def user_tz(user_id: int = None) -> zoneinfo.ZoneInfo:
+    """The timezone of user_id (default: the current user)."""
+    name = timezone_name(current_user() if user_id is None else user_id)
+    zone = _zones.get(name)
+    if zone is None:
+        zone = _zones[name] = zoneinfo.ZoneInfo(name)
+    return zone
+
+
+def in_hours(hour: int, hours: Tuple[int, int]) -> bool:
+    """Whether `hour` falls in the range (from, to) - which may wrap past midnight."""
+    start, end = hours
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def owner_hour() -> int:
+    """The current hour in the owner's timezone (for bot-wide jobs)."""
+    return dt.datetime.now(user_tz(OWNER_USER_ID_INT)).hour
+
+
+def users_by_timezone() -> Dict[str, List[int]]:
+    """Allowed users grouped by timezone name, for scheduling jobs."""
+    groups: Dict[str, List[int]] = {}
+    for user_id in allowed_users():
+        groups.setdefault(timezone_name(user_id), []).append(user_id)
+    return groups
@@ -0,0 +1,117 @@
+"""
+Pool of pre-generated humanized variants of the static bot messages.
+
+Almost every humanized text is one of the constants in messages.py, asked
+for with a fixed context string. Instead of waiting for the model on each
+click, ahumanize_message() takes a ready variant for that (message,
+context) from here, or sends the original text when none is left. The
+filler (llm.arefill_variants, a scheduled job) tops every key back up to
+VARIANT_POOL_SIZE during VARIANT_POOL_IDLE_HOURS.
+
+Keys are learned from use and kept, with their variants, in
+VARIANT_POOL_PATH, so the pool survives restarts.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .aio import run_io
+from .config import VARIANT_POOL_PATH, VARIANT_POOL_SIZE
+from .storage.atomic import atomic_write_bytes
+from . import messages as msg
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+POOL_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "generated": 0}
+
+# Every text constant of messages.py - only these are pooled
+STATIC_MESSAGES = frozenset(v for k, v in vars(msg).items() if k.isupper() and isinstance(v, str))
+
+
+def is_static(message: str) -> bool:
+    return message in STATIC_MESSAGES
+
+
+class VariantPool:
+    """(message, context) -> ready variants, persisted as JSON."""
+
+    def __init__(self, path, size: int) -> None:
+        self.path = Path(path)
+        self.size = size
+        self.dirty = False
+        self._variants: Dict[Key, List[str]] = {}
+
+    def load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except ValueError:
+            logger.warning(f"⚠️ Unreadable variant pool {self.path} - starting empty")
+            return
+        for entry in data.get("entries", []):
+            # Messages edited or removed since then are dropped
+            if is_static(entry["message"]):
+                self._variants[(entry["message"], entry["context"])] = list(entry["variants"])
+
+    def save(self) -> None:
+        entries = [{"message": m, "context": c, "variants": v} for (m, c), v in self._variants.items()]
+        data = json.dumps({"entries": entries}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(self.path, data)
+        self.dirty = False
+
+    def take(self, message: str, context: Optional[str]) -> Optional[str]:
+        """A ready variant (removed from the pool), or None. Registers the key."""
+        key = (message, context or "")
+        variants = self._variants.get(key)
+        if variants is None:
+            variants = self._variants[key] = []
+            self.dirty = True
+        if not variants:
+            POOL_STATS["misses"] += 1
+            return None
+        POOL_STATS["hits"] += 1
+        self.dirty = True
+        return variants.pop(0)
+
+    def add(self, message: str, context: Optional[str], variant: str) -> None:
+        self._variants.setdefault((message, context or ""), []).append(variant)
+        self.dirty = True
+        POOL_STATS["generated"] += 1
+
+    def missing(self) -> List[Tuple[str, str, int]]:
+        """(message, context, how many variants short) of every key below size, emptiest first."""
+        short = [(m, c, self.size - len(v)) for (m, c), v in self._variants.items() if len(v) < self.size]
+        return sorted(short, key=lambda item: -item[2])
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._variants.values())
+
+
+_pool: Optional[VariantPool] = None
+
+
+def get_pool() -> Optional[VariantPool]:
+    """The shared pool, loaded on first use; None when VARIANT_POOL_SIZE is 0."""
+    global _pool
+    if VARIANT_POOL_SIZE <= 0:
+        return None
+    if _pool is None:
+        _pool = VariantPool(VARIANT_POOL_PATH, VARIANT_POOL_SIZE)
+        _pool.load()
+    return _pool
+
+
+async def aload_pool(app=None) -> None:
+    """Load the shared pool on the I/O thread (Application post_init hook), not on the first click."""
+    await run_io(get_pool)
+
+
+def get_pool_stats() -> Dict[str, int]:
+    """Return a copy of the pool counters plus the number of ready variants."""
+    pool = get_pool()
+    return {**POOL_STATS, "ready": len(pool) if pool else 0}
@@ -1,13 +1,18 @@
 import logging
-from telegram.ext import CommandHandler, CallbackQueryHandler, MessageHandler, filters, ApplicationBuilder
+from telegram import Update
+from telegram.ext import CommandHandler, CallbackQueryHandler, MessageHandler, TypeHandler, filters, ApplicationBuilder
 
 from hilanchor.handlers import (
-    start, checkin, summary, journal, journal_add, journal_info, on_free_text,
+    flood_guard, start, checkin, summary, journal, journal_add, journal_info, on_free_text,
     on_mode_choice, on_worked_choice, on_no_reason, on_big_action, on_yes_next, on_nudge_progress, on_timing_choice,
     CB_MODE_PATTERN, CB_WORKED_PATTERN, CB_NO_REASON_PATTERN, CB_BIG_ACTION_PATTERN, CB_YES_NEXT_PATTERN, CB_NUDGE_PROGRESS_PATTERN, CB_TIMING_PATTERN
 )
 from hilanchor.config import BOT_TOKEN, PROXY_URL
 from hilanchor.scheduler import register_jobs
+from hilanchor.aio import shutdown_io
+from hilanchor.llm import aclose_llm
+from hilanchor.variants import aload_pool
+from hilanchor.replies import cancel_upgrades, drop_stale_upgrades
 import httpx
 
 # Configure logging
@@ -19,6 +24,13 @@ logger = logging.getLogger(__name__)
 
 logger.info("🚀 Initializing HilAnchor bot...")
 
+
+async def on_shutdown(app) -> None:
+    cancel_upgrades()
+    await aclose_llm(app)
+    await shutdown_io(app)  # flush pending state writes on exit
+
+
 # Configure proxy if needed
 builder = (
     ApplicationBuilder()
@@ -29,6 +41,9 @@ builder = (
     .pool_timeout(30.0)
     .get_updates_connect_timeout(30.0)
     .get_updates_read_timeout(30.0)
+    .post_init(aload_pool)
+    .post_shutdown(on_shutdown)
+    .concurrent_updates(True)  # per-chat ordering is kept by atransaction(chat_id=...)
 )
 
 if PROXY_URL:
@@ -43,6 +58,11 @@ else:
 
 app = builder.build()
 
+logger.info("🚦 Registering flood guard...")
+app.add_handler(TypeHandler(Update, flood_guard), group=-1)
+# Before the guard: a tap on a message cancels its pending humanized edit
+app.add_handler(TypeHandler(Update, drop_stale_upgrades), group=-2)
+
 logger.info("📝 Registering command handlers...")
 app.add_handler(CommandHandler("start", start))
 app.add_handler(CommandHandler("checkin", checkin))
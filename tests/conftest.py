@@ -104,9 +104,38 @@ def state_with_events():
     }
 
 
+@pytest.fixture
+def tmp_state_path(tmp_path, monkeypatch):
+    """Point the state store at a fresh file inside tmp_path."""
+    import hilanchor.state_store as store
+    from hilanchor.storage import JsonBackend
+    path = tmp_path / "state.json"
+    monkeypatch.setattr(store, "_backend", JsonBackend(path))
+    return path
+
+
 @pytest.fixture(autouse=True)
 def reset_config():
     """Reset config values before each test."""
     # This ensures each test starts with clean config
     yield
     # Cleanup after test if needed
+
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    """A closed LLM circuit breaker per test, so failures in one test don't open it for the next."""
+    from hilanchor import llm_breaker
+    monkeypatch.setattr(llm_breaker, "_breaker", llm_breaker.CircuitBreaker())
+    monkeypatch.setattr(llm_breaker, "BREAKER_STATS", dict.fromkeys(llm_breaker.BREAKER_STATS, 0))
+
+
+@pytest.fixture(autouse=True)
+def tmp_llm_cache(tmp_path, monkeypatch):
+    """Keep the LLM cache's disk tier inside tmp_path, never in the working directory."""
+    from hilanchor import llm_cache
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_PATH", str(tmp_path / "state.json.llmcache.db"))
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    yield
+    if llm_cache._cache is not None:
+        llm_cache._cache.close()
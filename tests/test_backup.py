@@ -0,0 +1,154 @@
+"""
+Tests for incremental, deduplicated backups of the state and journal.
+"""
+import datetime as dt
+import json
+import random
+import pytest
+
+from hilanchor import backup
+from hilanchor.state_store import load_state, set_worked, today_key, transaction
+from hilanchor.storage.snapshots import SnapshotStore, chunk_boundaries, parse_id
+
+
+def blob(size, seed=1):
+    return random.Random(seed).randbytes(size)
+
+
+class TestSnapshotStore:
+    """Content-defined chunks, dedup and retention."""
+
+    def test_chunks_cover_the_data(self):
+        data = blob(300_000)
+        bounds = list(chunk_boundaries(data))
+        assert b"".join(data[s:e] for s, e in bounds) == data
+        assert all(2048 <= e - s <= 65536 for s, e in bounds[:-1])
+
+    def test_edit_in_the_middle_stores_only_the_delta(self, tmp_path):
+        store = SnapshotStore(tmp_path)
+        data = blob(400_000)
+        first = store.create({"state/state.json": data})
+        edited = data[:200_000] + b"a new day" + data[200_000:]
+        second = store.create({"state/state.json": edited})
+
+        assert second["written"] < first["written"] / 10
+        assert store.read_file(second["id"], "state/state.json") == edited
+        assert store.read_file(first["id"], "state/state.json") == data
+
+    def test_unchanged_file_writes_nothing(self, tmp_path):
+        store = SnapshotStore(tmp_path)
+        store.create({"journal/j.txt": blob(50_000)})
+        assert store.create({"journal/j.txt": blob(50_000)})["written"] == 0
+        assert len(store.snapshots()) == 2
+
+    def test_retention_keeps_daily_and_weekly(self, tmp_path):
+        store = SnapshotStore(tmp_path)
+        start = dt.datetime(2025, 1, 1, 3, 45, tzinfo=dt.timezone.utc)
+        for day in range(60):
+            store.create({"f": blob(10_000, seed=day)}, now=start + dt.timedelta(days=day))
+
+        removed = store.prune(keep_daily=7, keep_weekly=4)
+        kept = store.snapshots()
+        assert len(kept) + len(removed) == 60
+        assert kept[-7:] == [(start + dt.timedelta(days=d)).strftime("%Y%m%dT%H%M%SZ") for d in range(53, 60)]
+        assert len(kept) < 12
+        # Chunks of pruned snapshots are gone, the kept ones still restore
+        assert len(list(store.chunk_dir.glob("*/*"))) == len(
+            {c for s in kept for c in store.manifest(s)["files"]["f"]["chunks"]}
+        )
+        oldest_day = (parse_id(kept[0]) - start).days
+        assert store.read_file(kept[0], "f") == blob(10_000, seed=oldest_day)
+
+
+class TestBotBackup:
+    """Backing up and restoring the live state and journal."""
+
+    @pytest.fixture
+    def setup(self, tmp_state_path, tmp_path, monkeypatch):
+        journal = tmp_path / "journal.txt"
+        journal.write_text("first entry\n", encoding="utf-8")
+        monkeypatch.setattr(backup, "JOURNAL_PATH", str(journal))
+        monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path / "state.json.backups"))
+        return tmp_state_path, journal
+
+    def test_backup_includes_state_sidecars_and_journal(self, setup):
+        state_path, _ = setup
+        with transaction() as state:
+            set_worked(state, "yes")
+        (state_path.parent / "state.json.seen").write_text("5\n")
+        (state_path.parent / "state.json.bak.1").write_text("{}")
+        for other in ("state.json.llmcache.db", "state.json.llmcache.db-wal", "state.json.variants"):
+            (state_path.parent / other).write_text("not state")
+
+        stats = backup.backup_now()
+        names = sorted(backup.get_store().manifest(stats["id"])["files"])
+        assert names == ["journal/journal.txt", "state/state.json", "state/state.json.seen"]
+
+    def test_each_user_shard_is_read_under_its_own_lock(self, setup, monkeypatch):
+        from hilanchor import state_store, users
+        from hilanchor.users import as_user
+
+        state_path, _ = setup
+        monkeypatch.setattr(users, "ALLOWED_USER_IDS", frozenset({1, 2}))
+        monkeypatch.setattr(state_store, "_shards", type(state_store._shards)())
+        with as_user(2):
+            with transaction() as state:
+                set_worked(state, "no")
+        shard_lock = state_store._lock_at(str(state_store.shard_path(2)))
+
+        reads = []
+        read_bytes = backup.Path.read_bytes
+
+        def spy(path):
+            reads.append((path.name, shard_lock._depth > 0))
+            return read_bytes(path)
+
+        monkeypatch.setattr(backup.Path, "read_bytes", spy)
+        files = backup.read_sources()
+        assert "state/state.users/2.json" in files
+        assert ("2.json", True) in reads
+
+    def test_restore_in_place(self, setup):
+        state_path, journal = setup
+        with transaction() as state:
+            set_worked(state, "yes")
+        saved = backup.backup_now()["id"]
+
+        with transaction() as state:
+            set_worked(state, "no")
+        journal.write_text("first entry\nsecond entry\n", encoding="utf-8")
+        stale_log = state_path.parent / "state.json.log"
+        stale_log.write_text('{"meta":{}}\n')
+
+        assert backup.restore(saved) == 2
+        assert json.loads(state_path.read_text(encoding="utf-8"))[today_key()]["worked"] == "yes"
+        assert journal.read_text(encoding="utf-8") == "first entry\n"
+        assert not stale_log.exists()
+        assert load_state()[today_key()]["worked"] == "yes"
+        # The pre-restore files were kept as a backup of their own
+        undo = backup.get_store().snapshots()[-1]
+        assert "state/state.json.log" in backup.get_store().manifest(undo)["files"]
+
+    def test_restore_in_place_leaves_the_llm_files_alone(self, setup):
+        state_path, _ = setup
+        with transaction() as state:
+            set_worked(state, "yes")
+        cache = state_path.parent / "state.json.llmcache.db"
+        cache.write_text("live cache")
+        # A snapshot taken when the LLM files were still picked up by prefix
+        store = backup.get_store()
+        files = backup.read_sources()
+        files["state/state.json.llmcache.db"] = b"old cache"
+        files["state/state.json.variants"] = b"old pool"
+        old = store.create(files)["id"]
+
+        assert backup.restore(old) == 2
+        assert cache.read_text() == "live cache"
+        assert not (state_path.parent / "state.json.variants").exists()
+
+    def test_restore_to_directory_from_cli(self, setup, tmp_path):
+        backup.main(["now"])
+        target = tmp_path / "restored"
+        assert backup.main(["restore", "latest", "--to", str(target)]) == 0
+        assert (target / "journal" / "journal.txt").read_text(encoding="utf-8") == "first entry\n"
+        assert backup.main(["restore", "19990101T000000Z", "--to", str(target)]) == 1
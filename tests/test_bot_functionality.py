@@ -133,8 +133,9 @@ class TestKeyboards:
 class TestStateStore:
     """Test state management functionality."""
 
-    def setup_method(self):
-        """Setup test state before each test."""
+    @pytest.fixture(autouse=True)
+    def setup_state(self, tmp_state_path):
+        """Setup test state before each test; the setters save into tmp_path."""
         self.test_state = {}
 
     def test_today_key_format(self):
@@ -371,6 +372,69 @@ class TestLLMIntegration:
         assert isinstance(result, str)
         assert len(result) > 0
 
+    async def test_async_humanize_does_not_block_the_loop(self, monkeypatch):
+        """Other coroutines keep running while the model generates."""
+        import asyncio
+        from hilanchor import llm
+
+        class SlowClient:
+            async def generate(self, **kwargs):
+                await asyncio.sleep(0.2)
+                return {"response": "היי 🙂"}
+
+        monkeypatch.setattr(llm, "USE_LLM", True)
+        monkeypatch.setattr(llm, "get_async_client", lambda: SlowClient())
+        monkeypatch.setattr(llm, "get_cache", lambda: None)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(1)
+                await asyncio.sleep(0.02)
+
+        result, _ = await asyncio.gather(llm.ahumanize_message("היי"), ticker())
+        assert result == "היי 🙂"
+        assert len(ticks) == 5
+
+    async def test_instructions_go_in_the_system_prompt(self, monkeypatch):
+        """Every request shares the same system prompt; the prompt holds only the message."""
+        from hilanchor import llm
+
+        client = Mock()
+        client.generate = AsyncMock(return_value={"response": "היי 🙂"})
+        monkeypatch.setattr(llm, "USE_LLM", True)
+        monkeypatch.setattr(llm, "get_async_client", lambda: client)
+        monkeypatch.setattr(llm, "get_cache", lambda: None)
+        await llm.ahumanize_message("היי", context="greeting")
+        await llm.ahumanize_message("ביי")
+        first, second = (call.kwargs for call in client.generate.await_args_list)
+        assert first["system"] is second["system"] is llm.SYSTEM_PROMPT
+        assert first["prompt"] == 'הודעה מקורית: "היי"\nהקשר: greeting'
+        assert second["prompt"] == 'הודעה מקורית: "ביי"'
+
+    async def test_async_humanize_falls_back_on_timeout(self, monkeypatch):
+        import httpx
+        from hilanchor import llm
+
+        client = Mock()
+        client.generate = AsyncMock(side_effect=httpx.ReadTimeout("slow"))
+        monkeypatch.setattr(llm, "USE_LLM", True)
+        monkeypatch.setattr(llm, "get_async_client", lambda: client)
+        monkeypatch.setattr(llm, "get_pool", lambda: None)  # live generation, not the variant pool
+        monkeypatch.setattr(llm, "get_cache", lambda: None)
+        assert await llm.ahumanize_checkin("14") == msg.CHECKIN_14
+        with pytest.raises(httpx.ReadTimeout):
+            await llm.ahumanize_message("x", fallback_on_error=False)
+
+    async def test_async_client_is_shared_with_timeouts(self):
+        from hilanchor import llm
+
+        client = llm.get_async_client()
+        assert llm.get_async_client() is client
+        assert client._client.timeout.connect == llm.LLM_CONNECT_TIMEOUT
+        assert client._client.timeout.read == llm.LLM_READ_TIMEOUT
+        await llm.aclose_llm()
+
 
 class TestMessageFunctions:
     """Test dynamic message functions."""
@@ -0,0 +1,57 @@
+"""
+Tests for llm.py over real HTTP, against the fake Ollama server of the benchmarks.
+"""
+import pytest
+
+from benchmarks.fake_ollama import FakeOllama, Latency
+from hilanchor import llm, llm_breaker
+from hilanchor import messages as msg
+
+
+@pytest.fixture
+async def fake(monkeypatch):
+    with FakeOllama(latency="20", token_latency="5", hang_seconds=1, seed=1) as server:
+        monkeypatch.setattr(llm, "USE_LLM", True)
+        monkeypatch.setattr(llm, "OLLAMA_HOST", server.url)
+        monkeypatch.setattr(llm, "LLM_READ_TIMEOUT", 0.3)
+        monkeypatch.setattr(llm, "_async_client", None)
+        monkeypatch.setattr(llm, "get_cache", lambda: None)
+        monkeypatch.setattr(llm, "get_pool", lambda: None)
+        yield server
+        await llm.aclose_llm()
+
+
+class TestFakeOllama:
+    """Answers, streams, failures and hangs through the real client."""
+
+    async def test_answer_keeps_the_message(self, fake):
+        assert await llm.ahumanize_checkin("14") == f"{msg.CHECKIN_14} 🙂"
+        assert fake.stats["requests"] == 1
+
+    async def test_stream_arrives_token_by_token(self, fake):
+        parts = [text async for text in llm.ahumanize_stream("שלום לך", context="x")]
+        assert parts[:3] == ["שלום", "שלום לך", "שלום לך 🙂"]
+        assert parts[-1] == "שלום לך 🙂"
+        assert fake.stats["streams"] == 1
+
+    async def test_errors_open_the_circuit(self, fake):
+        fake.configure(error_rate=1.0)
+        for _ in range(llm_breaker.get_breaker().failures + 2):
+            assert await llm.ahumanize_message("היי") == "היי"
+        assert fake.stats["errors"] == llm_breaker.get_breaker().failures
+        assert llm_breaker.get_breaker_stats()["state"] == llm_breaker.OPEN
+
+    async def test_hang_falls_back_on_the_read_timeout(self, fake):
+        fake.configure(hang_rate=1.0)
+        assert await llm.ahumanize_message("היי") == "היי"
+        assert fake.stats["hangs"] == 1
+
+    def test_latency_specs(self):
+        import random
+        rng = random.Random(1)
+        assert Latency("250", rng).sample() == 0.25
+        assert all(0.1 <= Latency("uniform:100-200", rng).sample() <= 0.2 for _ in range(50))
+        samples = sorted(Latency("lognormal:300,0.5", rng).sample() for _ in range(2001))
+        assert 0.25 < samples[1000] < 0.35
+        with pytest.raises(ValueError):
+            Latency("gamma:1", rng)
@@ -0,0 +1,64 @@
+"""
+Tests for the pre-dispatch flood guard.
+"""
+import pytest
+from unittest.mock import Mock
+
+from telegram.ext import ApplicationHandlerStop
+
+from hilanchor.handlers import guard
+from hilanchor.handlers.guard import FloodGuard
+
+OWNER = 1
+ALLOWED = {OWNER}.__contains__
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFloodGuard:
+    """Token buckets and the stranger deny cache."""
+
+    def test_owner_burst_then_refill(self):
+        clock = FakeClock()
+        g = FloodGuard(ALLOWED, burst=3, rate=1.0, deny_seconds=60, clock=clock)
+
+        assert [g.check(OWNER) for _ in range(4)] == [None, None, None, "dropped_rate"]
+        clock.now += 1.0
+        assert g.check(OWNER) is None
+        assert g.check(OWNER) == "dropped_rate"
+
+    def test_stranger_passes_once_then_denied_until_expiry(self):
+        clock = FakeClock()
+        g = FloodGuard(ALLOWED, burst=5, rate=1.0, deny_seconds=60, clock=clock)
+
+        assert g.check(99) is None
+        assert all(g.check(99) == "dropped_denied" for _ in range(50))
+        assert g.check(OWNER) is None  # strangers don't affect the owner
+        clock.now += 61
+        assert g.check(99) is None
+        assert g.check(99) == "dropped_denied"
+
+    def test_update_without_user_is_dropped(self):
+        g = FloodGuard(ALLOWED, clock=FakeClock())
+        assert g.check(None) == "dropped_no_user"
+
+    async def test_handler_stops_dispatch_and_counts(self, monkeypatch):
+        monkeypatch.setattr(guard, "_guard", FloodGuard(ALLOWED, burst=1, rate=0.0, clock=FakeClock()))
+        before = guard.get_guard_stats()
+
+        update = Mock()
+        update.effective_user.id = 555
+        await guard.flood_guard(update, Mock())  # first one goes on
+        for _ in range(3):
+            with pytest.raises(ApplicationHandlerStop):
+                await guard.flood_guard(update, Mock())
+
+        after = guard.get_guard_stats()
+        assert after["passed"] - before["passed"] == 1
+        assert after["dropped_denied"] - before["dropped_denied"] == 3
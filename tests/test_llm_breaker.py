@@ -0,0 +1,194 @@
+"""
+Tests for the circuit breaker around the LLM calls.
+"""
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from hilanchor import llm, llm_breaker
+from hilanchor.llm_breaker import CircuitBreaker, CircuitOpen
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail(breaker):
+    with pytest.raises(ConnectionError):
+        with breaker.call():
+            raise ConnectionError("down")
+
+
+@pytest.fixture
+def down_llm(monkeypatch):
+    """Ollama refusing connections, behind a breaker with a fake clock."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failures=2, slow_seconds=5, cooldown=30, max_queue=0, clock=clock)
+    client = Mock()
+    client.generate = AsyncMock(side_effect=ConnectionError("refused"))
+    monkeypatch.setattr(llm, "USE_LLM", True)
+    monkeypatch.setattr(llm, "get_breaker", lambda: breaker)
+    monkeypatch.setattr(llm, "get_async_client", lambda: client)
+    monkeypatch.setattr(llm, "get_cache", lambda: None)
+    return breaker, client, clock
+
+
+class TestCircuitBreaker:
+    """Opening, half-open probing, and the in-flight cap."""
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failures=3, clock=FakeClock())
+        fail(breaker)
+        fail(breaker)
+        with breaker.call():
+            pass  # a success resets the count
+        for _ in range(3):
+            fail(breaker)
+        assert breaker.state == llm_breaker.OPEN
+        with pytest.raises(CircuitOpen):
+            with breaker.call():
+                pass
+        assert llm_breaker.get_breaker_stats()["opened"] == 1
+
+    def test_slow_answers_count_as_failures(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failures=2, slow_seconds=5, clock=clock)
+        for _ in range(2):
+            with breaker.call():
+                clock.now += 6
+        assert breaker.state == llm_breaker.OPEN
+        assert llm_breaker.BREAKER_STATS["slow"] == 2
+
+    def test_stream_is_timed_to_its_first_token(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failures=1, slow_seconds=5, clock=clock)
+        with breaker.call() as call:
+            clock.now += 1
+            call.answered()
+            clock.now += 60
+        assert breaker.state == llm_breaker.CLOSED
+
+    def test_half_open_lets_one_probe_through(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failures=1, cooldown=30, clock=clock)
+        fail(breaker)
+        clock.now += 31
+        with breaker.call():
+            assert breaker.state == llm_breaker.HALF_OPEN
+            assert breaker.check() == "rejected_open"
+        assert breaker.state == llm_breaker.CLOSED
+        assert llm_breaker.BREAKER_STATS["closed"] == 1
+
+    def test_failed_probe_opens_for_another_cooldown(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failures=3, cooldown=30, clock=clock)
+        for _ in range(3):
+            fail(breaker)
+        clock.now += 31
+        fail(breaker)
+        assert breaker.state == llm_breaker.OPEN
+        clock.now += 29
+        assert breaker.check() == "rejected_open"
+        clock.now += 1
+        assert breaker.check() is None
+
+    def test_cancelled_probe_frees_the_slot(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failures=1, cooldown=30, clock=clock)
+        fail(breaker)
+        clock.now += 31
+        with pytest.raises(asyncio.CancelledError):
+            with breaker.call():
+                raise asyncio.CancelledError
+        assert breaker.state == llm_breaker.HALF_OPEN
+        assert breaker.check() is None
+
+    def test_sheds_calls_beyond_the_queue_depth(self):
+        breaker = CircuitBreaker(max_queue=2, clock=FakeClock())
+        with breaker.call(), breaker.call():
+            assert breaker.check() == "rejected_busy"
+        assert breaker.in_flight == 0
+        assert breaker.state == llm_breaker.CLOSED
+
+    def test_calls_from_worker_threads_keep_the_counts(self):
+        breaker = CircuitBreaker(max_queue=3)
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(50):
+                try:
+                    with breaker.call():
+                        with lock:
+                            running[0] += 1
+                            peak[0] = max(peak[0], running[0])
+                        time.sleep(0.0005)
+                        with lock:
+                            running[0] -= 1
+                except CircuitOpen:
+                    pass
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = llm_breaker.BREAKER_STATS
+        assert stats["passed"] + stats["rejected_busy"] == 400
+        assert stats["rejected_busy"] > 0
+        assert peak[0] <= 3
+        assert breaker.in_flight == 0
+
+
+class TestHumanizeBehindTheBreaker:
+    """An open circuit sends the original without asking the model."""
+
+    async def test_open_circuit_skips_the_model(self, down_llm):
+        breaker, client, _ = down_llm
+        results = [await llm.ahumanize_message("היי") for _ in range(5)]
+        assert results == ["היי"] * 5
+        assert client.generate.await_count == 2
+        assert llm_breaker.BREAKER_STATS["rejected_open"] == 3
+        with pytest.raises(CircuitOpen):
+            await llm.ahumanize_message("היי", fallback_on_error=False)
+
+    async def test_recovered_model_closes_the_circuit(self, down_llm):
+        breaker, client, clock = down_llm
+        for _ in range(2):
+            await llm.ahumanize_message("היי")
+        client.generate.side_effect = None
+        client.generate.return_value = {"response": "היי 🙂"}
+        assert await llm.ahumanize_message("היי") == "היי"
+        clock.now += 31
+        assert await llm.ahumanize_message("היי") == "היי 🙂"
+        assert breaker.state == llm_breaker.CLOSED
+
+    async def test_stream_falls_back_while_open(self, down_llm):
+        _, client, _ = down_llm
+        for _ in range(2):
+            await llm.ahumanize_message("היי")
+        assert [text async for text in llm.ahumanize_stream("היי")] == ["היי"]
+        assert client.generate.await_count == 2
+
+    async def test_full_queue_sends_the_original(self, monkeypatch, down_llm):
+        breaker, client, _ = down_llm
+        breaker.max_queue = 1
+        release = asyncio.Event()
+
+        async def slow_generate(**_):
+            await release.wait()
+            return {"response": "היי 🙂"}
+
+        client.generate.side_effect = slow_generate
+        first = asyncio.ensure_future(llm.ahumanize_message("היי"))
+        await asyncio.sleep(0)
+        assert await llm.ahumanize_message("היי") == "היי"
+        release.set()
+        assert await first == "היי 🙂"
+        assert llm_breaker.BREAKER_STATS["rejected_busy"] == 1
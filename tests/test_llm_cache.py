@@ -0,0 +1,123 @@
+"""
+Tests for the two-tier cache of humanized texts.
+"""
+import time
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from hilanchor import llm, llm_cache
+from hilanchor import messages as msg
+from hilanchor.llm_cache import HumanizeCache, cache_key
+
+
+def make_cache(tmp_path, **overrides):
+    options = dict(size=2, disk_size=10, ttl=3600, variants=3, sample_rate=0.0)
+    options.update(overrides)
+    return HumanizeCache(tmp_path / "cache.db", **options)
+
+
+@pytest.fixture(autouse=True)
+def clean_stats(monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_STATS", dict.fromkeys(llm_cache.CACHE_STATS, 0))
+
+
+@pytest.fixture
+def cached_llm(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    client = Mock()
+    client.generate = AsyncMock(side_effect=lambda **_: {"response": f"גרסה {client.generate.await_count}"})
+    monkeypatch.setattr(llm, "USE_LLM", True)
+    monkeypatch.setattr(llm, "get_cache", lambda: cache)
+    monkeypatch.setattr(llm, "get_async_client", lambda: client)
+    return cache, client
+
+
+class TestHumanizeCache:
+    """LRU, disk tier, TTL and variants."""
+
+    def test_memory_lru_evicts_the_oldest(self, tmp_path):
+        cache = make_cache(tmp_path, disk_size=0)
+        for key in ("a", "b", "c"):
+            cache.put(key, key.upper())
+        assert len(cache) == 2
+        assert cache.get("a") is None
+        assert cache.get("c") == "C"
+        assert llm_cache.CACHE_STATS["evicted"] == 1
+
+    def test_disk_tier_survives_a_restart(self, tmp_path):
+        cache = make_cache(tmp_path)
+        cache.persist("k", cache.put("k", "שלום"))
+        cache.close()
+
+        reopened = make_cache(tmp_path)
+        assert reopened.get("k", memory_only=True) is None
+        assert reopened.get("k") == "שלום"
+        assert reopened.get("k", memory_only=True) == "שלום"
+        assert llm_cache.CACHE_STATS["disk_hits"] == 1
+        assert llm_cache.CACHE_STATS["memory_hits"] == 1
+
+    def test_disk_keeps_the_most_recently_used(self, tmp_path):
+        cache = make_cache(tmp_path, disk_size=2)
+        for key in ("a", "b", "c"):
+            cache.persist(key, [(key, time.time())])
+        assert cache.disk_entries() == 2
+        assert cache.get("a") is None
+
+    def test_old_texts_expire(self, tmp_path):
+        cache = make_cache(tmp_path, ttl=60)
+        cache.persist("k", [("ישן", time.time() - 120), ("חדש", time.time())])
+        assert {cache.get("k") for _ in range(10)} == {"חדש"}
+        assert llm_cache.CACHE_STATS["expired"] == 1
+
+    def test_keeps_the_newest_variants(self, tmp_path):
+        cache = make_cache(tmp_path, variants=2)
+        for text in ("1", "2", "3"):
+            variants = cache.put("k", text)
+        assert [text for text, _ in variants] == ["2", "3"]
+
+
+class TestCachedHumanize:
+    """Repeat prompts skip the model."""
+
+    async def test_repeat_nudge_skips_the_model(self, cached_llm):
+        cache, client = cached_llm
+        first = await llm.ahumanize_nudge(15)
+        assert await llm.ahumanize_nudge(15) == first
+        assert client.generate.await_count == 1
+        assert cache.disk_entries() == 1
+        assert llm_cache.get_cache_stats()["hit_rate"] == 0.5
+
+    async def test_context_and_model_are_part_of_the_key(self, cached_llm):
+        _, client = cached_llm
+        await llm.ahumanize_nudge(15)
+        await llm.ahumanize_nudge(30)
+        await llm.ahumanize_message(msg.nudge_message(15), context="nudge after 15 minutes", model="other")
+        assert client.generate.await_count == 3
+
+    async def test_sampled_hits_add_fresh_variants(self, cached_llm):
+        cache, client = cached_llm
+        cache.sample_rate = 1.0
+        texts = {await llm.ahumanize_nudge(15) for _ in range(3)}
+        assert len(texts) == 3
+        assert client.generate.await_count == 3
+
+    async def test_failed_sample_falls_back_to_the_cached_text(self, cached_llm):
+        cache, client = cached_llm
+        first = await llm.ahumanize_nudge(15)
+        cache.sample_rate = 1.0
+        client.generate.side_effect = ConnectionError("down")
+        assert await llm.ahumanize_nudge(15) == first
+
+    def test_sync_api_uses_the_cache(self, tmp_path, monkeypatch):
+        cache = make_cache(tmp_path)
+        client = Mock()
+        client.generate.return_value = {"response": "היי 🙂"}
+        monkeypatch.setattr(llm, "USE_LLM", True)
+        monkeypatch.setattr(llm, "get_cache", lambda: cache)
+        monkeypatch.setattr(llm, "get_client", lambda: client)
+
+        assert llm.humanize_checkin("14") == "היי 🙂"
+        assert llm.humanize_checkin("14") == "היי 🙂"
+        assert client.generate.call_count == 1
+        prompt = llm.build_prompt(msg.CHECKIN_14, "check-in at 14:00")
+        assert cache_key(llm.DEFAULT_MODEL, prompt, llm.SYSTEM_PROMPT) in cache._memory
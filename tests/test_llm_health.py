@@ -0,0 +1,84 @@
+"""
+Tests for model warmup, keep-alive and the health probe.
+"""
+import datetime as dt
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from ollama._types import GenerateResponse, ListResponse, ProcessResponse
+
+from hilanchor import llm, llm_health
+
+
+def fake_client(installed=("llama3.2:3b",), running=(), error=None):
+    client = Mock()
+    if error:
+        client.list = AsyncMock(side_effect=error)
+        client.ps = AsyncMock(side_effect=error)
+    else:
+        client.list = AsyncMock(return_value=ListResponse(models=[{"model": name} for name in installed]))
+        expires = dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc)
+        client.ps = AsyncMock(return_value=ProcessResponse(
+            models=[{"model": name, "name": name, "expires_at": expires, "size_vram": 2048} for name in running]
+        ))
+    client.generate = AsyncMock(return_value=GenerateResponse(model="m", response="", load_duration=2_500_000_000))
+    return client
+
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setattr(llm_health, "MODEL_STATE", dict.fromkeys(llm_health.MODEL_STATE))
+
+    def use(client, hour=12):
+        monkeypatch.setattr(llm_health, "get_async_client", lambda: client)
+        monkeypatch.setattr(llm_health, "owner_hour", lambda: hour)
+        monkeypatch.setattr(llm, "owner_hour", lambda: hour)
+        return client
+    return use
+
+
+class TestModelHealth:
+    """Startup check, keep-alive by the hour, and the probe."""
+
+    async def test_startup_loads_an_installed_model(self, model):
+        client = model(fake_client())
+        assert await llm_health.astartup_check("llama3.2:3b")
+        assert client.generate.await_args.kwargs == {"model": "llama3.2:3b", "prompt": "", "keep_alive": "15m"}
+        health = llm_health.get_model_health()
+        assert health["installed"] and health["loaded"]
+        assert health["load_seconds"] == 2.5
+
+    async def test_missing_model_is_not_loaded(self, model):
+        client = model(fake_client(installed=("other:7b",)))
+        assert not await llm_health.astartup_check("llama3.2:3b")
+        client.generate.assert_not_awaited()
+        assert llm_health.get_model_health()["installed"] is False
+
+    async def test_unreachable_ollama_is_reported(self, model):
+        model(fake_client(error=ConnectionError("refused")))
+        assert not await llm_health.astartup_check("llama3.2:3b")
+        assert llm_health.get_model_health()["error"] == "refused"
+
+    async def test_probe_sees_a_loaded_untagged_model(self, model):
+        model(fake_client(installed=("mistral:latest",), running=("mistral:latest",)))
+        state = await llm_health.aprobe_model("mistral")
+        assert state["loaded"] and state["size_vram"] == 2048
+        assert state["expires_at"].startswith("2026-01-01")
+
+    async def test_kept_warm_by_day_and_released_once_at_night(self, model):
+        client = model(fake_client(running=("llama3.2:3b",)), hour=15)
+        await llm_health.akeep_model_warm("llama3.2:3b")
+        assert client.generate.await_args.kwargs["keep_alive"] == "15m"
+
+        model(client, hour=2)
+        await llm_health.akeep_model_warm("llama3.2:3b")
+        await llm_health.akeep_model_warm("llama3.2:3b")
+        assert client.generate.await_count == 2
+        assert client.generate.await_args.kwargs["keep_alive"] == 0
+        assert llm_health.get_model_health()["loaded"] is False
+
+    def test_requests_keep_the_model_only_in_active_hours(self, monkeypatch):
+        monkeypatch.setattr(llm, "owner_hour", lambda: 11)
+        assert llm.keep_alive() == llm.KEEP_ALIVE_ACTIVE
+        monkeypatch.setattr(llm, "owner_hour", lambda: 3)
+        assert llm.keep_alive() == llm.KEEP_ALIVE_IDLE
@@ -0,0 +1,176 @@
+"""
+Tests for humanized replies within a latency budget.
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from hilanchor import replies
+
+
+def humanizer(delay, text="גרסה חמה"):
+    async def ahumanize_message(original_message, context=None):
+        await asyncio.sleep(delay)
+        return text
+    return ahumanize_message
+
+
+def sent_message(chat_id=1, message_id=10):
+    message = Mock(chat_id=chat_id, message_id=message_id)
+    message.edit_text = AsyncMock()
+    return message
+
+
+@pytest.fixture(autouse=True)
+def clean_stats(monkeypatch):
+    monkeypatch.setattr(replies, "REPLY_STATS", replies.defaultdict(replies.Counter))
+    monkeypatch.setattr(replies, "LLM_BUDGET_MS", 50)
+    monkeypatch.setattr(replies, "LLM_BUDGETS", {})
+
+
+class TestSendHumanized:
+    """Send within the budget, or send the original and upgrade it."""
+
+    async def test_ready_in_time_is_sent_directly(self, monkeypatch):
+        monkeypatch.setattr(replies, "ahumanize_message", humanizer(0))
+        send = AsyncMock(return_value=sent_message())
+
+        await replies.send_humanized(send, "מקור", site="worked", reply_markup="kb")
+        send.assert_awaited_once_with(text="גרסה חמה", reply_markup="kb")
+        assert replies.get_reply_stats() == {"worked": {"on_time": 1}}
+
+    async def test_slow_text_is_sent_later_as_an_edit(self, monkeypatch):
+        monkeypatch.setattr(replies, "ahumanize_message", humanizer(0.1))
+        message = sent_message()
+        send = AsyncMock(return_value=message)
+
+        await replies.send_humanized(send, "מקור", site="worked", reply_markup="kb")
+        send.assert_awaited_once_with(text="מקור", reply_markup="kb")
+        message.edit_text.assert_not_awaited()
+
+        await asyncio.sleep(0.15)
+        message.edit_text.assert_awaited_once_with(text="גרסה חמה", reply_markup="kb")
+        assert replies.get_reply_stats() == {"worked": {"fallback": 1, "upgraded": 1}}
+        assert not replies._upgrades
+
+    async def test_too_late_upgrade_is_dropped(self, monkeypatch):
+        monkeypatch.setattr(replies, "ahumanize_message", humanizer(0.3))
+        monkeypatch.setattr(replies, "LLM_UPGRADE_DEADLINE", 0.05)
+        message = sent_message()
+
+        await replies.send_humanized(AsyncMock(return_value=message), "מקור", site="nudge")
+        await asyncio.sleep(0.1)
+        message.edit_text.assert_not_awaited()
+        assert replies.get_reply_stats()["nudge"]["dropped"] == 1
+
+    async def test_tap_on_the_message_cancels_its_upgrade(self, monkeypatch):
+        monkeypatch.setattr(replies, "ahumanize_message", humanizer(0.1))
+        message = sent_message(chat_id=7, message_id=70)
+        await replies.send_humanized(AsyncMock(return_value=message), "מקור", site="worked")
+
+        update = Mock()
+        update.callback_query.message = Mock(chat_id=7, message_id=70)
+        await replies.drop_stale_upgrades(update, Mock())
+        await asyncio.sleep(0.15)
+        message.edit_text.assert_not_awaited()
+        assert replies.get_reply_stats()["worked"]["dropped"] == 1
+
+    async def test_inline_messages_are_edited_through_send(self, monkeypatch):
+        monkeypatch.setattr(replies, "ahumanize_message", humanizer(0.1))
+        send = AsyncMock(return_value=True)
+
+        await replies.send_humanized(send, "מקור", site="mode")
+        await asyncio.sleep(0.15)
+        assert send.await_args_list[-1].kwargs == {"text": "גרסה חמה", "reply_markup": None}
+
+    async def test_inline_send_leaves_other_chats_upgrades_alone(self, monkeypatch):
+        monkeypatch.setattr(replies, "ahumanize_message", humanizer(0.3))
+        message = sent_message(chat_id=7, message_id=70)
+        await replies.send_humanized(AsyncMock(return_value=message), "מקור", site="worked")
+        inline = AsyncMock(return_value=True)
+        await replies.send_humanized(inline, "מקור", site="mode")
+        assert list(replies._upgrades) == [(7, 70)]
+
+        await asyncio.sleep(0.35)
+        message.edit_text.assert_awaited_once_with(text="גרסה חמה", reply_markup=None)
+        assert inline.await_args_list[-1].kwargs == {"text": "גרסה חמה", "reply_markup": None}
+        assert replies.get_reply_stats()["worked"] == {"fallback": 1, "upgraded": 1}
+        assert not replies._upgrades and not replies._inline_upgrades
+
+    def test_budget_per_site(self, monkeypatch):
+        monkeypatch.setattr(replies, "LLM_BUDGETS", {"checkin": 5000})
+        assert replies.budget_for("checkin") == 5.0
+        assert replies.budget_for("worked") == 0.05
+
+
+class FakeStreamClient:
+    """Ollama client whose generate(stream=True) yields `tokens` `delay` seconds apart."""
+
+    def __init__(self, tokens, delay=0.01):
+        self.tokens = tokens
+        self.delay = delay
+
+    async def generate(self, stream=False, **kwargs):
+        async def parts():
+            for token in self.tokens:
+                await asyncio.sleep(self.delay)
+                yield {"response": token}
+        return parts()
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    from hilanchor import llm
+    monkeypatch.setattr(llm, "USE_LLM", True)
+    monkeypatch.setattr(llm, "get_pool", lambda: None)
+    monkeypatch.setattr(llm, "get_cache", lambda: None)
+    monkeypatch.setattr(replies, "LLM_STREAM", True)
+    monkeypatch.setattr(replies, "LLM_STREAM_EDIT_INTERVAL", 0.05)
+
+    def use(tokens, delay=0.01):
+        monkeypatch.setattr(llm, "get_async_client", lambda: FakeStreamClient(tokens, delay))
+    return use
+
+
+class TestStreaming:
+    """Replies shown token by token."""
+
+    async def test_stream_yields_growing_text_then_the_final(self, streaming):
+        from hilanchor import llm
+        streaming(["היי", " שם", " 🙂"])
+        texts = [text async for text in llm.ahumanize_stream("שלום לך")]
+        assert texts == ["היי", "היי שם", "היי שם 🙂", "היי שם 🙂"]
+
+    async def test_too_long_stream_ends_on_the_original(self, streaming):
+        from hilanchor import llm
+        streaming(["מילה "] * 20)
+        texts = [text async for text in llm.ahumanize_stream("קצר")]
+        assert texts[-1] == "קצר"
+
+    async def test_first_tokens_are_sent_and_edits_throttled(self, streaming):
+        tokens = [f"מילה{i} " for i in range(20)]
+        streaming(tokens, delay=0.01)
+        message = sent_message()
+        send = AsyncMock(return_value=message)
+
+        await replies.send_humanized(send, "מקור " * 50, site="worked", reply_markup="kb")
+        assert send.await_args.kwargs["text"] == "מילה0"
+
+        await asyncio.sleep(0.5)
+        edits = [call.kwargs["text"] for call in message.edit_text.await_args_list]
+        assert edits[-1] == "".join(tokens).strip()
+        assert 1 < len(edits) < len(tokens) - 1
+        assert all(call.kwargs["reply_markup"] == "kb" for call in message.edit_text.await_args_list)
+        assert replies.get_reply_stats()["worked"] == {"on_time": 1, "upgraded": 1}
+
+    async def test_stalled_stream_goes_back_to_the_original(self, streaming, monkeypatch):
+        monkeypatch.setattr(replies, "LLM_UPGRADE_DEADLINE", 0.1)
+        streaming(["מילה "] * 10, delay=0.03)
+        message = sent_message()
+        send = AsyncMock(return_value=message)
+
+        await replies.send_humanized(send, "מקור ארוך מספיק לגמרי", site="nudge")
+        assert send.await_args.kwargs["text"] == "מילה"
+        await asyncio.sleep(0.4)
+        assert message.edit_text.await_args.kwargs["text"] == "מקור ארוך מספיק לגמרי"
+        assert replies.get_reply_stats()["nudge"]["dropped"] == 1
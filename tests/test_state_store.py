@@ -0,0 +1,989 @@
+"""
+Tests for state persistence - transactions and storage behaviour.
+"""
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+from hilanchor import state_store as store
+from hilanchor.state_store import (
+    transaction,
+    load_state,
+    save_state,
+    today_key,
+    set_worked,
+    set_waiting,
+    append_event,
+    reset_fail,
+    get_write_stats,
+)
+
+
+class TestTransaction:
+    """Unit-of-work: many mutations, one write."""
+
+    def test_transaction_writes_once(self, tmp_state_path):
+        before = get_write_stats()
+        with transaction() as state:
+            set_worked(state, "yes")
+            append_event(state, "checkin_answer", value="yes")
+            reset_fail(state)
+            set_waiting(state, "yes_what_did")
+        after = get_write_stats()
+
+        assert after["writes"] - before["writes"] == 1
+        assert after["saved"] - before["saved"] == 3
+        day = json.loads(tmp_state_path.read_text(encoding="utf-8"))[today_key()]
+        assert day["worked"] == "yes"
+        assert day["waiting_for"] == "yes_what_did"
+        assert len(day["events"]) == 1
+
+    def test_transaction_without_changes_does_not_write(self, tmp_state_path):
+        before = get_write_stats()
+        with transaction():
+            pass
+        assert get_write_stats()["writes"] == before["writes"]
+        assert not tmp_state_path.exists()
+
+    def test_nested_transaction_joins_outer(self, tmp_state_path):
+        before = get_write_stats()
+        with transaction() as state:
+            set_worked(state, "no")
+            with transaction(state) as inner:
+                assert inner is state
+                append_event(state, "checkin_answer", value="no")
+        assert get_write_stats()["writes"] - before["writes"] == 1
+
+    def test_transaction_flushes_on_error(self, tmp_state_path):
+        with pytest.raises(RuntimeError):
+            with transaction() as state:
+                set_worked(state, "partial")
+                raise RuntimeError("boom")
+        assert load_state()[today_key()]["worked"] == "partial"
+
+    def test_save_outside_transaction_writes_immediately(self, tmp_state_path):
+        before = get_write_stats()
+        save_state({"x": 1})
+        assert get_write_stats()["writes"] - before["writes"] == 1
+
+
+class TestHandlerWrites:
+    """Handlers should persist each update with a single write."""
+
+    async def test_worked_choice_single_write(self, tmp_state_path):
+        from hilanchor.handlers.callbacks.worked import on_worked_choice
+
+        query = Mock()
+        query.answer = AsyncMock()
+        query.edit_message_text = AsyncMock()
+        query.data = "worked:yes"
+        update = Mock()
+        update.callback_query = query
+
+        before = get_write_stats()
+        with patch("hilanchor.handlers.callbacks.worked.reject_non_owner", AsyncMock(return_value=False)):
+            await on_worked_choice(update, Mock())
+
+        assert get_write_stats()["writes"] - before["writes"] == 1
+        day = load_state()[today_key()]
+        assert day["worked"] == "yes"
+        assert day["waiting_for"] == "yes_what_did"
+        query.edit_message_text.assert_awaited_once()
+
+
+class TestSqliteBackend:
+    """SQLite backend keeps the state_store API and JSON shape."""
+
+    @pytest.fixture
+    def sqlite_store(self, tmp_path, monkeypatch):
+        from hilanchor.storage import SqliteBackend
+        backend = SqliteBackend(tmp_path / "state.db")
+        monkeypatch.setattr(store, "_backend", backend)
+        yield backend
+        backend.close()
+
+    def test_open_backend_by_suffix(self, tmp_path):
+        from hilanchor.storage import JsonBackend, SqliteBackend, open_backend
+        assert isinstance(open_backend(tmp_path / "s.json"), JsonBackend)
+        db = open_backend(tmp_path / "s.db")
+        assert isinstance(db, SqliteBackend)
+        db.close()
+
+    def test_roundtrip_through_setters(self, sqlite_store):
+        from hilanchor.state_store import get_mode, get_waiting, set_mode, mark_notified_non_owner, has_notified_non_owner
+
+        with transaction() as state:
+            set_mode(state, "kid")
+            set_waiting(state, "partial_plan")
+            append_event(state, "mode_set", value="kid")
+            append_event(state, "free_note", text="שלום")
+        mark_notified_non_owner(load_state(), 42)
+
+        state = load_state()
+        assert get_mode(state) == "kid"
+        assert get_waiting(state) == "partial_plan"
+        assert [e["type"] for e in state[today_key()]["events"]] == ["mode_set", "free_note"]
+        assert state[today_key()]["events"][1]["text"] == "שלום"
+        assert has_notified_non_owner(state, 42)
+
+    def test_save_only_writes_new_events(self, sqlite_store):
+        with transaction() as state:
+            append_event(state, "free_note", text="one")
+        with transaction() as state:
+            assert state.persisted_events[today_key()] == 1
+            append_event(state, "free_note", text="two")
+        rows = sqlite_store._conn.execute("SELECT seq, text FROM events ORDER BY seq").fetchall()
+        assert rows == [(0, "one"), (1, "two")]
+
+    def test_plain_dict_save_is_lossless(self, sqlite_store):
+        original = {
+            "notified_non_owner_user_ids": ["1", "2"],
+            "context": "stuck",
+            "2024-01-01": {"mode": "work", "done": True, "events": [
+                {"ts": "2024-01-01T10:00:00+02:00", "type": "timing_choice", "value": 30},
+            ]},
+            "2024-01-02": {"waiting_for": None, "events": []},
+        }
+        save_state(original)
+        assert load_state() == original
+
+    def test_import_json_state(self, tmp_path):
+        from hilanchor.storage import SqliteBackend
+        from hilanchor.storage.migrate import import_json_state
+
+        source = tmp_path / "state.json"
+        data = {"2024-05-05": {"worked": "yes", "events": [{"ts": "t", "type": "did", "text": "x"}]}}
+        source.write_text(json.dumps(data), encoding="utf-8")
+
+        assert import_json_state(source, tmp_path / "state.db") == 1
+        backend = SqliteBackend(tmp_path / "state.db")
+        assert backend.load() == data
+        backend.close()
+
+
+class TestEventLogBackend:
+    """Snapshot + append-only log."""
+
+    @pytest.fixture
+    def log_store(self, tmp_path, monkeypatch):
+        from hilanchor.storage import EventLogBackend
+        backend = EventLogBackend(tmp_path / "state.json", compact_bytes=1 << 30, compact_seconds=1e9)
+        monkeypatch.setattr(store, "_backend", backend)
+        return backend
+
+    def test_updates_append_to_log_not_snapshot(self, log_store):
+        save_state({"2024-01-01": {"mode": "work"}})  # plain dict -> snapshot
+        snapshot = log_store.path.read_text(encoding="utf-8")
+
+        with transaction() as state:
+            append_event(state, "free_note", text="a")
+        with transaction() as state:
+            append_event(state, "free_note", text="b")
+            set_waiting(state, "partial_plan")
+
+        assert log_store.path.read_text(encoding="utf-8") == snapshot
+        assert len(log_store.log_path.read_text(encoding="utf-8").splitlines()) == 2
+
+    def test_load_replays_log_tail(self, log_store):
+        from hilanchor.state_store import clear_waiting, get_waiting
+
+        with transaction() as state:
+            set_waiting(state, "partial_plan")
+            append_event(state, "free_note", text="a")
+        with transaction() as state:
+            clear_waiting(state)
+            append_event(state, "free_note", text="b")
+
+        state = load_state()
+        assert get_waiting(state) is None
+        assert [e["text"] for e in state[today_key()]["events"]] == ["a", "b"]
+
+    def test_torn_last_line_is_ignored(self, log_store):
+        with transaction() as state:
+            append_event(state, "free_note", text="kept")
+        with log_store.log_path.open("a", encoding="utf-8") as f:
+            f.write('{"days": {"2024-')
+
+        events = load_state()[today_key()]["events"]
+        assert [e["text"] for e in events] == ["kept"]
+
+    def test_compaction_on_size_threshold(self, log_store):
+        log_store.compact_bytes = 1
+        with transaction() as state:
+            append_event(state, "free_note", text="x")
+
+        assert not log_store.log_path.exists()
+        assert log_store.compactions == 1
+        on_disk = json.loads(log_store.path.read_text(encoding="utf-8"))
+        assert on_disk[today_key()]["events"][0]["text"] == "x"
+
+
+class TestStateCache:
+    """load_state() serves the shared in-memory state until the file changes."""
+
+    def test_repeated_loads_hit_cache(self, tmp_state_path):
+        from hilanchor.state_store import get_cache_stats
+
+        save_state({"2024-01-01": {"mode": "kid"}})
+        first = load_state()
+        before = get_cache_stats()
+        second = load_state()
+        after = get_cache_stats()
+
+        assert second is first
+        assert after["hits"] - before["hits"] == 1
+        assert after["misses"] == before["misses"]
+
+    def test_own_writes_keep_cache_valid(self, tmp_state_path):
+        from hilanchor.state_store import get_cache_stats
+
+        with transaction() as state:
+            set_worked(state, "yes")
+        before = get_cache_stats()
+        assert load_state() is state
+        assert get_cache_stats()["misses"] == before["misses"]
+
+    def test_external_edit_triggers_reload(self, tmp_state_path):
+        import os
+
+        with transaction() as state:
+            set_worked(state, "yes")
+        data = json.loads(tmp_state_path.read_text(encoding="utf-8"))
+        data[today_key()]["worked"] = "no-by-hand"
+        tmp_state_path.write_text(json.dumps(data), encoding="utf-8")
+        st = tmp_state_path.stat()
+        os.utime(tmp_state_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+        reloaded = load_state()
+        assert reloaded is not state
+        assert reloaded[today_key()]["worked"] == "no-by-hand"
+
+
+class TestCrashSafety:
+    """Atomic writes, last-good backups and recovery."""
+
+    def test_atomic_write_keeps_rotating_backups(self, tmp_path):
+        from hilanchor.storage import atomic_write_bytes
+        path = tmp_path / "state.json"
+        for i in range(4):
+            atomic_write_bytes(path, f'{{"v": {i}}}'.encode(), keep_backups=2)
+
+        assert json.loads(path.read_text()) == {"v": 3}
+        assert json.loads((tmp_path / "state.json.bak.1").read_text()) == {"v": 2}
+        assert json.loads((tmp_path / "state.json.bak.2").read_text()) == {"v": 1}
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_truncated_file_recovers_from_backup(self, tmp_path):
+        from hilanchor.storage import JsonBackend
+        backend = JsonBackend(tmp_path / "state.json", keep_backups=2)
+        backend.save({"2024-01-01": {"mode": "kid"}})
+        backend.save({"2024-01-01": {"mode": "work"}})
+        backend.path.write_text('{"2024-01-01": {"mo', encoding="utf-8")
+
+        assert backend.load() == {"2024-01-01": {"mode": "kid"}}
+        assert list(tmp_path.glob("state.json.corrupt-*"))
+
+    def test_unrecoverable_file_is_moved_aside(self, tmp_path):
+        from hilanchor.storage import JsonBackend
+        backend = JsonBackend(tmp_path / "state.json")
+        backend.path.write_text("{not json", encoding="utf-8")
+
+        assert backend.load() == {}
+        assert not backend.path.exists()
+        assert list(tmp_path.glob("state.json.corrupt-*"))
+
+    async def test_group_commit_coalesces_transactions(self, tmp_path, monkeypatch):
+        from hilanchor.storage import GroupCommitter, JsonBackend
+        committer = GroupCommitter(window=0.2)
+        backend = JsonBackend(tmp_path / "state.json", committer=committer)
+        monkeypatch.setattr(store, "_backend", backend)
+        await store.aload_state()
+
+        async def note(n):
+            async with store.atransaction() as state:
+                append_event(state, "free_note", text=str(n))
+            # Every update returns only once its batch is on disk
+            return len(json.loads(backend.path.read_text(encoding="utf-8"))[today_key()]["events"])
+
+        on_disk = await asyncio.gather(*(note(n) for n in range(20)))
+        assert committer.stats["submitted"] == 20
+        assert committer.stats["writes"] == 1
+        assert on_disk == [20] * 20
+
+        with transaction() as state:
+            set_worked(state, "no")
+        assert json.loads(backend.path.read_text(encoding="utf-8"))[today_key()]["worked"] == "no"
+        # Our own writes must not look like an external edit
+        assert load_state() is state
+        committer.close()
+
+    def test_commit_lock_waits_for_pending_batches(self, tmp_path, monkeypatch):
+        import threading
+        from hilanchor.storage import GroupCommitter, JsonBackend
+        committer = GroupCommitter(window=0.2)
+        backend = JsonBackend(tmp_path / "state.json", committer=committer)
+        monkeypatch.setattr(store, "_backend", backend)
+        state = load_state()
+        set_worked(state, "yes")
+        backend_lock = store._lock_for(backend)
+
+        _, run = store._prepare_write(state)
+        written, _, durable = run()
+        assert written and not durable.done()
+        # The thread lock is free for other commits, the file lock is kept
+        assert backend_lock._thread_lock.acquire(blocking=False)
+        backend_lock._thread_lock.release()
+        assert backend_lock._depth == 1
+
+        seen = []
+        reader = threading.Thread(target=lambda: seen.extend(commit_and_read()))
+
+        def commit_and_read():
+            with store.commit_lock() as location:
+                return [json.loads(location.read_text(encoding="utf-8"))[today_key()]["worked"]]
+
+        reader.start()
+        reader.join()
+        assert seen == ["yes"]
+        assert durable.done() and backend_lock._depth == 0
+        committer.close()
+
+    def test_failed_group_commit_raises_and_recovers(self, tmp_path, monkeypatch):
+        from hilanchor.storage import GroupCommitter, JsonBackend, atomic
+        committer = GroupCommitter(window=0.01)
+        backend = JsonBackend(tmp_path / "state.json", committer=committer)
+        monkeypatch.setattr(store, "_backend", backend)
+
+        def disk_full(*args, **kwargs):
+            raise OSError("disk full")
+
+        with monkeypatch.context() as broken:
+            broken.setattr(atomic, "atomic_write_bytes", disk_full)
+            with pytest.raises(OSError, match="disk full"):
+                with transaction() as state:
+                    set_worked(state, "yes")
+        assert committer.stats["failed"] == 1
+        assert backend._pending_writes == 0
+        assert not backend.path.exists()
+
+        # External edits are seen again, and the next save goes through
+        backend.path.write_text(json.dumps({"restored": True}), encoding="utf-8")
+        assert backend.fingerprint() != "own-write"
+        assert load_state() == {"restored": True}
+        with transaction() as state:
+            set_worked(state, "partial")
+        assert json.loads(backend.path.read_text(encoding="utf-8"))[today_key()]["worked"] == "partial"
+        committer.close()
+
+    @pytest.mark.parametrize("kind", ["event_log", "partitioned"])
+    def test_failed_group_commit_is_not_left_pending(self, tmp_path, monkeypatch, kind):
+        from hilanchor.storage import EventLogBackend, GroupCommitter, PartitionedBackend, atomic
+        committer = GroupCommitter(window=0.01)
+        if kind == "event_log":
+            backend = EventLogBackend(tmp_path / "state.json", compact_bytes=1 << 30, compact_seconds=1e9,
+                                      committer=committer)
+            broken = "append_bytes"
+        else:
+            backend = PartitionedBackend(tmp_path / "state", committer=committer)
+            broken = "atomic_write_bytes"
+        monkeypatch.setattr(store, "_backend", backend)
+        with transaction() as state:
+            set_worked(state, "yes")
+
+        def disk_full(*args, **kwargs):
+            raise OSError("disk full")
+
+        with monkeypatch.context() as m:
+            m.setattr(atomic, broken, disk_full)
+            with pytest.raises(OSError, match="disk full"):
+                with transaction() as state:
+                    set_worked(state, "no")
+        assert backend._pending_writes == 0
+        assert backend.fingerprint() == "own-write"  # the disk still holds our last good write
+        assert load_state()[today_key()]["worked"] == "yes"
+        committer.close()
+
+    def test_replaying_compacted_log_does_not_duplicate(self, tmp_path):
+        from hilanchor.storage import EventLogBackend
+        backend = EventLogBackend(tmp_path / "state.json", compact_bytes=1 << 30, compact_seconds=1e9)
+        state = backend.load()
+        for text in ("a", "b"):
+            state.setdefault("2024-01-01", {}).setdefault("events", []).append({"type": "free_note", "text": text})
+            state.touch_day("2024-01-01")
+            backend.save(state)
+        log = backend.log_path.read_bytes()
+
+        # Crash after the snapshot was written but before the log was removed
+        backend.compact(state)
+        backend.log_path.write_bytes(log)
+
+        events = backend.load()["2024-01-01"]["events"]
+        assert [e["text"] for e in events] == ["a", "b"]
+
+
+class TestPartitionedBackend:
+    """One file per day; only the needed days are opened."""
+
+    @pytest.fixture
+    def part_store(self, tmp_path, monkeypatch):
+        from hilanchor.storage import PartitionedBackend
+        backend = PartitionedBackend(tmp_path / "state")
+        monkeypatch.setattr(store, "_backend", backend)
+        return backend
+
+    def test_open_backend_without_suffix(self, tmp_path):
+        from hilanchor.storage import PartitionedBackend, open_backend
+        assert isinstance(open_backend(tmp_path / "state"), PartitionedBackend)
+
+    def test_layout_and_roundtrip(self, part_store):
+        history = {
+            "context": "fear",
+            "2024-01-01": {"mode": "kid", "events": []},
+            "2024-01-02": {"mode": "work", "events": [{"ts": "t", "type": "did", "text": "x"}]},
+        }
+        save_state(history)
+        names = sorted(p.name for p in part_store.directory.iterdir())
+        assert names == ["2024-01-01.json", "2024-01-02.json", "meta.json"]
+        assert load_state() == history
+
+    def test_load_opens_only_requested_days(self, part_store, monkeypatch):
+        from hilanchor.summary import get_raw_state_for_day
+        save_state({f"2024-01-{d:02d}": {"mode": "work"} for d in range(1, 29)})
+
+        opened = []
+        original = part_store.load_day
+        monkeypatch.setattr(part_store, "load_day", lambda key: opened.append(key) or original(key))
+        store.invalidate_cache()
+
+        assert get_raw_state_for_day("2024-01-15") == {"mode": "work"}
+        assert opened == ["2024-01-15"]
+
+    def test_update_rewrites_only_today(self, part_store):
+        save_state({"2024-01-01": {"mode": "kid"}})
+        old_day = part_store.day_path("2024-01-01")
+        before = old_day.stat().st_mtime_ns
+
+        with transaction() as state:
+            set_worked(state, "yes")
+
+        assert old_day.stat().st_mtime_ns == before
+        assert json.loads(part_store.day_path(today_key()).read_text(encoding="utf-8"))["worked"] == "yes"
+
+    def test_sqlite_loads_days_lazily(self, tmp_path):
+        from hilanchor.storage import SqliteBackend
+        backend = SqliteBackend(tmp_path / "state.db")
+        backend.save({"2024-01-01": {"mode": "kid"}, "2024-01-02": {"mode": "work"}})
+        state = backend.load()
+        assert state.loaded_days() == []
+        assert state.get("2024-01-02") == {"mode": "work"}
+        assert state.loaded_days() == ["2024-01-02"]
+        backend.close()
+
+
+class TestAsyncIO:
+    """State and journal disk I/O runs on the I/O thread, not the event loop."""
+
+    async def test_atransaction_writes_once_off_loop(self, tmp_state_path, monkeypatch):
+        import threading
+        from hilanchor.state_store import atransaction, get_backend
+
+        backend = get_backend()
+        threads = []
+        original = backend._write_snapshot
+        monkeypatch.setattr(backend, "_write_snapshot",
+                            lambda *a, **k: threads.append(threading.current_thread().name) or original(*a, **k))
+
+        before = get_write_stats()
+        async with atransaction() as state:
+            set_worked(state, "yes")
+            append_event(state, "checkin_answer", value="yes")
+
+        assert get_write_stats()["writes"] - before["writes"] == 1
+        assert threads and all(name.startswith("hilanchor-io") for name in threads)
+        assert load_state()[today_key()]["worked"] == "yes"
+
+    async def test_io_queue_is_bounded(self, monkeypatch):
+        import asyncio
+        import time
+        from hilanchor import aio
+
+        monkeypatch.setattr(aio, "IO_QUEUE_SIZE", 2)
+        monkeypatch.setattr(aio, "_slots", None)
+        aio.IO_STATS["peak_queued"] = 0
+
+        await asyncio.gather(*(aio.run_io(time.sleep, 0.01) for _ in range(6)))
+        assert aio.get_io_stats()["peak_queued"] == 2
+
+    async def test_journal_facade(self, tmp_path, monkeypatch):
+        from hilanchor import journal
+
+        monkeypatch.setattr(journal, "JOURNAL_PATH", str(tmp_path / "journal.txt"))
+        assert await journal.aappend_to_journal("שורה ראשונה")
+        assert "שורה ראשונה" in await journal.aread_journal()
+
+
+class TestConcurrency:
+    """Concurrent updates, per-chat ordering and optimistic commits."""
+
+    async def test_parallel_callbacks_keep_every_event(self, tmp_state_path):
+        import asyncio
+        from hilanchor.handlers.callbacks.worked import on_worked_choice
+
+        def make_update(i):
+            query = Mock()
+            query.answer = AsyncMock()
+            query.edit_message_text = AsyncMock()
+            query.data = "worked:" + ("yes", "partial", "no")[i % 3]
+            query.message.chat_id = i % 4
+            update = Mock()
+            update.callback_query = query
+            return update
+
+        with patch("hilanchor.handlers.callbacks.worked.reject_non_owner", AsyncMock(return_value=False)), \
+             patch("hilanchor.replies.ahumanize_message", AsyncMock(side_effect=lambda text, **_: text)):
+            await asyncio.gather(*(on_worked_choice(make_update(i), Mock()) for i in range(60)))
+
+        store.invalidate_cache()
+        events = load_state()[today_key()]["events"]
+        assert sum(1 for e in events if e["type"] == "checkin_answer") == 60
+
+    async def test_same_chat_transactions_run_in_order(self, tmp_state_path):
+        import asyncio
+        from hilanchor.state_store import atransaction
+
+        order = []
+
+        async def update(n):
+            async with atransaction(chat_id=42) as state:
+                order.append(("start", n))
+                await asyncio.sleep(0.01)
+                append_event(state, "step", value=n)
+                order.append(("end", n))
+
+        await asyncio.gather(update(1), update(2), update(3))
+        assert order == [("start", 1), ("end", 1), ("start", 2), ("end", 2), ("start", 3), ("end", 3)]
+
+    def test_external_write_is_replayed_not_overwritten(self, tmp_state_path):
+        from hilanchor.storage import JsonBackend
+
+        with transaction() as state:
+            set_worked(state, "yes")
+
+        before = get_write_stats()
+        with transaction() as state:
+            append_event(state, "ours")
+            # Another process commits between our load and our write
+            other = JsonBackend(tmp_state_path)
+            theirs = other.load()
+            theirs[today_key()].setdefault("events", []).append({"ts": "x", "type": "theirs"})
+            theirs[today_key()]["plan"] = "from elsewhere"
+            theirs.touch_day(today_key())
+            other.save(theirs)
+
+        assert get_write_stats()["rebased"] - before["rebased"] == 1
+        day = json.loads(tmp_state_path.read_text(encoding="utf-8"))[today_key()]
+        assert [e["type"] for e in day["events"]] == ["theirs", "ours"]
+        assert day["plan"] == "from elsewhere"
+        assert day["worked"] == "yes"
+        assert load_state().version >= 1
+
+    def test_stale_copy_save_raises(self, tmp_state_path):
+        from hilanchor.storage import JsonBackend, StateConflictError
+
+        with transaction() as state:
+            set_worked(state, "yes")
+        stale = load_state()
+
+        other = JsonBackend(tmp_state_path)
+        theirs = other.load()
+        theirs["context"] = "newer"
+        theirs.touch_meta()
+        other.save(theirs)
+        assert load_state() is not stale
+
+        with pytest.raises(StateConflictError):
+            save_state(stale)
+        assert json.loads(tmp_state_path.read_text(encoding="utf-8"))["context"] == "newer"
+
+    def test_sqlite_commit_replays_other_connection(self, tmp_path, monkeypatch):
+        from hilanchor.storage import SqliteBackend
+
+        path = tmp_path / "state.db"
+        monkeypatch.setattr(store, "_backend", SqliteBackend(path))
+        store.invalidate_cache()
+
+        with transaction() as state:
+            set_worked(state, "no")
+        with transaction() as state:
+            append_event(state, "ours")
+            other = SqliteBackend(path)
+            theirs = other.load()
+            theirs.setdefault(today_key(), {})["mode"] = "kid"
+            theirs.touch_day(today_key())
+            other.save(theirs)
+            other.close()
+
+        day = SqliteBackend(path).load()[today_key()]
+        assert day["mode"] == "kid"
+        assert day["worked"] == "no"
+        assert [e["type"] for e in day["events"]] == ["ours"]
+        store.invalidate_cache()
+
+
+class TestSerializers:
+    """State file formats: compact JSON by default, auto-detected on load."""
+
+    def test_default_json_is_compact_and_round_trips(self, tmp_state_path):
+        from hilanchor.storage import get_serializer
+
+        with transaction() as state:
+            set_worked(state, "yes")
+            append_event(state, "free_note", text="שלום")
+
+        raw = tmp_state_path.read_bytes()
+        assert b"\n" not in raw and b'": ' not in raw
+        assert "שלום".encode("utf-8") in raw
+        pretty = get_serializer("json-pretty").dumps(json.loads(raw))
+        assert len(raw) < len(pretty)
+
+    def test_format_is_detected_on_load(self, tmp_path):
+        pytest.importorskip("msgpack")
+        from hilanchor.storage import JsonBackend, PartitionedBackend, get_serializer
+        from hilanchor.storage.serializers import detect_format
+
+        data = {today_key(): {"worked": "no", "events": [{"ts": "t", "type": "x", "value": 1}]}, "context": "c"}
+        path = tmp_path / "state.json"
+        JsonBackend(path, serializer=get_serializer("msgpack")).save(data)
+        assert detect_format(path.read_bytes()) == "msgpack"
+        # A backend configured for JSON still reads the binary file
+        assert dict(JsonBackend(path).load()) == data
+
+        directory = tmp_path / "days"
+        PartitionedBackend(directory, serializer=get_serializer("msgpack")).save(data)
+        assert PartitionedBackend(directory).load() == data
+
+    def test_unknown_format_is_rejected(self):
+        from hilanchor.storage import get_serializer
+
+        with pytest.raises(ValueError):
+            get_serializer("yaml")
+
+
+class TestModel:
+    """Typed DayState/Event model and its lossless JSON conversion."""
+
+    DAY = {
+        "mode": "work",
+        "worked": "partial",
+        "worked_ts": "2025-03-02T14:00:05+02:00",
+        "events": [
+            {"ts": "2025-03-02T11:00:00+02:00", "type": "checkin_answer", "value": "yes"},
+            {"ts": "2025-03-02T12:30:00.250000+02:00", "type": "did", "text": "קוד"},
+            {"ts": "yesterday", "type": "some_future_type", "value": None, "source": "import"},
+        ],
+        "custom": {"nested": [1, 2]},
+    }
+
+    def test_round_trip_is_lossless(self):
+        from hilanchor.storage import DayState, EventType
+
+        day = DayState.from_dict(json.loads(json.dumps(self.DAY)))
+        assert day.to_dict() == self.DAY
+        assert json.loads(json.dumps(day.to_dict())) == self.DAY
+
+        first, odd_ts, unknown = day.events
+        assert first.type is EventType.CHECKIN_ANSWER
+        assert first.raw_ts is None and first.time.hour == 11
+        assert odd_ts.time.minute == 30 and odd_ts["ts"] == "2025-03-02T12:30:00.250000+02:00"
+        assert unknown.type == "some_future_type" and unknown["source"] == "import"
+        assert "value" in unknown and "text" not in unknown
+
+    def test_tracked_state_stores_days_as_models(self, tmp_state_path):
+        from hilanchor.storage import DayState, Event
+
+        with transaction() as state:
+            set_worked(state, "yes")
+            append_event(state, "free_note", text="שלום")
+        day = load_state()[today_key()]
+        assert isinstance(day, DayState) and isinstance(day.events[0], Event)
+
+        on_disk = json.loads(tmp_state_path.read_text(encoding="utf-8"))[today_key()]
+        assert day == on_disk
+        assert on_disk["events"][0]["type"] == "free_note"
+
+    @pytest.mark.parametrize("name", ["state.json", "state.db", "days"])
+    def test_backends_round_trip_models(self, tmp_path, name):
+        from hilanchor.storage import DayState, open_backend
+
+        day = DayState.from_dict(json.loads(json.dumps(self.DAY)))
+        day.events.pop()  # SQLite keeps only the known event keys
+        expected = {"2025-03-02": day.to_dict(), "context": "c"}
+        backend = open_backend(tmp_path / name)
+        backend.save({"2025-03-02": day, "context": "c"})
+        backend.close()
+        reopened = open_backend(tmp_path / name)
+        assert reopened.load() == expected
+        reopened.close()
+
+
+class TestSchema:
+    """Per-day schema version, upgraded lazily on read."""
+
+    @pytest.fixture
+    def v2(self, tmp_path, monkeypatch):
+        """Day schema 2, where fail_count went from a string to an int."""
+        from hilanchor.storage import PartitionedBackend, schema
+
+        upgraded = []
+
+        def fail_count_to_int(day):
+            upgraded.append(day.get("mode"))
+            day["fail_count"] = int(day.get("fail_count") or 0)
+            return day
+
+        backend = PartitionedBackend(tmp_path / "state")
+        backend.save({
+            "2024-01-01": {"mode": "kid", "fail_count": "2"},
+            "2024-01-02": {"mode": "work", "fail_count": "1"},
+        })
+        monkeypatch.setattr(schema, "CURRENT_SCHEMA", 2)
+        monkeypatch.setattr(schema, "MIGRATIONS", {1: fail_count_to_int})
+        monkeypatch.setattr(store, "_backend", backend)
+        store.invalidate_cache()
+        return backend, upgraded
+
+    def test_only_read_days_are_upgraded(self, v2):
+        backend, upgraded = v2
+        on_disk = backend.day_path("2024-01-02").read_bytes()
+
+        day = load_state()["2024-01-02"]
+        assert day["fail_count"] == 1 and day["schema"] == 2
+        assert upgraded == ["work"]
+        # Not written back just for being read
+        assert backend.day_path("2024-01-02").read_bytes() == on_disk
+
+    def test_upgraded_day_is_written_when_touched(self, v2):
+        backend, _ = v2
+        with transaction() as state:
+            state["2024-01-02"]  # read
+            store._mutate(state, ("set", "2024-01-02", "done", True))
+            save_state(state)
+
+        assert json.loads(backend.day_path("2024-01-02").read_text(encoding="utf-8")) == {
+            "mode": "work", "fail_count": 1, "done": True, "schema": 2,
+        }
+        assert "schema" not in json.loads(backend.day_path("2024-01-01").read_text(encoding="utf-8"))
+
+    def test_new_days_start_at_current_version(self, v2):
+        with transaction() as state:
+            set_worked(state, "yes")
+        assert load_state()[today_key()]["schema"] == 2
+
+    def test_newer_or_unknown_versions(self, monkeypatch):
+        from hilanchor.storage import schema
+
+        newer = {"schema": 9, "mode": "work"}
+        assert schema.upgrade_day(dict(newer)) == newer
+        monkeypatch.setattr(schema, "CURRENT_SCHEMA", 3)
+        monkeypatch.setattr(schema, "MIGRATIONS", {1: lambda day: day})
+        with pytest.raises(ValueError):
+            schema.upgrade_day({"mode": "work"})
+
+
+class TestArchive:
+    """Old days move to the compressed cold tier and stay readable."""
+
+    @staticmethod
+    def _seed(backend, days):
+        import datetime as dt
+        state = {"context": "c"}
+        today = dt.date.fromisoformat(today_key())
+        for n in days:
+            key = (today - dt.timedelta(days=n)).isoformat()
+            state[key] = {"worked": "yes", "events": [{"ts": key, "type": "free_note", "text": f"יום {n}"}]}
+        backend.save(state)
+        store.invalidate_cache()
+        return state
+
+    @pytest.mark.parametrize("kind", ["json", "log", "dir", "sqlite"])
+    async def test_rollover_keeps_days_readable(self, tmp_path, monkeypatch, kind):
+        from hilanchor.storage import EventLogBackend, JsonBackend, PartitionedBackend, SqliteBackend
+        from hilanchor.summary import get_raw_state_for_day
+
+        backend = {
+            "json": lambda: JsonBackend(tmp_path / "state.json"),
+            "log": lambda: EventLogBackend(tmp_path / "state.json"),
+            "dir": lambda: PartitionedBackend(tmp_path / "state"),
+            "sqlite": lambda: SqliteBackend(tmp_path / "state.db"),
+        }[kind]()
+        monkeypatch.setattr(store, "_backend", backend)
+        seeded = self._seed(backend, [0, 1, 40, 41, 70, 400])
+        old = sorted(k for k in seeded if k != "context")[:3]
+
+        assert await store.aarchive_old_days(keep_days=30) == 4
+        assert await store.aarchive_old_days(keep_days=30) == 0
+
+        store.invalidate_cache()
+        hot = backend.load()
+        assert hot.day_keys() == [k for k in sorted(seeded) if k not in ("context",)][-2:]
+        assert hot["context"] == "c"
+        for key in old:
+            assert get_raw_state_for_day(key) == seeded[key]
+        assert get_raw_state_for_day("1999-01-01") == {}
+        store.invalidate_cache()
+
+    def test_archive_index_points_at_newest_copy(self, tmp_path):
+        from hilanchor.storage import DayArchive
+
+        archive = DayArchive(tmp_path / "archive")
+        archive.add_days({"2025-01-02": {"worked": "no"}, "2025-02-01": {"worked": "yes"}})
+        archive.add_days({"2025-01-02": {"worked": "partial"}})
+
+        reopened = DayArchive(tmp_path / "archive")
+        assert reopened.days() == ["2025-01-02", "2025-02-01"]
+        assert reopened.get_day("2025-01-02") == {"worked": "partial"}
+        assert reopened.get_day("2025-02-01") == {"worked": "yes"}
+        assert sorted(p.name for p in (tmp_path / "archive").glob("*.arc")) == ["2025-01.arc", "2025-02.arc"]
+
+
+class TestSeenUsers:
+    """Strangers are tracked outside the state, answered once."""
+
+    def _stranger_update(self, user_id):
+        update = Mock()
+        update.effective_user.id = user_id
+        update.message.reply_text = AsyncMock()
+        return update
+
+    async def test_stranger_answered_once_without_state_write(self, tmp_state_path):
+        from hilanchor.auth import reject_non_owner
+
+        before = get_write_stats()
+        first, second = self._stranger_update(777), self._stranger_update(777)
+        assert await reject_non_owner(first, Mock())
+        assert await reject_non_owner(second, Mock())
+
+        first.message.reply_text.assert_awaited_once()
+        second.message.reply_text.assert_not_awaited()
+        assert get_write_stats()["writes"] == before["writes"]
+        assert not tmp_state_path.exists()
+        assert tmp_state_path.with_name("state.json.seen").read_text() == "777\n"
+
+    async def test_seen_ids_survive_restart_and_import_legacy_list(self, tmp_state_path):
+        from hilanchor.storage import SeenUserSet
+
+        tmp_state_path.write_text(json.dumps({"notified_non_owner_user_ids": ["5", "6"]}))
+        store.invalidate_cache()
+        assert not await store.aremember_non_owner(5)
+        assert await store.aremember_non_owner(9)
+
+        reloaded = SeenUserSet(tmp_state_path.with_name("state.json.seen"), bloom_bits=1024)
+        reloaded.load()
+        assert all(uid in reloaded for uid in (5, 6, 9))
+        assert 10 not in reloaded
+        assert not reloaded.add(6) and reloaded.add(10)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        from hilanchor.storage.seen_users import BloomFilter
+
+        bloom = BloomFilter(4096)
+        ids = [str(i * 7919) for i in range(300)]
+        for uid in ids:
+            bloom.add(uid)
+        assert all(uid in bloom for uid in ids)
+        assert sum(str(-i) in bloom for i in range(1, 1000)) < 200
+
+
+class TestMultiUser:
+    """Allowed users get their own state shard, timezone and jobs."""
+
+    @pytest.fixture
+    def team(self, tmp_state_path, monkeypatch):
+        from hilanchor import users
+
+        monkeypatch.setattr(users, "ALLOWED_USER_IDS", frozenset({1, 2, 3}))
+        monkeypatch.setattr(users, "USER_TIMEZONES", {3: "Pacific/Kiritimati"})
+        monkeypatch.setattr(store, "_shards", type(store._shards)())
+        return tmp_state_path
+
+    async def test_each_user_writes_only_their_shard(self, team):
+        from hilanchor.state_store import atransaction, aload_state
+        from hilanchor.users import as_user
+
+        with as_user(1):
+            async with atransaction() as state:
+                set_worked(state, "yes")
+        owner_bytes = team.read_bytes()
+
+        with as_user(2):
+            async with atransaction() as state:
+                set_worked(state, "no")
+                append_event(state, "free_note", text="שלום")
+            assert (await aload_state())[today_key()]["worked"] == "no"
+
+        assert team.read_bytes() == owner_bytes
+        shard = team.with_name("state.users") / "2.json"
+        assert json.loads(shard.read_text(encoding="utf-8"))[today_key()]["worked"] == "no"
+        with as_user(1):
+            assert load_state()[today_key()]["worked"] == "yes"
+
+    def test_today_key_follows_user_timezone(self, team):
+        import datetime as dt
+        import zoneinfo
+        from hilanchor.users import as_user
+
+        with as_user(3):
+            assert today_key() == dt.datetime.now(zoneinfo.ZoneInfo("Pacific/Kiritimati")).date().isoformat()
+        with as_user(1):
+            assert today_key() == dt.datetime.now(zoneinfo.ZoneInfo("Asia/Jerusalem")).date().isoformat()
+
+    def test_open_shards_are_bounded(self, team, monkeypatch):
+        from hilanchor.users import as_user
+
+        monkeypatch.setattr(store, "STATE_OPEN_SHARDS", 2)
+        for user_id in range(10, 16):
+            with as_user(user_id):
+                with transaction() as state:
+                    set_worked(state, str(user_id))
+        assert list(store._shards) == [14, 15]
+        with as_user(10):
+            assert load_state()[today_key()]["worked"] == "10"
+
+    async def test_daily_job_runs_for_every_user_of_its_timezone(self, team):
+        from hilanchor import scheduler
+
+        context = Mock()
+        context.bot.send_message = AsyncMock()
+        context.job.data = "Asia/Jerusalem"
+        with patch.object(scheduler, "_is_weekend", return_value=False):
+            await scheduler.job_14(context)
+
+        chats = sorted(call.kwargs["chat_id"] for call in context.bot.send_message.await_args_list)
+        assert chats == [1, 2]
+
+    async def test_nudge_job_runs_as_the_nudged_user(self, team, monkeypatch):
+        from hilanchor import nudges
+        from hilanchor.users import as_user, current_user
+
+        seen = []
+
+        async def send(*args, **kwargs):
+            seen.append((current_user(), today_key()))
+
+        monkeypatch.setattr(nudges, "send_humanized", send)
+        context = Mock()
+        context.job.data = {"chat_id": 3, "minutes": 5}
+        await nudges.nudge_job(context)
+
+        with as_user(3):
+            assert seen == [(3, today_key())]
+
+    async def test_allowed_user_passes_auth_and_becomes_current(self, team):
+        from hilanchor.auth import reject_non_owner
+        from hilanchor.users import current_user
+
+        update = Mock()
+        update.effective_user.id = 2
+        assert not await reject_non_owner(update, Mock())
+        assert current_user() == 2
@@ -0,0 +1,130 @@
+"""
+Tests for the pool of pre-generated message variants.
+"""
+import threading
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from hilanchor import llm, scheduler, variants
+from hilanchor import messages as msg
+from hilanchor.variants import VariantPool
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    pool = VariantPool(tmp_path / "variants", size=2)
+    monkeypatch.setattr(llm, "get_pool", lambda: pool)
+    monkeypatch.setattr(llm, "get_cache", lambda: None)
+    monkeypatch.setattr(llm, "USE_LLM", True)
+    return pool
+
+
+def fake_client(*responses):
+    client = Mock()
+    client.generate = AsyncMock(side_effect=[{"response": r} for r in responses])
+    return client
+
+
+class TestVariantPool:
+    """Taking, refilling and persisting variants."""
+
+    def test_only_message_constants_are_pooled(self):
+        assert variants.is_static(msg.CHECKIN_14)
+        assert not variants.is_static(msg.nudge_message(15) + " extra")
+
+    async def test_empty_pool_sends_the_original_without_the_model(self, pool, monkeypatch):
+        client = fake_client()
+        monkeypatch.setattr(llm, "get_async_client", lambda: client)
+
+        assert await llm.ahumanize_checkin("14") == msg.CHECKIN_14
+        client.generate.assert_not_called()
+        # The key is remembered for the next refill
+        assert pool.missing() == [(msg.CHECKIN_14, "check-in at 14:00", 2)]
+
+    async def test_refill_then_take(self, pool, monkeypatch):
+        pool.take(msg.CHECKIN_14, "check-in at 14:00")
+        client = fake_client("אחת", "שתיים")
+        monkeypatch.setattr(llm, "get_async_client", lambda: client)
+
+        assert await llm.arefill_variants() == 2
+        assert pool.missing() == []
+        assert await llm.ahumanize_checkin("14") == "אחת"
+        assert await llm.ahumanize_checkin("14") == "שתיים"
+        assert await llm.ahumanize_checkin("14") == msg.CHECKIN_14
+
+    async def test_refill_stops_when_the_model_fails(self, pool, monkeypatch):
+        pool.take(msg.CHECKIN_14, "check-in at 14:00")
+        client = Mock()
+        client.generate = AsyncMock(side_effect=[{"response": "אחת"}, ConnectionError("down")])
+        monkeypatch.setattr(llm, "get_async_client", lambda: client)
+
+        assert await llm.arefill_variants() == 1
+        assert client.generate.await_count == 2
+        assert pool.path.exists()
+
+    async def test_dynamic_messages_are_generated_live(self, pool, monkeypatch):
+        client = fake_client("היי 🙂")
+        monkeypatch.setattr(llm, "get_async_client", lambda: client)
+        assert await llm.ahumanize_message("הודעה חד-פעמית") == "היי 🙂"
+        assert len(pool) == 0 and pool.missing() == []
+
+    def test_survives_a_restart(self, tmp_path):
+        pool = VariantPool(tmp_path / "variants", size=3)
+        pool.add(msg.CHECKIN_14, "check-in at 14:00", "גרסה")
+        pool.add("טקסט שכבר לא קיים", "", "ישן")
+        pool.save()
+
+        reloaded = VariantPool(tmp_path / "variants", size=3)
+        reloaded.load()
+        assert reloaded.take(msg.CHECKIN_14, "check-in at 14:00") == "גרסה"
+        assert len(reloaded) == 0
+
+    def test_only_a_new_key_or_a_hit_needs_a_save(self, tmp_path):
+        pool = VariantPool(tmp_path / "variants", size=2)
+        assert pool.take(msg.CHECKIN_14, "check-in at 14:00") is None
+        assert pool.dirty
+        pool.save()
+        assert pool.take(msg.CHECKIN_14, "check-in at 14:00") is None
+        assert not pool.dirty
+        pool.add(msg.CHECKIN_14, "check-in at 14:00", "גרסה")
+        pool.save()
+        assert pool.take(msg.CHECKIN_14, "check-in at 14:00") == "גרסה"
+        assert pool.dirty
+
+    async def test_startup_loads_the_pool_on_the_io_thread(self, tmp_path, monkeypatch):
+        saved = VariantPool(tmp_path / "variants", size=2)
+        saved.add(msg.CHECKIN_14, "check-in at 14:00", "גרסה")
+        saved.save()
+        monkeypatch.setattr(variants, "VARIANT_POOL_PATH", tmp_path / "variants")
+        monkeypatch.setattr(variants, "VARIANT_POOL_SIZE", 2)
+        monkeypatch.setattr(variants, "_pool", None)
+        threads = []
+        load = VariantPool.load
+        monkeypatch.setattr(VariantPool, "load", lambda self: threads.append(threading.current_thread().name) or load(self))
+
+        await variants.aload_pool()
+        assert threads[0].startswith("hilanchor-io")
+        assert variants.get_pool().take(msg.CHECKIN_14, "check-in at 14:00") == "גרסה"
+        assert len(threads) == 1  # not loaded again on the event loop
+
+    async def test_night_refill_unloads_the_model_again(self, pool, monkeypatch):
+        monkeypatch.setattr(scheduler, "get_pool", lambda: pool)
+        monkeypatch.setattr(scheduler, "owner_hour", lambda: 3)
+        monkeypatch.setattr(scheduler, "arefill_variants", AsyncMock(return_value=2))
+        release = AsyncMock(return_value=True)
+        monkeypatch.setattr(scheduler, "arelease_model", release)
+
+        await scheduler.job_refill_variants(Mock())
+        scheduler.arefill_variants.assert_not_awaited()  # a full pool does not wake the model
+        pool.take(msg.CHECKIN_14, "check-in at 14:00")
+        await scheduler.job_refill_variants(Mock())
+        scheduler.arefill_variants.assert_awaited_once()
+        release.assert_awaited_once()
+
+    def test_idle_hours_may_wrap_midnight(self, monkeypatch):
+        monkeypatch.setattr(scheduler, "VARIANT_POOL_IDLE_HOURS", (0, 7))
+        assert scheduler._is_idle_hour(3) and not scheduler._is_idle_hour(7)
+        monkeypatch.setattr(scheduler, "VARIANT_POOL_IDLE_HOURS", (23, 6))
+        assert scheduler._is_idle_hour(23) and scheduler._is_idle_hour(2)
+        assert not scheduler._is_idle_hour(12)